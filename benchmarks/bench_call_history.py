@@ -0,0 +1,68 @@
+"""
+Time per call and memory held by a HandcalcsCallRecorder in an
+optimization loop: recording every call with its latex code rendered, as
+record=True does, and keeping the last 100 calls in a CallHistory with
+lazy_latex=True, which renders the latex code of a call only when it is
+read.
+
+Usage: python benchmarks/bench_call_history.py [--calls N]
+"""
+
+import argparse
+import time
+import tracemalloc
+
+from corpus import cell_lines  # noqa: F401 (puts the in-tree package on sys.path)
+from handcalcs import handcalc
+from handcalcs.decorator import CallHistory
+
+
+def beam_check(w_f, L, E, I_x, phi_M_n):
+    M_f = w_f * L**2 / 8  # Factored moment
+    Delta = 5 * w_f * L**4 / (384 * E * I_x)  # Midspan deflection
+    Delta_lim = L / 360
+    utilization = max(M_f / phi_M_n, Delta / Delta_lim)
+    return utilization
+
+
+def optimize(recorder, calls: int) -> float:
+    """
+    Returns the time per call of a search over the section's I_x.
+    """
+    start = time.perf_counter()
+    for index in range(calls):
+        recorder(25.0, 9000.0, 200000, 1e8 + 1e5 * index, 8e8)
+    return (time.perf_counter() - start) / calls
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--calls", type=int, default=5000)
+    args = parser.parse_args()
+
+    print(f"{args.calls} calls")
+    for label, make_options in (
+        ("record=True", lambda: {"record": True}),
+        (
+            "CallHistory(maxlen=100)",
+            lambda: {"record": CallHistory(maxlen=100), "lazy_latex": True},
+        ),
+    ):
+        per_call = optimize(handcalc(**make_options())(beam_check), args.calls)
+        recorder = handcalc(**make_options())(beam_check)
+        tracemalloc.start()
+        optimize(recorder, args.calls)
+        held = tracemalloc.get_traced_memory()[0]
+        tracemalloc.stop()
+        start = time.perf_counter()
+        latex = recorder.history[-1]["latex"]
+        read = time.perf_counter() - start
+        print(
+            f"{label + ':':26} {per_call * 1e6:8.1f} us/call {held / 1024:8.0f} KiB"
+            f" held, {len(recorder.history)} kept, last read in {read * 1e6:.0f} us"
+        )
+    assert latex
+
+
+if __name__ == "__main__":
+    main()
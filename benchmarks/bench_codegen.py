@@ -0,0 +1,113 @@
+"""
+Per-render latency of a @handcalc design-check function rendered by the
+render function that 'handcalcs codegen' generates for it, compared with
+the RenderPlan and the whole latex() pipeline, and the import time of the
+generated module, which does not import handcalcs or pyparsing.
+
+Every generated render is checked against the decorated function first.
+
+Usage: python benchmarks/bench_codegen.py [--calls N]
+"""
+
+import argparse
+import pathlib
+import random
+import subprocess
+import sys
+import tempfile
+import textwrap
+import time
+
+import innerscope
+
+from corpus import cell_lines  # noqa: F401 (puts the in-tree package on sys.path)
+from handcalcs import codegen
+from handcalcs import handcalcs as hand
+from handcalcs import global_config
+
+CALCS = textwrap.dedent("""\
+    from handcalcs import handcalc
+
+    @handcalc()
+    def beam_check(w_f, L, E, I_x, phi_M_n):
+        M_f = w_f * L**2 / 8  # Factored moment
+        Delta = 5 * w_f * L**4 / (384 * E * I_x)  # Midspan deflection
+        Delta_lim = L / 360
+        if M_f <= phi_M_n: flexure = "OK"
+        else: flexure = "NG"
+        if Delta <= Delta_lim: deflection = "OK"
+        else: deflection = "NG"
+        utilization = max(M_f / phi_M_n, Delta / Delta_lim)
+        return utilization
+    """)
+
+IMPORT_CHECK = textwrap.dedent("""\
+    import sys, time
+    start = time.perf_counter()
+    import bench_calcs_render
+    elapsed = time.perf_counter() - start
+    assert "pyparsing" not in sys.modules and "handcalcs" not in sys.modules
+    print(elapsed)
+    """)
+
+
+def random_args() -> tuple:
+    return (
+        random.uniform(5, 50),
+        random.uniform(3000, 12000),
+        200000,
+        random.uniform(1e7, 5e8),
+        random.uniform(1e8, 9e8),
+    )
+
+
+def time_renders(render, scopes: list) -> float:
+    start = time.perf_counter()
+    for scope in scopes:
+        render(scope)
+    return (time.perf_counter() - start) / len(scopes)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--calls", type=int, default=500)
+    args = parser.parse_args()
+
+    directory = pathlib.Path(tempfile.mkdtemp())
+    (directory / "bench_calcs.py").write_text(CALCS)
+    calcs = codegen.load_module(str(directory / "bench_calcs.py"))
+    source = codegen.generate_module(calcs)
+    (directory / "bench_calcs_render.py").write_text(source)
+    sys.path.insert(0, str(directory))
+    import bench_calcs_render
+
+    calls = [random_args() for _ in range(args.calls)]
+    render_generated = bench_calcs_render.render_beam_check
+    codegen.verify_render_function(calcs.beam_check, render_generated, calls)
+
+    import_time = subprocess.run(
+        [sys.executable, "-c", IMPORT_CHECK],
+        cwd=directory,
+        capture_output=True,
+        text=True,
+        check=True,
+    ).stdout
+    print(f"generated module: {len(source.splitlines())} lines")
+    print(f"{'import:':20} {float(import_time) * 1e3:10.1f} ms (no pyparsing)")
+
+    function = calcs.beam_check.__wrapped__
+    scopes = [innerscope.call(function, *call_args) for call_args in calls]
+    config = global_config.resolve_config()
+    cell_source = calcs.beam_check.cell_source
+    plan = hand.build_render_plan(cell_source, "", config, None)
+    for label, render in (
+        ("render, latex", lambda scope: hand.latex(cell_source, scope, "", config)),
+        ("render, plan", lambda scope: hand.render_plan(plan, scope)),
+        ("render, generated", render_generated),
+    ):
+        time_renders(render, scopes[:10])  # Warm the caches
+        print(f"{label + ':':20} {time_renders(render, scopes) * 1e6:10.1f} us/call")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,65 @@
+"""
+Time per call and memory held when a HandcalcsCallRecorder keeps every call
+of an optimization loop: as the RecordedCall objects of a CallHistory, and as
+one NumPy column per argument and the return value in a ColumnarCallHistory.
+Also times exporting the columns to .npz and CSV.
+
+Usage: python benchmarks/bench_columnar_history.py [--calls N]
+"""
+
+import argparse
+import os
+import tempfile
+import time
+import tracemalloc
+
+from corpus import cell_lines  # noqa: F401 (puts the in-tree package on sys.path)
+from handcalcs import handcalc
+from handcalcs.decorator import CallHistory, ColumnarCallHistory
+from bench_call_history import beam_check, optimize
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--calls", type=int, default=100000)
+    args = parser.parse_args()
+
+    import numpy  # noqa: F401 (kept out of the memory held by the history)
+
+    print(f"{args.calls} calls")
+    for label, make_history in (
+        ("CallHistory()", CallHistory),
+        ("ColumnarCallHistory()", ColumnarCallHistory),
+    ):
+        per_call = optimize(
+            handcalc(record=make_history(), lazy_latex=True)(beam_check), args.calls
+        )
+        history = make_history()
+        recorder = handcalc(record=history, lazy_latex=True)(beam_check)
+        tracemalloc.start()
+        optimize(recorder, args.calls)
+        held = tracemalloc.get_traced_memory()[0]
+        tracemalloc.stop()
+        print(
+            f"{label + ':':24} {per_call * 1e6:6.1f} us/call {held / 1024:8.0f} KiB"
+            f" held, {len(history)} kept"
+        )
+
+    with tempfile.TemporaryDirectory() as directory:
+        for extension, export in (("npz", history.to_npz), ("csv", history.to_csv)):
+            path = os.path.join(directory, f"calls.{extension}")
+            start = time.perf_counter()
+            export(path)
+            elapsed = time.perf_counter() - start
+            print(
+                f"to_{extension}: {elapsed * 1e3:6.1f} ms,"
+                f" {os.path.getsize(path) / 1024:8.0f} KiB"
+            )
+    start = time.perf_counter()
+    latex = history.render(args.calls // 2)
+    print(f"render(row): {(time.perf_counter() - start) * 1e6:.0f} us")
+    assert latex
+
+
+if __name__ == "__main__":
+    main()
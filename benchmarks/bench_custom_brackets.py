@@ -0,0 +1,110 @@
+"""
+Cost of swapping the "custom_brackets" in identifiers of increasing length
+with a bracket marker every few characters: the character-by-character
+replacement of each bracket type in turn, as swap_custom_brackets() did,
+and the compiled scanner that swaps every bracket type in one pass.
+
+Usage: python benchmarks/bench_custom_brackets.py [--repeat N]
+"""
+
+import argparse
+import random
+import time
+
+from corpus import cell_lines  # noqa: F401 (puts the in-tree package on sys.path)
+from handcalcs import handcalcs as hand
+
+CUSTOM_BRACKETS = {
+    "parenthesis": "ˉ",
+    "square_brackets": "ˍ",
+    "angle_brackets": "ˆ",
+    "curly_brackets": "ǂ",
+    "pipes": "ǀ",
+    "double_pipes": "ǁ",
+}
+
+
+def replace_alternating_brackets(
+    text: str, custom_str: str, left_bracket: str, right_bracket: str
+) -> str:
+    """
+    Returns 'text' with the brackets swapped as _replace_alternating_brackets()
+    did before the custom brackets were compiled.
+    """
+    if custom_str not in text:
+        return text
+    result = ""
+    is_left = True
+    i = 0
+    str_len = len(custom_str)
+    while i < len(text):
+        if text[i : i + str_len] == custom_str:
+            result += left_bracket if is_left else right_bracket
+            is_left = not is_left
+            i += str_len
+        else:
+            result += text[i]
+            i += 1
+    return result
+
+
+def swap_each(item: str) -> str:
+    for bracket_type, custom_str in CUSTOM_BRACKETS.items():
+        if custom_str and custom_str in item:
+            item = replace_alternating_brackets(
+                item, custom_str, *hand.BRACKETS[bracket_type]
+            )
+    return item
+
+
+def identifier(length: int) -> str:
+    """
+    Returns an identifier of 'length' characters with a pair of bracket
+    markers around every few characters, e.g. "Vˉ0ˉ_xˍ12ˍ".
+    """
+    parts = []
+    while sum(map(len, parts)) < length:
+        marker = random.choice(list(CUSTOM_BRACKETS.values()))
+        parts.append(
+            f"{random.choice('ABMVx')}{marker}{random.randint(0, 99)}{marker}_"
+        )
+    return "".join(parts)[:length]
+
+
+def time_per_token(swap, tokens: list, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for token in tokens:
+            swap(token)
+        best = min(best, time.perf_counter() - start)
+    return best / len(tokens)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    random.seed(0)
+    (compiled,) = hand.bind_rewrites(
+        [hand.swap_custom_brackets], custom_brackets=CUSTOM_BRACKETS
+    )
+    print(f"best of {args.repeat}, us/token")
+    print(f"{'length':>7} {'markers':>8} {'each':>9} {'compiled':>9}")
+    for length in (10, 50, 200, 1000, 5000):
+        tokens = [identifier(length) for _ in range(50)]
+        for token in tokens:
+            assert swap_each(token) == compiled(token)
+        markers = sum(
+            token.count(m) for token in tokens for m in CUSTOM_BRACKETS.values()
+        )
+        print(
+            f"{length:>7} {markers // len(tokens):>8}"
+            f" {time_per_token(swap_each, tokens, args.repeat) * 1e6:9.2f}"
+            f" {time_per_token(compiled, tokens, args.repeat) * 1e6:9.2f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
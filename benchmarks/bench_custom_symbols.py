@@ -0,0 +1,96 @@
+"""
+Cost per token of swapping the "custom_symbols" for tables of increasing
+size: one str.replace() pass per symbol, as swap_custom_symbols() did, and
+the compiled single-pass matcher, along with the one-time cost (in us) of
+compiling the table. Each name in the test cell corpus is
+swapped along with names that contain one or two of the symbols.
+
+Usage: python benchmarks/bench_custom_symbols.py [--repeat N]
+"""
+
+import argparse
+import itertools
+import random
+import re
+import time
+from functools import partial
+
+from corpus import cell_lines
+from handcalcs import handcalcs as hand
+
+BASES = ["V", "N", "M", "f", "E", "A", "P", "Q", "T", "phi", "sigma", "tau"]
+ACCENTS = ["dot", "star", "bar", "hat", "tilde", "check", "vec", "ddot"]
+
+
+def symbol_table(size: int) -> dict:
+    """
+    Returns 'size' custom symbols in the style of a company notation, e.g.
+    "V_dot_3": "\\dot{V}_{3}".
+    """
+    symbols = {}
+    for index in itertools.count():
+        for base, accent in itertools.product(BASES, ACCENTS):
+            if len(symbols) == size:
+                return symbols
+            suffix = f"_{index}" if index else ""
+            symbols[f"{base}_{accent}{suffix}"] = f"\\{accent}{{{base}}}{suffix}"
+
+
+def swap_each(item: str, custom_symbols: dict) -> str:
+    """
+    Returns 'item' with the custom symbols swapped as swap_custom_symbols()
+    did before they were compiled.
+    """
+    for symbol, latex_symbol in custom_symbols.items():
+        if symbol in item:
+            item = item.replace(symbol, latex_symbol)
+    return item
+
+
+def time_per_token(swap, tokens: list, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for token in tokens:
+            swap(token)
+        best = min(best, time.perf_counter() - start)
+    return best / len(tokens)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    random.seed(0)
+    names = sorted(
+        {name for line in cell_lines() for name in re.findall(r"[A-Za-z_]\w*", line)}
+    )
+    print(f"best of {args.repeat}, us/token")
+    print(f"{'symbols':>8} {'stages':>7} {'each':>8} {'compiled':>9} {'compile':>8}")
+    for size in (10, 50, 150, 500):
+        custom_symbols = symbol_table(size)
+        symbols = list(custom_symbols)
+        tokens = names + [
+            "_".join(random.sample(symbols, random.randint(1, 2)))
+            for _ in range(len(names))
+        ]
+        start = time.perf_counter()
+        stages = hand.custom_symbol_stages(tuple(custom_symbols.items()))
+        compile_time = time.perf_counter() - start
+        each = partial(swap_each, custom_symbols=custom_symbols)
+        (compiled,) = hand.bind_rewrites(
+            [hand.swap_custom_symbols], custom_symbols=custom_symbols
+        )
+        for token in tokens:
+            assert each(token) == compiled(token)
+        print(
+            f"{size:>8} {len(stages):>7}"
+            f" {time_per_token(each, tokens, args.repeat) * 1e6:8.2f}"
+            f" {time_per_token(compiled, tokens, args.repeat) * 1e6:9.2f}"
+            f" {compile_time * 1e6:8.0f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,66 @@
+"""
+Overhead per call of @handcalc over the bare function: capturing the scope
+of the call with innerscope.call(), which builds the innerscope function on
+every call, and with the ScopeCapture that a decorated function builds once;
+and calling the function decorated with lazy_latex=True, which only
+captures the scope, and decorated to render every call.
+
+With --max-overhead, exits with an error if the overhead of a lazy_latex
+call exceeds that many microseconds, so that a regression fails the run.
+
+Usage: python benchmarks/bench_decorator_overhead.py [--calls N] [--max-overhead US]
+"""
+
+import argparse
+import sys
+import timeit
+
+import innerscope
+
+from corpus import cell_lines  # noqa: F401 (puts the in-tree package on sys.path)
+from handcalcs import handcalc
+from handcalcs.decorator import ScopeCapture
+from bench_call_history import beam_check
+
+ARGS = (25.0, 9000.0, 200000, 1e8, 8e8)
+
+
+def per_call(func, calls: int) -> float:
+    """
+    Returns the best time per call of func(*ARGS), in microseconds.
+    """
+    timer = timeit.Timer(lambda: func(*ARGS))
+    return min(timer.repeat(repeat=5, number=calls)) / calls * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--calls", type=int, default=1000)
+    parser.add_argument("--max-overhead", type=float, default=None)
+    args = parser.parse_args()
+
+    bare = per_call(beam_check, args.calls)
+    print(f"{'bare function:':28} {bare:8.1f} us/call")
+    timings = {}
+    for label, func in (
+        ("innerscope.call():", lambda *a: innerscope.call(beam_check, *a)),
+        ("ScopeCapture():", ScopeCapture(beam_check)),
+        ("@handcalc(lazy_latex=True):", handcalc(lazy_latex=True)(beam_check)),
+        ("@handcalc():", handcalc()(beam_check)),
+    ):
+        timings[label] = per_call(func, args.calls)
+        print(
+            f"{label:28} {timings[label]:8.1f} us/call,"
+            f" {timings[label] - bare:8.1f} us overhead"
+        )
+
+    overhead = timings["@handcalc(lazy_latex=True):"] - bare
+    if args.max_overhead is not None and overhead > args.max_overhead:
+        sys.exit(
+            f"The overhead of a lazy_latex call, {overhead:.1f} us, exceeds "
+            f"--max-overhead {args.max_overhead} us"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+"""
+Memory and speed of the typed node form in handcalcs.expr_ir compared with
+the nested deques returned by expr_parser(), on a large cell made of the
+parsed corpus lines repeated to --lines lines.
+
+"names" times finding every variable name in the cell: by testing each
+str token of the deques against a regular expression, as the deque
+transforms do, and by checking the node kind of each node.
+
+Usage: python benchmarks/bench_expr_ir.py [--repeat N] [--lines N]
+"""
+
+import argparse
+import itertools
+import re
+import time
+
+from corpus import cell_lines
+from handcalcs import handcalcs as hand
+from handcalcs import expr_ir
+from handcalcs.caching import approximate_size
+
+NAME = re.compile(r"[A-Za-z_][\w.]*")
+
+
+def deque_names(parsed: list) -> list:
+    names = []
+    for d in parsed:
+        for item in hand.flatten(d):
+            if isinstance(item, str) and NAME.fullmatch(item):
+                names.append(item)
+    return names
+
+
+def ir_names(trees: list) -> list:
+    names = []
+    for tree in trees:
+        for node in expr_ir.walk(tree):
+            if type(node) is expr_ir.Name:
+                names.append(node)
+    return names
+
+
+def best_time(func, arg, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func(arg)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--repeat", type=int, default=10)
+    parser.add_argument("--lines", type=int, default=2000)
+    args = parser.parse_args()
+
+    lines = list(itertools.islice(itertools.cycle(cell_lines()), args.lines))
+    parsed = [hand.expr_parser(line) for line in lines]
+    trees = [expr_ir.from_deque(d) for d in parsed]
+    assert [expr_ir.to_deque(tree) for tree in trees] == parsed
+    assert deque_names(parsed) == ir_names(trees)
+
+    deque_bytes = approximate_size(parsed)
+    ir_bytes = approximate_size(trees)
+    from_deque = best_time(
+        lambda ds: [expr_ir.from_deque(d) for d in ds], parsed, args.repeat
+    )
+    to_deque = best_time(
+        lambda ts: [expr_ir.to_deque(t) for t in ts], trees, args.repeat
+    )
+    deque_walk = best_time(deque_names, parsed, args.repeat)
+    ir_walk = best_time(ir_names, trees, args.repeat)
+
+    print(f"{len(lines)} lines, best of {args.repeat}")
+    print(f"memory, deques:       {deque_bytes / 1024:10.1f} KiB")
+    print(f"memory, nodes:        {ir_bytes / 1024:10.1f} KiB")
+    print(f"from_deque():         {from_deque * 1e6 / len(lines):10.2f} us/line")
+    print(f"to_deque():           {to_deque * 1e6 / len(lines):10.2f} us/line")
+    print(f"names, str tests:     {deque_walk * 1e6 / len(lines):10.2f} us/line")
+    print(f"names, node kinds:    {ir_walk * 1e6 / len(lines):10.2f} us/line")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,51 @@
+"""
+Per-line parse cost of handcalcs.handcalcs.expr_parser on the test cell corpus.
+
+"rebuild" reproduces the old behaviour of constructing the pyparsing grammar
+on every call; "shared" uses the grammar returned by get_expr_grammar().
+
+Usage: python benchmarks/bench_expr_parser.py [--repeat N]
+"""
+
+import argparse
+import time
+
+import more_itertools
+
+from corpus import cell_lines
+from handcalcs import handcalcs as hand
+
+
+def parse_with_rebuilt_grammar(line: str):
+    expr = hand.build_expr_grammar()
+    return hand.list_to_deque(
+        more_itertools.collapse(expr.parseString(line).asList(), levels=1)
+    )
+
+
+def time_per_line(parse, lines, repeat: int) -> float:
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for line in lines:
+            parse(line)
+    elapsed = time.perf_counter() - start
+    return elapsed / (repeat * len(lines))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    lines = cell_lines()
+    hand.get_expr_grammar()  # Exclude the one-time build from the timings
+    rebuild = time_per_line(parse_with_rebuilt_grammar, lines, args.repeat)
+    shared = time_per_line(hand.pyparsing_expr_parser, lines, args.repeat)
+    print(f"{len(lines)} lines x {args.repeat} repeats")
+    print(f"rebuild grammar per call: {rebuild * 1e6:10.1f} us/line")
+    print(f"shared grammar:           {shared * 1e6:10.1f} us/line")
+    print(f"speed-up:                 {rebuild / shared:10.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,45 @@
+"""
+Time per call of a @handcalc function that returns its rendered latex code
+with every call, and of the same function with lazy_latex=True, where only
+a fraction of the results are read as latex code, e.g. the 1% of calc sheets
+that a user opens.
+
+Usage: python benchmarks/bench_lazy_latex.py [--calls N] [--read-every N]
+"""
+
+import argparse
+import time
+
+from corpus import cell_lines  # noqa: F401 (puts the in-tree package on sys.path)
+from handcalcs import handcalc
+from bench_call_history import beam_check
+
+
+def run(decorated, calls: int, read_every: int) -> float:
+    """
+    Returns the time per call of 'decorated', reading the latex code of one
+    result in 'read_every'.
+    """
+    start = time.perf_counter()
+    for index in range(calls):
+        result = decorated(25.0, 9000.0, 200000, 1e8 + 1e5 * index, 8e8)
+        if index % read_every == 0:
+            latex_code, _ = result
+    return (time.perf_counter() - start) / calls
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--calls", type=int, default=5000)
+    parser.add_argument("--read-every", type=int, default=100)
+    args = parser.parse_args()
+
+    print(f"{args.calls} calls, latex code read every {args.read_every}")
+    for label, lazy_latex in (("eager", False), ("lazy_latex=True", True)):
+        decorated = handcalc(lazy_latex=lazy_latex)(beam_check)
+        per_call = run(decorated, args.calls, args.read_every)
+        print(f"{label + ':':18} {per_call * 1e6:8.1f} us/call")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+"""
+Re-render time of a 40-line calculation cell with new values on every
+render, as in a parametric design run, with and without LineTemplates.
+"compiled" converts each line from scratch on every render; "template"
+compiles each line once and afterwards only fills and renders its values.
+
+Usage: python benchmarks/bench_line_templates.py [--repeat N] [--lines N]
+"""
+
+import argparse
+import random
+import time
+
+from corpus import cell_lines  # noqa: F401 (puts the in-tree package on sys.path)
+from handcalcs import handcalcs as hand
+from handcalcs import global_config
+
+
+def calc_cell(n_lines: int) -> str:
+    lines = ["x_0 = a * b_1 + sqrt(c) / 2"]
+    for idx in range(1, n_lines):
+        lines.append(
+            f"x_{idx} = (x_{idx - 1} + alpha * b_1) / (2 * c + d_prime**2) - a # step {idx}"
+        )
+    return "\n".join(lines)
+
+
+def random_results(n_lines: int) -> dict:
+    results = {name: random.uniform(1, 100) for name in ("a", "b_1", "c", "alpha")}
+    results["d_prime"] = random.uniform(1, 100)
+    for idx in range(n_lines):
+        results[f"x_{idx}"] = random.uniform(-1000, 1000)
+    return results
+
+
+def time_renders(source: str, n_lines: int, repeat: int) -> float:
+    config = global_config._config
+    elapsed = 0.0
+    for _ in range(repeat):
+        results = random_results(n_lines)
+        start = time.perf_counter()
+        hand.latex(source, results, "", config)
+        elapsed += time.perf_counter() - start
+    return elapsed / repeat
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--repeat", type=int, default=50)
+    parser.add_argument("--lines", type=int, default=40)
+    args = parser.parse_args()
+
+    source = calc_cell(args.lines)
+    config = global_config._config
+    results = random_results(args.lines)
+    with_templates = hand.latex(source, results, "", config)
+    line_template = hand.line_template
+    hand.line_template = lambda calculation, **config_options: None
+    try:
+        assert hand.latex(source, results, "", config) == with_templates
+        compiled = time_renders(source, args.lines, args.repeat)
+    finally:
+        hand.line_template = line_template
+    template = time_renders(source, args.lines, args.repeat)
+    print(f"{args.lines}-line cell, {args.repeat} renders with new values")
+    print(f"compiled every render: {compiled * 1e3:10.2f} ms/render")
+    print(f"template:              {template * 1e3:10.2f} ms/render")
+    print(f"speed-up:              {compiled / template:10.1f}x")
+
+
+if __name__ == "__main__":
+    main()
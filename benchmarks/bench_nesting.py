@@ -0,0 +1,78 @@
+"""
+Render time of single-line calculations as their nesting depth or number of
+terms grows. Time per level (or per term) staying flat shows linear scaling.
+The expr_parser() cache is cleared before every render.
+
+Usage: python benchmarks/bench_nesting.py [--repeat N]
+"""
+
+import argparse
+import sys
+import time
+
+from corpus import cell_lines  # noqa: F401 (puts the in-tree package on sys.path)
+from handcalcs import handcalcs as hand
+from handcalcs import global_config
+
+SIZES = [25, 50, 100, 150, 195]
+TERMS = [100, 200, 400, 800, 1600]
+
+
+def parentheses(n: int) -> str:
+    return "y = " + "(x + " * n + "1" + ")" * n
+
+
+def function_calls(n: int) -> str:
+    return "y = " + "sin(" * n + "x" + ")" * n
+
+
+def fractions(n: int) -> str:
+    return "y = " + "(1 + x / " * n + "1" + ")" * n
+
+
+def exponents(n: int) -> str:
+    return "y = " + " ** ".join(["x"] * n)
+
+
+def polynomial(n: int) -> str:
+    return "y = " + " + ".join(f"c_{i} * x**{i % 7}" for i in range(n))
+
+
+def time_render(line: str, results: dict, repeat: int) -> float:
+    elapsed = 0.0
+    for _ in range(repeat):
+        hand.clear_parse_cache()
+        start = time.perf_counter()
+        hand.latex(line, results, "", global_config._config)
+        elapsed += time.perf_counter() - start
+    return elapsed / repeat
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    recursion_limit = sys.getrecursionlimit()
+    results = {"x": 1.5, "y": 1.0}
+    results.update({f"c_{i}": 0.5 for i in range(max(TERMS))})
+    cases = [
+        ("nested parentheses", parentheses, SIZES),
+        ("nested calls", function_calls, SIZES),
+        ("nested fractions", fractions, SIZES),
+        ("exponent chain", exponents, SIZES),
+        ("polynomial terms", polynomial, TERMS),
+    ]
+    print(f"parser_backend: {global_config._config['parser_backend']}")
+    for name, make_line, sizes in cases:
+        print(f"\n{name}")
+        for size in sizes:
+            elapsed = time_render(make_line(size), results, args.repeat)
+            print(
+                f"{size:6d} {elapsed * 1e3:10.2f} ms {elapsed / size * 1e6:10.1f} us/unit"
+            )
+    assert sys.getrecursionlimit() == recursion_limit
+
+
+if __name__ == "__main__":
+    main()
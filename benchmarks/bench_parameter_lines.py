@@ -0,0 +1,70 @@
+"""
+Render time of a 200-line cell of parameter assignments, e.g. "f_c = 35",
+with and without the TRIVIAL_RIGHT_SIDE fast path in test_for_parameter_line.
+The expr_parser() cache is cleared before every render.
+
+Usage: python benchmarks/bench_parameter_lines.py [--repeat N] [--lines N]
+"""
+
+import argparse
+import re
+import time
+
+from corpus import cell_lines  # noqa: F401 (puts the in-tree package on sys.path)
+from handcalcs import handcalcs as hand
+from handcalcs import global_config
+
+
+def parameter_cell(n_lines: int):
+    values = [35, -2.5, 1.5e3, "f_c0"]
+    source_lines = []
+    results = {}
+    for idx in range(n_lines):
+        value = values[idx % len(values)]
+        name = f"f_c{idx}"
+        source_lines.append(f"{name} = {value}")
+        results[name] = results.get(value, value)
+    return "\n".join(source_lines), results
+
+
+def time_render(source: str, results: dict, repeat: int) -> tuple:
+    config = global_config._config
+    categorize = render = 0.0
+    for _ in range(repeat):
+        hand.clear_parse_cache()
+        start = time.perf_counter()
+        cell = hand.categorize_lines(hand.create_calc_cell(source, results))
+        categorize += time.perf_counter() - start
+        hand.clear_parse_cache()
+        start = time.perf_counter()
+        hand.latex(source, results, "", config)
+        render += time.perf_counter() - start
+    assert all(isinstance(line, hand.ParameterLine) for line in cell.lines)
+    return categorize / repeat, render / repeat
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--repeat", type=int, default=10)
+    parser.add_argument("--lines", type=int, default=200)
+    args = parser.parse_args()
+
+    source, results = parameter_cell(args.lines)
+    hand.latex(source, results, "", global_config._config)  # Warm up
+    fast = time_render(source, results, args.repeat)
+    trivial_right_side = hand.TRIVIAL_RIGHT_SIDE
+    hand.TRIVIAL_RIGHT_SIDE = re.compile(r"(?!)")  # Never matches
+    try:
+        slow = time_render(source, results, args.repeat)
+    finally:
+        hand.TRIVIAL_RIGHT_SIDE = trivial_right_side
+
+    print(f"{args.lines}-line parameter cell, {args.repeat} repeats")
+    print(f"{'':>14} {'categorize':>12} {'render':>12}")
+    print(f"{'full parse':>14} {slow[0] * 1e3:10.2f}ms {slow[1] * 1e3:10.2f}ms")
+    print(f"{'fast path':>14} {fast[0] * 1e3:10.2f}ms {fast[1] * 1e3:10.2f}ms")
+    print(f"{'speed-up':>14} {slow[0] / fast[0]:11.1f}x {slow[1] / fast[1]:11.1f}x")
+
+
+if __name__ == "__main__":
+    main()
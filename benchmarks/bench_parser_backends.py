@@ -0,0 +1,42 @@
+"""
+Parse throughput of the "pyparsing" and "ast" parser backends on the test
+cell corpus. The expr_parser() cache is bypassed so every parse is timed.
+
+Usage: python benchmarks/bench_parser_backends.py [--repeat N]
+"""
+
+import argparse
+import time
+
+from corpus import cell_lines
+from handcalcs import handcalcs as hand
+
+
+def lines_per_second(parse, lines, repeat: int) -> float:
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for line in lines:
+            parse(line)
+    elapsed = time.perf_counter() - start
+    return repeat * len(lines) / elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    lines = cell_lines()
+    for line in lines:
+        assert hand.ast_expr_parser(line) == hand.pyparsing_expr_parser(line), line
+
+    print(f"{len(lines)} lines x {args.repeat} repeats")
+    results = {}
+    for backend, parse in hand.EXPR_PARSERS.items():
+        results[backend] = lines_per_second(parse, lines, args.repeat)
+        print(f"{backend:>10}: {results[backend]:12.0f} lines/s")
+    print(f"{'speed-up':>10}: {results['ast'] / results['pyparsing']:12.1f}x")
+
+
+if __name__ == "__main__":
+    main()
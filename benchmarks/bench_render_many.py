@@ -0,0 +1,92 @@
+"""
+Throughput of a load-combination sweep of a @handcalc design-check function:
+calling the decorated function in a loop, render_many() in this process,
+and render_many() with a pool of worker processes. Also reports the peak
+memory allocated while streaming the results of render_many(), which does
+not grow with the number of calls.
+
+Usage: python benchmarks/bench_render_many.py [--calls N] [--processes P]
+"""
+
+import argparse
+import os
+import time
+import tracemalloc
+
+from corpus import cell_lines  # noqa: F401 (puts the in-tree package on sys.path)
+from handcalcs import handcalc
+
+# fmt: off
+@handcalc()
+def beam_check(w_D, w_L, L, E, I_x, phi_M_n):
+    w_f = 1.25 * w_D + 1.5 * w_L  # Factored load
+    M_f = w_f * L**2 / 8  # Factored moment
+    Delta = 5 * w_L * L**4 / (384 * E * I_x)  # Live load deflection
+    Delta_lim = L / 360
+    if M_f <= phi_M_n: flexure = "OK"
+    else: flexure = "NG"
+    if Delta <= Delta_lim: deflection = "OK"
+    else: deflection = "NG"
+    utilization = max(M_f / phi_M_n, Delta / Delta_lim)
+    return utilization
+# fmt: on
+
+
+def load_combinations(calls: int):
+    """
+    Returns a generator of 'calls' keyword arguments of beam_check().
+    """
+    for index in range(calls):
+        yield {
+            "w_D": 5 + index % 17,
+            "w_L": 10 + index % 23,
+            "L": 4000 + 10 * (index % 800),
+            "E": 200000,
+            "I_x": 1e8 + 1e6 * (index % 300),
+            "phi_M_n": 5e8,
+        }
+
+
+def time_sweep(sweep, calls: int) -> float:
+    start = time.perf_counter()
+    for _ in sweep(load_combinations(calls)):
+        pass
+    return time.perf_counter() - start
+
+
+def peak_memory(sweep, calls: int) -> int:
+    tracemalloc.start()
+    for _ in sweep(load_combinations(calls)):
+        pass
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return peak
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--calls", type=int, default=5000)
+    parser.add_argument("--processes", type=int, default=os.cpu_count())
+    args = parser.parse_args()
+
+    loop = lambda calls: (beam_check(**call) for call in calls)
+    in_process = beam_check.render_many
+    in_pool = lambda calls: beam_check.render_many(calls, processes=args.processes)
+    first = list(load_combinations(200))
+    assert list(loop(first)) == list(in_process(first)) == list(in_pool(first))
+
+    print(f"{args.calls} calls of beam_check(), {args.processes} processes")
+    for label, sweep in (
+        ("loop", loop),
+        ("render_many", in_process),
+        ("render_many, pool", in_pool),
+    ):
+        elapsed = time_sweep(sweep, args.calls)
+        print(f"{label + ':':20} {elapsed:8.2f} s {args.calls / elapsed:10.0f} calls/s")
+    for calls in (args.calls // 10, args.calls):
+        peak = peak_memory(in_process, calls)
+        print(f"peak memory, {calls} calls streamed: {peak / 1024:8.0f} KiB")
+
+
+if __name__ == "__main__":
+    main()
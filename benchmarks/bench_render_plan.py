@@ -0,0 +1,103 @@
+"""
+Per-call latency of a @handcalc design-check function called with new
+arguments on every call, as in a batch of design checks, with and without
+the RenderPlan. "latex" runs the whole latex() pipeline on every call, as
+the decorator did before; "plan" categorizes and compiles the cell once
+and afterwards only converts and formats the values.
+
+Usage: python benchmarks/bench_render_plan.py [--calls N]
+"""
+
+import argparse
+import random
+import time
+
+import innerscope
+
+from corpus import cell_lines  # noqa: F401 (puts the in-tree package on sys.path)
+from handcalcs import handcalc
+from handcalcs import handcalcs as hand
+from handcalcs import global_config
+
+# fmt: off
+def beam_check(w_f, L, E, I_x, phi_M_n):
+    M_f = w_f * L**2 / 8  # Factored moment
+    Delta = 5 * w_f * L**4 / (384 * E * I_x)  # Midspan deflection
+    Delta_lim = L / 360
+    if M_f <= phi_M_n: flexure = "OK"
+    else: flexure = "NG"
+    if Delta <= Delta_lim: deflection = "OK"
+    else: deflection = "NG"
+    utilization = max(M_f / phi_M_n, Delta / Delta_lim)
+    return utilization
+# fmt: on
+
+
+def random_args() -> tuple:
+    return (
+        random.uniform(5, 50),
+        random.uniform(3000, 12000),
+        200000,
+        random.uniform(1e7, 5e8),
+        random.uniform(1e8, 9e8),
+    )
+
+
+def time_calls(call, calls: int) -> float:
+    elapsed = 0.0
+    for _ in range(calls):
+        args = random_args()
+        start = time.perf_counter()
+        call(*args)
+        elapsed += time.perf_counter() - start
+    return elapsed / calls
+
+
+def time_renders(render, calls: int) -> float:
+    scopes = [innerscope.call(beam_check, *random_args()) for _ in range(calls)]
+    start = time.perf_counter()
+    for scope in scopes:
+        render(scope)
+    return (time.perf_counter() - start) / calls
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--calls", type=int, default=500)
+    args = parser.parse_args()
+
+    decorated = handcalc()(beam_check)
+    line_args = {"override": "", "precision": 3, "sci_not": None}
+
+    def without_plan(*call_args):
+        scope = innerscope.call(beam_check, *call_args)
+        latex_code = hand.LatexRenderer(
+            decorated.cell_source, scope, line_args
+        ).render()
+        raw_latex_code = "".join(latex_code.replace("\\[", "", 1).rsplit("\\]", 1))
+        return raw_latex_code, scope.return_value
+
+    call_args = random_args()
+    assert decorated(*call_args) == without_plan(*call_args)
+
+    config = global_config.resolve_config()
+    plan = hand.build_render_plan(decorated.cell_source, "", config, 3)
+    render_latex = lambda scope: hand.latex(decorated.cell_source, scope, "", config, 3)
+    render_plan = lambda scope: hand.render_plan(plan, scope)
+
+    print(f"{args.calls} calls of beam_check() with new arguments")
+    for label, call in (("call, latex", without_plan), ("call, plan", decorated)):
+        time_calls(call, 10)  # Warm the caches
+        print(f"{label + ':':20} {time_calls(call, args.calls) * 1e6:10.1f} us/call")
+    for label, render in (
+        ("render only, latex", render_latex),
+        ("render only, plan", render_plan),
+    ):
+        time_renders(render, 10)
+        print(
+            f"{label + ':':20} {time_renders(render, args.calls) * 1e6:10.1f} us/call"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,67 @@
+"""
+Cost of the token-local rewrites in swap_symbolic_calcs (operators,
+comparison operators, greek, primes, long names, subscripts) on the test
+cell corpus: applied as one deque walk per rewrite followed by
+flatten_deque(), and fused into a single rewrite_tokens() walk.
+
+Usage: python benchmarks/bench_token_rewrites.py [--repeat N]
+"""
+
+import argparse
+import time
+
+from corpus import cell_lines
+from handcalcs import handcalcs as hand
+from handcalcs import global_config
+
+REWRITES = [
+    hand.swap_py_operators,
+    hand.swap_comparison_ops,
+    hand.swap_for_greek,
+    hand.swap_prime_notation,
+    hand.swap_long_var_strs,
+    hand.swap_double_subscripts,
+    hand.extend_subscripts,
+]
+
+
+def one_walk_per_rewrite(d, **config_options):
+    for rewrite in REWRITES:
+        d = rewrite(d, **config_options)
+    return hand.flatten_deque(d)
+
+
+def fused(d, **config_options):
+    return hand.rewrite_tokens(hand.flatten(d), REWRITES, **config_options)
+
+
+def time_per_line(transform, parsed, repeat: int) -> float:
+    config = global_config._config
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for d in parsed:
+            transform(d, **config)
+        best = min(best, time.perf_counter() - start)
+    return best / len(parsed)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    config = global_config._config
+    parsed = [hand.swap_frac_divs(hand.expr_parser(line)) for line in cell_lines()]
+    for d in parsed:
+        assert one_walk_per_rewrite(d, **config) == fused(d, **config)
+    separate = time_per_line(one_walk_per_rewrite, parsed, args.repeat)
+    single = time_per_line(fused, parsed, args.repeat)
+    print(f"{len(parsed)} lines, best of {args.repeat}")
+    print(f"one walk per rewrite: {separate * 1e6:10.1f} us/line")
+    print(f"fused:                {single * 1e6:10.1f} us/line")
+    print(f"speed-up:             {separate / single:10.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,62 @@
+"""
+Render time and size of the latex code of a @handcalc design-check function
+called with NumPy arrays of spans and loads: rendered element by element,
+as every @handcalc function is, and rendered as one symbolic derivation and
+a results table with vectorized=True and the default row limit.
+
+Usage: python benchmarks/bench_vectorized.py [--repeat N]
+"""
+
+import argparse
+import time
+
+import numpy as np
+
+from corpus import cell_lines  # noqa: F401 (puts the in-tree package on sys.path)
+from handcalcs import handcalc
+
+
+def beam_check(w_f, L, E, I_x, phi_M_n):
+    M_f = w_f * L**2 / 8  # Factored moment
+    Delta = 5 * w_f * L**4 / (384 * E * I_x)  # Midspan deflection
+    Delta_lim = L / 360
+    utilization = np.maximum(M_f / phi_M_n, Delta / Delta_lim)
+    return utilization
+
+
+def time_call(decorated, args: tuple, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        decorated(*args)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    elementwise = handcalc()(beam_check)
+    vectorized = handcalc(vectorized=True)(beam_check)
+    print(f"best of {args.repeat}")
+    print(f"{'cases':>7} {'elementwise':>22} {'vectorized':>22}")
+    for cases in (10, 100, 1000, 10000):
+        call_args = (
+            np.linspace(5, 50, cases),
+            np.linspace(3000, 12000, cases),
+            200000,
+            np.linspace(1e7, 5e8, cases),
+            5e8,
+        )
+        results = []
+        for decorated in (elementwise, vectorized):
+            size = len(decorated(*call_args)[0])
+            elapsed = time_call(decorated, call_args, args.repeat)
+            results.append(f"{elapsed * 1e3:9.1f} ms {size / 1024:7.0f} KiB")
+        print(f"{cases:>7} {results[0]:>22} {results[1]:>22}")
+
+
+if __name__ == "__main__":
+    main()
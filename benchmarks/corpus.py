@@ -0,0 +1,35 @@
+"""
+Helpers for loading the benchmark corpus: the calculation lines from the
+test_handcalcs/cell_*.py modules used by the test suite.
+"""
+
+import pathlib
+import sys
+from typing import List
+
+REPO_ROOT = pathlib.Path(__file__).resolve().parent.parent
+CELL_DIR = REPO_ROOT / "test_handcalcs"
+
+# Make the in-tree package and test cells importable without installing
+sys.path.insert(0, str(REPO_ROOT / "src"))
+sys.path.insert(0, str(REPO_ROOT))
+
+
+def cell_lines() -> List[str]:
+    """
+    Returns the code portion (comments removed) of every line in the test
+    cells that handcalcs would send to the parser.
+    """
+    lines = []
+    for cell_file in sorted(CELL_DIR.glob("cell_*.py")):
+        for line in cell_file.read_text().splitlines():
+            code = line.split("#", 1)[0].rstrip()
+            if (
+                not code
+                or code.startswith((" ", "\t", "def ", "from ", "import "))
+                or "globals()" in code
+                or ":" in code
+            ):
+                continue
+            lines.append(code)
+    return lines
@@ -0,0 +1,80 @@
+#    Copyright 2020 Connor Ferster
+
+#    Licensed under the Apache License, Version 2.0 (the "License");
+#    you may not use this file except in compliance with the License.
+#    You may obtain a copy of the License at
+
+#        http://www.apache.org/licenses/LICENSE-2.0
+
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS,
+#    WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#    See the License for the specific language governing permissions and
+#    limitations under the License.
+"""
+The handcalcs command line:
+
+    handcalcs cache stats [--dir DIR]
+    handcalcs cache clear [--dir DIR]
+    handcalcs codegen MODULE [-o OUTPUT]
+"""
+
+import argparse
+import sys
+from typing import List, Optional
+
+from handcalcs import global_config
+from handcalcs.disk_cache import DiskCache
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(prog="handcalcs")
+    commands = parser.add_subparsers(dest="command", required=True)
+    cache_parser = commands.add_parser(
+        "cache", help="Report on or empty the on-disk render cache."
+    )
+    cache_parser.add_argument("action", choices=["stats", "clear"])
+    cache_parser.add_argument(
+        "--dir",
+        default=global_config._config["disk_cache_dir"],
+        help="The cache directory (default: the 'disk_cache_dir' option).",
+    )
+    codegen_parser = commands.add_parser(
+        "codegen",
+        help="Generate a standalone module of render functions for the"
+        " @handcalc functions in a module.",
+    )
+    codegen_parser.add_argument(
+        "module", help="A path to a Python file or the name of a module."
+    )
+    codegen_parser.add_argument(
+        "-o", "--output", help="The file to write (default: standard output)."
+    )
+    args = parser.parse_args(argv)
+
+    if args.command == "codegen":
+        from handcalcs.codegen import generate_module, load_module
+
+        source = generate_module(load_module(args.module))
+        if args.output is None:
+            sys.stdout.write(source)
+        else:
+            with open(args.output, "w", encoding="utf-8") as output:
+                output.write(source)
+        return 0
+
+    disk_cache = DiskCache(args.dir, global_config._config["disk_cache_size"])
+    if args.action == "clear":
+        removed = disk_cache.clear()
+        print(f"Removed {removed} entries from {disk_cache.path}")
+    else:
+        stats = disk_cache.stats()
+        print(f"path: {stats.path}")
+        print(f"entries: {stats.entries} (max {stats.maxsize})")
+        print(f"size: {stats.size_bytes} bytes")
+    disk_cache.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,298 @@
+#    Copyright 2020 Connor Ferster
+
+#    Licensed under the Apache License, Version 2.0 (the "License");
+#    you may not use this file except in compliance with the License.
+#    You may obtain a copy of the License at
+
+#        http://www.apache.org/licenses/LICENSE-2.0
+
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS,
+#    WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#    See the License for the specific language governing permissions and
+#    limitations under the License.
+
+from collections import OrderedDict, deque
+import decimal
+import fractions
+import hashlib
+import marshal
+import sys
+import threading
+import types
+from typing import Any, Hashable, List, NamedTuple, Optional, Tuple
+
+
+class CacheInfo(NamedTuple):
+    hits: int
+    misses: int
+    evictions: int
+    maxsize: int
+    currsize: int
+
+    @property
+    def hit_rate(self) -> float:
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+
+class LRUCache:
+    """
+    A size-bounded mapping that evicts its least recently used entry when full
+    and keeps count of its hits, misses, and evictions.
+
+    A 'maxsize' of 0 disables the cache: nothing is stored and every lookup
+    is a miss.
+    """
+
+    def __init__(self, maxsize: int = 128):
+        self._data = OrderedDict()
+        self._lock = threading.RLock()
+        self._maxsize = max(maxsize, 0)
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __repr__(self):
+        return f"{self.__class__.__name__}({self.info()})"
+
+    def __len__(self):
+        return len(self._data)
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self._data
+
+    @property
+    def maxsize(self) -> int:
+        return self._maxsize
+
+    @maxsize.setter
+    def maxsize(self, maxsize: int) -> None:
+        with self._lock:
+            self._maxsize = max(maxsize, 0)
+            self._evict()
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        """
+        Returns the value stored for 'key' and marks it as most recently used.
+        Returns 'default' if 'key' is not in the cache.
+        """
+        with self._lock:
+            try:
+                value = self._data[key]
+            except KeyError:
+                self.misses += 1
+                return default
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key: Hashable, value: Any) -> None:
+        """
+        Stores 'value' for 'key', evicting the least recently used entries
+        if the cache is over its size.
+        """
+        if not self._maxsize:
+            return
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            self._evict()
+
+    def pop(self, key: Hashable, default: Any = None) -> Any:
+        with self._lock:
+            return self._data.pop(key, default)
+
+    def items(self) -> List[Tuple[Hashable, Any]]:
+        """
+        Returns a snapshot of the (key, value) pairs in the cache, from least
+        to most recently used.
+        """
+        with self._lock:
+            return list(self._data.items())
+
+    def clear(self) -> None:
+        """
+        Removes all entries and resets the statistics.
+        """
+        with self._lock:
+            self._data.clear()
+            self.hits = 0
+            self.misses = 0
+            self.evictions = 0
+
+    def info(self) -> CacheInfo:
+        return CacheInfo(
+            self.hits, self.misses, self.evictions, self._maxsize, len(self._data)
+        )
+
+    def _evict(self) -> None:
+        while len(self._data) > self._maxsize:
+            self._data.popitem(last=False)
+            self.evictions += 1
+
+
+def approximate_size(obj: Any) -> int:
+    """
+    Returns the approximate memory, in bytes, used by 'obj' and everything
+    reachable from it through tuples, lists, deques, sets, dicts, and the
+    attributes of objects with __slots__. Objects reached more than once are
+    only counted once.
+    """
+    seen = set()
+    total = 0
+    stack = [obj]
+    while stack:
+        item = stack.pop()
+        if id(item) in seen:
+            continue
+        seen.add(id(item))
+        total += sys.getsizeof(item)
+        if isinstance(item, dict):
+            stack.extend(item.keys())
+            stack.extend(item.values())
+        elif isinstance(item, (tuple, list, deque, set, frozenset)):
+            stack.extend(item)
+        else:
+            for cls in type(item).__mro__:
+                for slot in getattr(cls, "__slots__", ()):
+                    if hasattr(item, slot):
+                        stack.append(getattr(item, slot))
+    return total
+
+
+def freeze(obj: Any) -> Hashable:
+    """
+    Returns 'obj' as a hashable value that compares equal for equal inputs:
+    dicts become tuples of (key, value) pairs, in insertion order since the
+    order of e.g. the "custom_symbols" option matters, and lists, tuples,
+    sets, and deques become tuples, recursively.
+    """
+    if isinstance(obj, dict):
+        return tuple((key, freeze(value)) for key, value in obj.items())
+    if isinstance(obj, (set, frozenset)):
+        return tuple(sorted(freeze(item) for item in obj))
+    if isinstance(obj, (list, tuple, deque)):
+        return tuple(freeze(item) for item in obj)
+    return obj
+
+
+IDENTITY_TYPES = (
+    types.ModuleType,
+    type,
+    types.FunctionType,
+    types.BuiltinFunctionType,
+    types.MethodType,
+)
+
+
+def fingerprint(value: Any) -> Optional[Hashable]:
+    """
+    Returns a hashable stand-in for 'value' that compares equal to the
+    stand-in of an equal value of the same type. Exact ints, strs, bools,
+    and None stand in for themselves, and floats and complex numbers are
+    fingerprinted by their repr(), which tells apart equal values that are
+    rendered differently, e.g. 0.0 and -0.0. Arrays are fingerprinted by
+    their dtype, shape, and contents and lists, tuples, and dicts by their
+    items. Modules, classes, and functions stand in for themselves.
+
+    Any other hashable value is fingerprinted by its value, repr(), and
+    str(), so that values that are equal but are written differently, e.g.
+    the pint quantities 1 m and 100 cm, do not share a fingerprint.
+
+    Returns None if 'value' is unhashable or is only hashable by identity
+    since it could then be changed without its fingerprint changing.
+    """
+    kind = type(value)
+    if kind in PLAIN_TYPES:
+        if kind is float or kind is complex:
+            return (kind, repr(value))
+        return (kind, value)
+    if isinstance(value, IDENTITY_TYPES):
+        return (kind, value)
+    dtype = getattr(value, "dtype", None)
+    if dtype is not None and hasattr(value, "tobytes"):
+        if getattr(dtype, "hasobject", True):
+            return None
+        return (kind, dtype.str, getattr(value, "shape", None), value.tobytes())
+    if isinstance(value, (list, tuple)):
+        items = tuple(fingerprint(item) for item in value)
+        return None if None in items else (kind, items)
+    if isinstance(value, dict):
+        items = tuple(
+            (fingerprint(key), fingerprint(item)) for key, item in value.items()
+        )
+        if any(key is None or item is None for key, item in items):
+            return None
+        return (kind, items)
+    if kind.__hash__ is None or kind.__hash__ is object.__hash__:
+        return None
+    try:
+        hash(value)
+    except TypeError:
+        return None
+    return (kind, value, repr(value), str(value))
+
+
+PLAIN_TYPES = (type(None), bool, int, float, complex, str)
+
+
+def stable_digest(obj: Any) -> Optional[str]:
+    """
+    Returns a hex SHA-256 digest of 'obj' that is the same in every process,
+    for use as the key of a persistent cache. 'obj' is a fingerprint() or a
+    tuple of them.
+
+    Returns None if 'obj' contains an item that cannot be written out
+    stably (see stable_token()).
+    """
+    parts = []
+    stack = [obj]
+    while stack:
+        item = stack.pop()
+        if isinstance(item, (tuple, list)):
+            parts.append(b"(%d" % len(item))
+            stack.extend(reversed(item))
+            continue
+        token = stable_token(item)
+        if token is None:
+            return None
+        parts.append(b"%d:%s" % (len(token), token))
+    return hashlib.sha256(b"".join(parts)).hexdigest()
+
+
+def stable_token(item: Any) -> Optional[bytes]:
+    """
+    Returns 'item' written out as bytes that do not change between processes.
+    Functions are written out by name and a digest of their code; values of
+    the PLAIN_TYPES and STABLE_VALUE_TYPES by their type and repr().
+
+    Returns None for any other object, including subclasses of those types:
+    latex_repr() may render it with format(), str(), or _repr_latex_(),
+    none of which its repr() is known to determine.
+    """
+    kind = type(item)
+    if kind is bytes:
+        return b"bytes:" + item
+    if kind in PLAIN_TYPES:
+        text = f"{kind.__name__}:{item!r}"
+    elif kind in STABLE_VALUE_TYPES:
+        text = f"{kind.__module__}.{kind.__qualname__}:{item!r}"
+    elif isinstance(item, type):
+        text = f"type:{item.__module__}.{item.__qualname__}"
+    elif isinstance(item, types.ModuleType):
+        text = f"module:{item.__name__}"
+    elif isinstance(item, types.FunctionType):
+        code = hashlib.sha256(marshal.dumps(item.__code__)).hexdigest()
+        text = f"function:{item.__module__}.{item.__qualname__}:{code}"
+    elif isinstance(item, types.BuiltinFunctionType):
+        text = f"builtin:{item.__module__}.{item.__qualname__}"
+    else:
+        return None
+    return text.encode("utf-8", "surrogatepass")
+
+
+# The types, besides the PLAIN_TYPES, whose values stable_token() writes out:
+# their repr() writes out the whole value and latex_repr() renders them from
+# the value alone
+STABLE_VALUE_TYPES = (decimal.Decimal, fractions.Fraction)
@@ -0,0 +1,724 @@
+#    Copyright 2020 Connor Ferster
+
+#    Licensed under the Apache License, Version 2.0 (the "License");
+#    you may not use this file except in compliance with the License.
+#    You may obtain a copy of the License at
+
+#        http://www.apache.org/licenses/LICENSE-2.0
+
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS,
+#    WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#    See the License for the specific language governing permissions and
+#    limitations under the License.
+"""
+Ahead-of-time compilation of @handcalc functions into a standalone module.
+
+generate_module() categorizes and converts the cell of every @handcalc
+function in a module once, with the current config, and writes the result
+into the source of a plain Python module with one render function per
+decorated function, e.g. render_beam_check(values). The generated module
+imports nothing but the standard library: it carries its own copy of the
+parts of handcalcs that format values and assemble the LaTeX, extracted
+from the handcalcs source when the module is generated, so it never imports
+pyparsing or parses a line of code.
+
+    handcalcs codegen my_calcs.py -o my_calcs_render.py
+
+The functions in the "Runtime" section below are the ones copied into the
+generated module, along with the parts of handcalcs.handcalcs they use.
+"""
+
+import ast
+import builtins
+from collections import deque
+from dataclasses import fields, is_dataclass, replace
+from functools import lru_cache, partial, singledispatch
+import importlib
+import importlib.util
+import inspect
+import pathlib
+import sys
+import textwrap
+from typing import Any, Callable, Dict, Iterable, List, Optional, Set, Tuple
+
+from handcalcs import __version__, global_config
+from handcalcs.handcalcs import (
+    BlankLine,
+    CalcLine,
+    ConditionalLine,
+    IntertextLine,
+    LongCalcLine,
+    NumericCalcLine,
+    ParameterLine,
+    RenderPlan,
+    SymbolicLine,
+    VALUE_DEPENDENT_FUNCS,
+    ValueSlot,
+    build_render_plan,
+    dict_get,
+    flatten,
+    format_cell,
+    numeric_template,
+    rewrite_tokens,
+    swap_custom_brackets,
+    swap_custom_symbols,
+    swap_symbolic_calcs,
+    swap_values,
+    symbolic_rewrites,
+    value_rewrites,
+)
+
+# Modules that a generated module may import; everything else it needs from
+# handcalcs is copied into it.
+RUNTIME_IMPORTS = (
+    "collections",
+    "copy",
+    "dataclasses",
+    "functools",
+    "itertools",
+    "math",
+    "re",
+    "sys",
+    "threading",
+    "typing",
+)
+
+
+# Runtime: copied into every generated module
+
+
+class CompiledConditions:
+    """
+    Chooses the branch of each conditional line of a compiled cell in turn,
+    as swap_conditional() does while a cell is converted.
+    """
+
+    def __init__(self):
+        self.prev_cond_type = ""
+        self.prev_result = False
+
+    def __call__(self, line: ConditionalLine, values: dict) -> bool:
+        """
+        Returns True if the expressions of 'line' are the ones that ran.
+        """
+        conditional_type = line.condition_type
+        if conditional_type == "if":  # Reset
+            self.prev_cond_type = ""
+            self.prev_result = False
+        if conditional_type != "else":
+            result = test_compiled_condition(line.raw_condition, values)
+        else:
+            result = True
+        chosen = (
+            result == True
+            and self.check_prev_cond_type(conditional_type)
+            and not self.prev_result
+        )
+        self.prev_cond_type = conditional_type
+        self.prev_result = result
+        return chosen
+
+    def check_prev_cond_type(self, cond_type: str) -> bool:
+        """
+        Returns True if cond_type is a legal conditional type to
+        follow self.prev_cond_type. Returns False otherwise.
+        """
+        prev = self.prev_cond_type
+        if prev == "else":
+            return False
+        elif prev == "elif" and cond_type == "if":
+            return False
+        return True
+
+
+@lru_cache(maxsize=None)
+def compile_condition(raw_condition: str) -> Any:
+    """
+    Returns 'raw_condition' compiled for eval(), or None if it is not a
+    valid Python expression.
+    """
+    try:
+        return compile(raw_condition, "<condition>", "eval")
+    except SyntaxError:
+        return None
+
+
+def test_compiled_condition(raw_condition: str, values: dict) -> Any:
+    """
+    Returns 'raw_condition' evaluated with 'values' as the local variables,
+    as eval_conditional() evaluates it. Returns 'raw_condition' itself if it
+    is not a valid Python expression.
+    """
+    code = compile_condition(raw_condition)
+    if code is None:
+        return raw_condition
+    return eval(code, globals(), dict(values))
+
+
+def fill_compiled_tokens(tokens: deque, values: dict, **config_options) -> deque:
+    """
+    Returns 'tokens' with each ValueSlot replaced by its value from 'values',
+    converted as swap_numeric_calcs() converts it.
+    """
+    rewrites = [partial(swap_values.rewrite, tex_results=values)]
+    rewrites += value_rewrites(**config_options)
+    slots = [
+        index for index, token in enumerate(tokens) if isinstance(token, ValueSlot)
+    ]
+    filled = deque(tokens)
+    swapped = rewrite_tokens(
+        [filled[index].name for index in slots], rewrites, **config_options
+    )
+    for index, value in zip(slots, swapped):
+        filled[index] = value
+    return filled
+
+
+def fill_result_slots(tokens: deque, values: dict) -> deque:
+    """
+    Returns 'tokens' with each ValueSlot replaced by its value from 'values',
+    unconverted, as fill_value_slot() does.
+    """
+    filled = deque([])
+    for token in tokens:
+        if isinstance(token, ValueSlot):
+            if token.required:
+                token = values[token.name]
+            else:
+                token = dict_get(values, token.name)
+        filled.append(token)
+    return filled
+
+
+@singledispatch
+def convert_compiled_line(
+    line, values: dict, conditions: CompiledConditions, **config_options
+):
+    """
+    Returns a copy of the compiled 'line' with the values swapped in, as
+    convert_line() returns a categorized line. Symbolic, intertext, and blank
+    lines are already converted when they are compiled.
+    """
+    return replace(line)
+
+
+@convert_compiled_line.register(CalcLine)
+@convert_compiled_line.register(LongCalcLine)
+def convert_compiled_calc(line, values, conditions, **config_options):
+    converted = fill_compiled_tokens(line.template.tokens, values, **config_options)
+    return replace(line, line=converted + fill_result_slots(line.line, values))
+
+
+@convert_compiled_line.register(NumericCalcLine)
+def convert_compiled_numericcalc(line, values, conditions, **config_options):
+    return replace(line, line=fill_result_slots(line.line, values))
+
+
+@convert_compiled_line.register(ParameterLine)
+def convert_compiled_parameter(line, values, conditions, **config_options):
+    *symbolic_portion, value = fill_result_slots(line.line, values)
+    value = rewrite_tokens([value], [swap_custom_symbols], **config_options)
+    value = swap_custom_brackets(value, **config_options)
+    value = rewrite_tokens(value, symbolic_rewrites(**config_options), **config_options)
+    return replace(line, line=deque(symbolic_portion) + value)
+
+
+@convert_compiled_line.register(ConditionalLine)
+def convert_compiled_conditional(line, values, conditions, **config_options):
+    converted = replace(line, true_condition=deque([]), true_expressions=deque([]))
+    if conditions(line, values):
+        converted.true_condition = fill_compiled_tokens(
+            line.condition, values, **config_options
+        )
+        for expression in line.expressions:
+            converted.true_expressions.append(
+                convert_compiled_line(expression, values, conditions, **config_options)
+            )
+    return converted
+
+
+def render_compiled_cell(
+    cell, values: dict, delimiters: Tuple[str, str], **config_options
+) -> str:
+    """
+    Returns the latex code of the compiled 'cell' with the 'values', as the
+    @handcalc function it was compiled from returns it.
+    """
+    conditions = CompiledConditions()
+    lines = deque(
+        [
+            convert_compiled_line(line, values, conditions, **config_options)
+            for line in cell.lines
+        ]
+    )
+    cell = replace(cell, calculated_results=values, lines=lines)
+    latex_code = format_cell(cell, **config_options).latex_code
+    raw_latex_code = "".join(latex_code.replace("\\[", "", 1).rsplit("\\]", 1))
+    left, right = delimiters
+    return left + raw_latex_code + right
+
+
+# Compilation
+
+
+@singledispatch
+def compile_line(line, **config_options):
+    """
+    Returns the categorized 'line' of a RenderPlan with everything that does
+    not depend on the calculated values converted to latex, ready for
+    convert_compiled_line(). Raises ValueError if the conversion of the line
+    depends on values that are not displayed, e.g. logarithms with a base.
+    """
+    return line
+
+
+@compile_line.register(CalcLine)
+@compile_line.register(LongCalcLine)
+def compile_calc(line, **config_options):
+    if line.template is None:
+        raise_uncompilable(line.line)
+    return replace(line, line=deque(flatten(line.line)))
+
+
+@compile_line.register(NumericCalcLine)
+def compile_numericcalc(line, **config_options):
+    *line_deque, result = line.line
+    line_deque = deque(line_deque)
+    check_compilable(line_deque)
+    symbolic_portion = swap_symbolic_calcs(line_deque, {}, **config_options)
+    return replace(line, line=symbolic_portion + result)
+
+
+@compile_line.register(ParameterLine)
+def compile_parameter(line, **config_options):
+    *parameter, value = line.line
+    if not isinstance(value, ValueSlot):
+        raise_uncompilable(line.line)
+    symbolic_portion = swap_symbolic_calcs(deque(parameter), {}, **config_options)
+    return replace(line, line=symbolic_portion + deque([value]))
+
+
+@compile_line.register(ConditionalLine)
+def compile_conditional(line, **config_options):
+    check_compilable(line.condition)
+    condition = numeric_template(line.condition, **config_options)
+    if line.condition_type != "else":
+        symbolic_portion = swap_symbolic_calcs(line.condition, {}, **config_options)
+        condition = (
+            symbolic_portion
+            + deque(["\\rightarrow", "\\left("])
+            + condition
+            + deque(["\\right)"])
+        )
+    expressions = deque(
+        [compile_line(expression, **config_options) for expression in line.expressions]
+    )
+    return replace(line, condition=condition, expressions=expressions)
+
+
+@compile_line.register(SymbolicLine)
+def compile_symbolic(line, **config_options):
+    check_compilable(line.line)
+    return replace(line, line=swap_symbolic_calcs(line.line, {}, **config_options))
+
+
+def check_compilable(tokens: deque) -> None:
+    """
+    Raises ValueError if the latex of 'tokens' depends on calculated values
+    or contains a function whose latex does (see VALUE_DEPENDENT_FUNCS).
+    """
+    for token in flatten(tokens):
+        if isinstance(token, ValueSlot) or (
+            isinstance(token, str)
+            and any(func in token for func in VALUE_DEPENDENT_FUNCS)
+        ):
+            raise_uncompilable(tokens)
+
+
+def raise_uncompilable(tokens: deque) -> None:
+    expression = " ".join(str(token) for token in flatten(tokens))
+    raise ValueError(
+        f"The line '{expression}' cannot be compiled ahead of time: its latex "
+        "depends on values that are not displayed (e.g. the base of a "
+        "logarithm or the function of an integral)."
+    )
+
+
+def compile_cell(plan: RenderPlan):
+    """
+    Returns a copy of the cell of 'plan' with its lines compiled by
+    compile_line().
+    """
+    lines = deque([compile_line(line, **plan.config) for line in plan.cell.lines])
+    return replace(plan.cell, calculated_results={}, lines=lines)
+
+
+def handcalc_functions(module: Any) -> Dict[str, Any]:
+    """
+    Returns the @handcalc functions defined in 'module' by name.
+    """
+    return {
+        name: obj
+        for name, obj in vars(module).items()
+        if hasattr(obj, "cell_source")
+        and hasattr(obj, "line_args")
+        and getattr(obj, "__module__", None) == module.__name__
+    }
+
+
+def generate_module(module: Any, config_options: Optional[dict] = None) -> str:
+    """
+    Returns the source of a standalone module with a render function for
+    each @handcalc function in 'module', e.g. render_beam_check(values) for
+    beam_check(). The render function returns the latex code that the
+    decorated function returns for a call whose local variables, closures,
+    and globals are 'values'.
+
+    The cells are compiled with 'config_options', by default the current
+    config. Raises ValueError if a cell cannot be compiled.
+    """
+    config = global_config.resolve_config(config_options)
+    functions = handcalc_functions(module)
+    if not functions:
+        raise ValueError(f"No @handcalc functions found in {module.__name__}.")
+    hand_module = sys.modules[format_cell.__module__]
+    roots = {(sys.modules[__name__], "render_compiled_cell"), (hand_module, "deque")}
+    definitions = []
+    renderers = []
+    for name, decorated in functions.items():
+        if getattr(decorated, "vectorized", False):
+            raise ValueError(
+                f"{name}() is vectorized; its results table cannot be compiled "
+                "ahead of time."
+            )
+        line_args = decorated.line_args
+        plan = build_render_plan(
+            decorated.cell_source,
+            line_args["override"],
+            config,
+            line_args["precision"],
+            line_args["sci_not"],
+        )
+        cell = compile_cell(plan)
+        class_names = set()
+        constant = f"{name.upper()}_CELL"
+        definitions.append(f"{constant} = {source_literal(cell, class_names)}\n")
+        definitions.append(
+            f"\n\ndef render_{name}(values: dict) -> str:\n"
+            f'    """\n'
+            f"    Returns the latex code of {name}() for the local variables in\n"
+            f"    'values'.\n"
+            f'    """\n'
+            f"    return render_compiled_cell(\n"
+            f"        {constant}, values, {decorated.delimiters!r}, **CONFIG\n"
+            f"    )\n\n\n"
+        )
+        renderers.append(f"    {name!r}: render_{name},\n")
+        roots.update((hand_module, class_name) for class_name in class_names)
+    header = textwrap.dedent(f'''\
+        """
+        Render functions for the @handcalc functions in {module.__name__},
+        generated by handcalcs {__version__}. Do not edit this module; generate
+        it again with 'handcalcs codegen' after changing the functions or the
+        handcalcs config.
+        """
+
+        ''')
+    return (
+        header
+        + runtime_source(roots)
+        + f"\n\nCONFIG = {source_literal(dict(config), set())}\n\n"
+        + "".join(definitions)
+        + "RENDERERS = {\n"
+        + "".join(renderers)
+        + "}\n"
+    )
+
+
+def source_literal(obj: Any, class_names: Set[str], indent: str = "") -> str:
+    """
+    Returns Python source that evaluates to 'obj', a compiled cell or one of
+    its parts, in the generated module. The names of the dataclasses it uses
+    are added to 'class_names'. Lines and cells are written with one field or
+    line per row, indented from 'indent'.
+    """
+    inner = indent + "    "
+    if is_dataclass(obj) and not isinstance(obj, type):
+        class_names.add(type(obj).__name__)
+        arguments = [
+            f"{obj_field.name}="
+            + source_literal(getattr(obj, obj_field.name), class_names, inner)
+            for obj_field in fields(obj)
+            if obj_field.init
+        ]
+        if not any(
+            is_line_or_cell(value)
+            or (isinstance(value, deque) and any(map(is_line_or_cell, value)))
+            for value in vars(obj).values()
+        ):
+            return f"{type(obj).__name__}({', '.join(arguments)})"
+        rows = "".join(f"{inner}{argument},\n" for argument in arguments)
+        return f"{type(obj).__name__}(\n{rows}{indent})"
+    if isinstance(obj, deque):
+        if any(map(is_line_or_cell, obj)):
+            item_indent = inner + "    "
+            rows = "".join(
+                f"{item_indent}{source_literal(item, class_names, item_indent)},\n"
+                for item in obj
+            )
+            return f"deque(\n{inner}[\n{rows}{inner}]\n{indent})"
+        return (
+            f"deque([{', '.join(source_literal(item, class_names) for item in obj)}])"
+        )
+    if isinstance(obj, list):
+        return f"[{', '.join(source_literal(item, class_names) for item in obj)}]"
+    if isinstance(obj, tuple):
+        items = [source_literal(item, class_names) for item in obj]
+        return f"({', '.join(items)}{',' if len(items) == 1 else ''})"
+    if isinstance(obj, dict):
+        items = (
+            f"{source_literal(key, class_names)}: {source_literal(value, class_names)}"
+            for key, value in obj.items()
+        )
+        return f"{{{', '.join(items)}}}"
+    if obj is None or isinstance(obj, (bool, int, str)):
+        return repr(obj)
+    if isinstance(obj, float) and obj == obj and abs(obj) != float("inf"):
+        return repr(obj)
+    raise ValueError(f"{obj!r} cannot be written into a generated module.")
+
+
+def is_line_or_cell(obj: Any) -> bool:
+    """
+    Returns True if 'obj' is a line, a cell, or a LineTemplate, i.e. any
+    dataclass instance other than a ValueSlot.
+    """
+    return is_dataclass(obj) and not isinstance(obj, (type, ValueSlot))
+
+
+def runtime_source(roots: Iterable[Tuple[Any, str]]) -> str:
+    """
+    Returns the source of the top-level definitions named in 'roots', pairs
+    of (module, name), and of every definition they use, in the order that
+    they appear in their modules. Names imported from a handcalcs module are
+    followed into that module; names imported from any other module must be
+    from one of the RUNTIME_IMPORTS and are imported by the returned source.
+
+    Raises ValueError if a definition uses a name imported from any other
+    module, e.g. pyparsing.
+    """
+    included = {}
+    imports = {}
+    depends_on = {}
+    pending = list(roots)
+    seen = set()
+    while pending:
+        module, name = pending.pop()
+        if (module.__name__, name) in seen:
+            continue
+        seen.add((module.__name__, name))
+        definitions, registrations, module_imports = module_index(module)
+        if name in definitions:
+            for node in definitions[name] + registrations.get(name, []):
+                included.setdefault(module.__name__, {})[node.lineno] = node
+                pending.extend((module, used) for used in used_names(node))
+        elif name in module_imports:
+            source_module, imported_name = module_imports[name]
+            if source_module.split(".")[0] == "handcalcs":
+                if imported_name is None or imported_name != name:
+                    raise ValueError(
+                        f"{module.__name__} must import '{name}' from "
+                        f"{source_module} by name to be copied."
+                    )
+                depends_on.setdefault(module.__name__, set()).add(source_module)
+                pending.append((importlib.import_module(source_module), name))
+            elif source_module.split(".")[0] in RUNTIME_IMPORTS:
+                imports.setdefault(source_module, set()).add(imported_name)
+            else:
+                raise ValueError(
+                    f"'{name}', imported from {source_module} by "
+                    f"{module.__name__}, cannot be used by a generated module."
+                )
+    module_order = []
+    visiting = set()
+
+    def visit(module_name: str) -> None:
+        if module_name in module_order or module_name in visiting:
+            return
+        visiting.add(module_name)
+        for dependency in sorted(depends_on.get(module_name, ())):
+            visit(dependency)
+        module_order.append(module_name)
+
+    for module_name in sorted(included):
+        visit(module_name)
+
+    import_lines = []
+    for source_module in sorted(imports):
+        names = imports[source_module]
+        if None in names:
+            import_lines.append(f"import {source_module}\n")
+        if names - {None}:
+            import_lines.append(
+                f"from {source_module} import {', '.join(sorted(names - {None}))}\n"
+            )
+    chunks = ["".join(import_lines)]
+    for module_name in module_order:
+        chunks.append(f"# From {module_name}")
+        source_lines = inspect.getsource(sys.modules[module_name]).splitlines(True)
+        for _, node in sorted(included.get(module_name, {}).items()):
+            decorators = getattr(node, "decorator_list", [])
+            first = min([node.lineno] + [decorator.lineno for decorator in decorators])
+            chunks.append("".join(source_lines[first - 1 : node.end_lineno]))
+    return "\n\n".join(chunks)
+
+
+@lru_cache(maxsize=None)
+def module_index(module: Any) -> tuple:
+    """
+    Returns the top-level definitions of 'module' by name, the functions
+    registered with each singledispatch function by its name, and the names
+    the module imports as (module name, imported name) pairs.
+    """
+    definitions = {}
+    registrations = {}
+    imports = {}
+    for node in ast.parse(inspect.getsource(module)).body:
+        if isinstance(node, (ast.FunctionDef, ast.ClassDef)):
+            definitions.setdefault(node.name, []).append(node)
+            for decorator in node.decorator_list:
+                if (
+                    isinstance(decorator, ast.Call)
+                    and isinstance(decorator.func, ast.Attribute)
+                    and decorator.func.attr == "register"
+                    and isinstance(decorator.func.value, ast.Name)
+                ):
+                    registrations.setdefault(decorator.func.value.id, []).append(node)
+        elif isinstance(node, (ast.Assign, ast.AnnAssign)):
+            targets = node.targets if isinstance(node, ast.Assign) else [node.target]
+            for target in targets:
+                for name_node in ast.walk(target):
+                    if isinstance(name_node, ast.Name):
+                        definitions.setdefault(name_node.id, []).append(node)
+        elif isinstance(node, ast.Import):
+            for alias in node.names:
+                imports[alias.asname or alias.name] = (alias.name, None)
+        elif isinstance(node, ast.ImportFrom) and node.module:
+            for alias in node.names:
+                imports[alias.asname or alias.name] = (node.module, alias.name)
+    return definitions, registrations, imports
+
+
+def used_names(node: ast.AST) -> Set[str]:
+    """
+    Returns the names that 'node', a top-level statement, uses from the
+    module's namespace: the names it loads that are neither builtins nor
+    bound within the function or class that loads them.
+    """
+    if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef, ast.Lambda)):
+        arguments = node.args
+        outer = list(arguments.defaults) + [
+            default for default in arguments.kw_defaults if default is not None
+        ]
+        all_arguments = arguments.posonlyargs + arguments.args + arguments.kwonlyargs
+        all_arguments += [arg for arg in (arguments.vararg, arguments.kwarg) if arg]
+        bound = {arg.arg for arg in all_arguments}
+        outer += [arg.annotation for arg in all_arguments if arg.annotation]
+        if isinstance(node, ast.Lambda):
+            body = [node.body]
+        else:
+            body = node.body
+            outer += node.decorator_list + ([node.returns] if node.returns else [])
+    elif isinstance(node, ast.ClassDef):
+        outer = node.decorator_list + node.bases + [kw.value for kw in node.keywords]
+        bound = set()
+        body = node.body
+    else:
+        return scope_names(node, set())
+    names = set()
+    for outer_node in outer:
+        names |= scope_names(outer_node, set())
+    loaded = set()
+    for statement in body:
+        loaded |= scope_names(statement, bound)
+    return names | (loaded - bound)
+
+
+def scope_names(node: ast.AST, bound: Set[str]) -> Set[str]:
+    """
+    Returns the names loaded by 'node' and by the functions and classes
+    nested in it, adding the names that 'node' binds to 'bound'.
+    """
+    loaded = set()
+    pending = [node]
+    while pending:
+        child = pending.pop()
+        if isinstance(
+            child, (ast.FunctionDef, ast.AsyncFunctionDef, ast.Lambda, ast.ClassDef)
+        ):
+            if not isinstance(child, ast.Lambda):
+                bound.add(child.name)
+            loaded |= used_names(child)
+            continue
+        if isinstance(child, ast.Name):
+            if isinstance(child.ctx, ast.Load):
+                loaded.add(child.id)
+            else:
+                bound.add(child.id)
+        elif isinstance(child, (ast.Import, ast.ImportFrom)):
+            bound.update(
+                (alias.asname or alias.name).split(".")[0] for alias in child.names
+            )
+        elif isinstance(child, ast.ExceptHandler) and child.name:
+            bound.add(child.name)
+        pending.extend(ast.iter_child_nodes(child))
+    return {name for name in loaded if not hasattr(builtins, name)}
+
+
+def verify_render_function(
+    decorated: Callable, render: Callable, calls: Iterable
+) -> int:
+    """
+    Returns the number of 'calls' for which 'render', a function of a
+    generated module, returns the same latex code as 'decorated', the
+    @handcalc function it was generated from. Raises ValueError at the first
+    call for which it does not. Each call is a tuple of positional arguments
+    or a dict of keyword arguments.
+    """
+    from handcalcs.decorator import _render_cell
+
+    checked = 0
+    left, right = decorated.delimiters
+    for call in calls:
+        args, kwargs = ((), call) if isinstance(call, dict) else (call, {})
+        scope = decorated.capture_scope(*args, **kwargs)
+        latex_code = _render_cell(
+            decorated.render_plans, decorated.cell_source, scope, decorated.line_args
+        )
+        expected = (
+            left + "".join(latex_code.replace("\\[", "", 1).rsplit("\\]", 1)) + right
+        )
+        rendered = render(scope)
+        if rendered != expected:
+            raise ValueError(
+                f"{render.__name__}() differs from {decorated.__name__}() for the "
+                f"arguments {call!r}:\n{rendered}\n!=\n{expected}"
+            )
+        checked += 1
+    return checked
+
+
+def load_module(target: str) -> Any:
+    """
+    Returns the module 'target', a path to a Python file or the dotted name
+    of an importable module.
+    """
+    if target.endswith(".py"):
+        path = pathlib.Path(target)
+        spec = importlib.util.spec_from_file_location(path.stem, path)
+        module = importlib.util.module_from_spec(spec)
+        sys.modules[path.stem] = module
+        spec.loader.exec_module(module)
+        return module
+    return importlib.import_module(target)
@@ -1,10 +1,28 @@
 __all__ = ["handcalc"]
 
-from typing import Optional, Callable
+import ast
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, Optional, Callable, Iterable, Iterator, Tuple, Union
 from functools import wraps, update_wrapper
+import importlib
 import inspect
+import io
+import itertools
+import textwrap
+import threading
+import tokenize
 import innerscope
-from .handcalcs import LatexRenderer
+from .caching import LRUCache
+from .global_config import ResolvedConfig, resolve_config
+from .handcalcs import RenderPlan, build_render_plan, render_plan
+from .vectorized import render_vectorized
+
+# The number of configs for which a decorated function keeps a RenderPlan
+RENDER_PLANS_PER_FUNCTION = 8
+
+# The number of calls sent to a worker process at a time by render_many()
+RENDER_MANY_CHUNKSIZE = 64
 
 
 def handcalc(
@@ -14,10 +32,12 @@ def handcalc(
     right: str = "",
     scientific_notation: Optional[bool] = None,
     jupyter_display: bool = False,
-    record: bool = False,
+    record: Union[bool, "CallHistory", "ColumnarCallHistory"] = False,
+    vectorized: bool = False,
+    lazy_latex: bool = False,
 ):
     def handcalc_decorator(func):
-        if record:
+        if record is True or not isinstance(record, bool):
             decorated = HandcalcsCallRecorder(
                 func,
                 override,
@@ -26,22 +46,42 @@ def handcalc(
                 right,
                 scientific_notation,
                 jupyter_display,
+                vectorized,
+                None if record is True else record,
+                lazy_latex,
             )
         else:
+            # The source is read and stripped to the function body once
+            cell_source = _func_source_to_cell(inspect.getsource(func))
+            capture_scope = ScopeCapture(func)
+            render_plans = LRUCache(RENDER_PLANS_PER_FUNCTION)
+            line_args = {
+                # A vectorized derivation is rendered once, symbolically
+                "override": "symbolic" if vectorized else override,
+                "precision": precision,
+                "sci_not": scientific_notation,
+            }
+
+            def render(scope: dict) -> str:
+                latex_code = _render_cell(render_plans, cell_source, scope, line_args)
+                if vectorized:
+                    latex_code = render_vectorized(
+                        latex_code,
+                        func,
+                        cell_source,
+                        scope,
+                        line_args,
+                        resolve_config(),
+                    )
+                return latex_code
 
             @wraps(func)
             def decorated(*args, **kwargs):
-                line_args = {
-                    "override": override,
-                    "precision": precision,
-                    "sci_not": scientific_notation,
-                }
-                func_source = inspect.getsource(func)
-                cell_source = _func_source_to_cell(func_source)
                 # innerscope retrieves values of locals, closures, and globals
-                scope = innerscope.call(func, *args, **kwargs)
-                renderer = LatexRenderer(cell_source, scope, line_args)
-                latex_code = renderer.render()
+                scope = capture_scope(*args, **kwargs)
+                if lazy_latex and not jupyter_display:
+                    return HandcalcResult(scope, render, (left, right))
+                latex_code = render(scope)
                 raw_latex_code = "".join(
                     latex_code.replace("\\[", "", 1).rsplit("\\]", 1)
                 )
@@ -56,14 +96,506 @@ def handcalc(
                     return scope.return_value
                 return (left + raw_latex_code + right, scope.return_value)
 
+            def render_many(
+                calls: Iterable[Union[dict, tuple]],
+                processes: Optional[int] = None,
+                chunksize: int = RENDER_MANY_CHUNKSIZE,
+            ) -> Iterator[Tuple[str, Any]]:
+                """
+                Returns an iterator of the (latex_code, return_value) of each
+                of 'calls' (see _render_many()).
+                """
+                return _render_many(decorated, calls, processes, chunksize)
+
+            decorated.cell_source = cell_source
+            decorated.capture_scope = capture_scope
+            decorated.render_plans = render_plans
+            decorated.line_args = line_args
+            decorated.delimiters = (left, right)
+            decorated.vectorized = vectorized
+            decorated.render_many = render_many
+
         return decorated
 
     return handcalc_decorator
 
 
+class ScopeCapture:
+    """
+    Calls 'func' and returns the innerscope Scope of the call, as
+    innerscope.call(func, ...) does, but with the innerscope function built
+    once instead of on every call: building it analyzes the bytecode of
+    'func', which costs far more than calling it.
+
+    The globals and closure variables that 'func' reads are looked up on
+    every call, as innerscope.call() would, and the innerscope function is
+    rebuilt from the analyzed one, without analyzing 'func' again, when any
+    of them has been assigned since the last call.
+
+    The values and the innerscope function built for them are kept as one
+    pair and replaced together, under a lock, so that concurrent calls never
+    see a function built for other values.
+
+    This relies on attributes of innerscope that are not part of its public
+    API (the versions it works with are pinned in pyproject.toml). If they
+    are missing, every call goes through innerscope.call().
+    """
+
+    def __init__(self, func: Callable):
+        self.func = func
+        try:
+            self._analyzed = innerscope.scoped_function(func)
+            names = (
+                self._analyzed.outer_scope.keys()
+                | self._analyzed.missing
+                | self._analyzed.builtin_names
+            )
+            self._rebuild = innerscope.core.ScopedFunction
+        except AttributeError:
+            self._analyzed = None
+            return
+        self._global_names = tuple(names - set(func.__code__.co_freevars))
+        self._lock = threading.Lock()
+        self._built = (self._current_outer_values(), self._analyzed)
+
+    def __call__(self, *args, **kwargs) -> "innerscope.core.Scope":
+        if self._analyzed is None:
+            return innerscope.call(self.func, *args, **kwargs)
+        values = self._current_outer_values()
+        outer, scoped = self._built
+        if self._changed(outer, values):
+            with self._lock:
+                outer, scoped = self._built
+                if self._changed(outer, values):
+                    scoped = self._rebuild(self._analyzed, values)
+                    self._built = (values, scoped)
+        return scoped(*args, **kwargs)
+
+    @staticmethod
+    def _changed(outer: dict, values: dict) -> bool:
+        """
+        Returns True if any of the 'values' of the globals and closure
+        variables is not the one in 'outer'.
+        """
+        return len(values) != len(outer) or any(
+            outer.get(name, outer) is not value for name, value in values.items()
+        )
+
+    def _current_outer_values(self) -> dict:
+        """
+        Returns the current values of the globals and closure variables of
+        'func', by name.
+        """
+        func_globals = self.func.__globals__
+        values = {
+            name: func_globals[name]
+            for name in self._global_names
+            if name in func_globals
+        }
+        closure = self.func.__closure__ or ()
+        for name, cell in zip(self.func.__code__.co_freevars, closure):
+            try:
+                values[name] = cell.cell_contents
+            except ValueError:  # An empty cell: not assigned yet
+                pass
+        return values
+
+
+class HandcalcResult:
+    """
+    The result of a call of a @handcalc(lazy_latex=True) function: its
+    'return_value' and the 'scope' of the call. The latex code is rendered
+    from the scope, with the config current at that time, when '.latex' or
+    _repr_latex_() is first read, and it is kept afterwards. Values in the
+    scope that are mutated after the call are rendered as they are then.
+
+    Unpacking the result, e.g. latex_code, value = func(...), gives the same
+    pair that the function returns without lazy_latex.
+    """
+
+    __slots__ = ("return_value", "scope", "_render", "_delimiters", "_latex_code")
+
+    def __init__(
+        self,
+        scope: dict,
+        render: Callable[[dict], str],
+        delimiters: Tuple[str, str] = ("", ""),
+    ):
+        self.return_value = scope.return_value
+        self.scope = scope
+        self._render = render
+        self._delimiters = delimiters
+        self._latex_code = None
+
+    def __repr__(self):
+        return f"{self.__class__.__name__}(return_value={self.return_value!r})"
+
+    @property
+    def latex(self) -> str:
+        """
+        The latex code, between the decorator's 'left' and 'right'.
+        """
+        raw_latex_code = "".join(
+            self._repr_latex_().replace("\\[", "", 1).rsplit("\\]", 1)
+        )
+        left, right = self._delimiters
+        return left + raw_latex_code + right
+
+    def _repr_latex_(self) -> str:
+        if self._latex_code is None:
+            self._latex_code = self._render(self.scope)
+        return self._latex_code
+
+    def __iter__(self) -> Iterator[Any]:
+        return iter((self.latex, self.return_value))
+
+
+class RecordedCall:
+    """
+    A call of a HandcalcsCallRecorder: its 'index' among the calls made, the
+    'args' and 'kwargs' it was called with, and its 'return_value'. The
+    latex code, without delimiters, is the '.latex' attribute. Unless it was
+    rendered during the call, it is rendered when it is first read, with the
+    config current at that time, from the 'scope' captured by the call, and
+    it is kept afterwards. Values in the scope that are mutated after the
+    call are rendered as they are then. A call recorded without its scope is
+    rendered by calling the function again with the same arguments.
+
+    Entries can also be read as call["return"] and call["latex"].
+    """
+
+    __slots__ = (
+        "index",
+        "args",
+        "kwargs",
+        "return_value",
+        "scope",
+        "_recorder",
+        "_latex",
+    )
+
+    def __init__(
+        self,
+        recorder: "HandcalcsCallRecorder",
+        index: int,
+        args: tuple,
+        kwargs: dict,
+        return_value: Any,
+        latex: Optional[str] = None,
+        scope: Optional[dict] = None,
+    ):
+        self.index = index
+        self.args = args
+        self.kwargs = kwargs
+        self.return_value = return_value
+        self.scope = scope
+        self._recorder = recorder
+        self._latex = latex
+
+    def __repr__(self):
+        return f"{self.__class__.__name__}(index={self.index}, return_value={self.return_value!r})"
+
+    @property
+    def latex(self) -> str:
+        if self._latex is None:
+            scope = self.scope
+            if scope is None:
+                scope = self._recorder.capture_scope(*self.args, **self.kwargs)
+            latex_code = self._recorder._latex_code(scope)
+            self._latex = "".join(latex_code.replace("\\[", "", 1).rsplit("\\]", 1))
+        return self._latex
+
+    def __getitem__(self, key: str) -> Any:
+        if key == "return":
+            return self.return_value
+        if key == "latex":
+            return self.latex
+        raise KeyError(key)
+
+
+class CallHistory:
+    """
+    The calls kept by a HandcalcsCallRecorder, oldest first. Every call is
+    counted in '.calls' but only these are kept:
+
+        every: one call in every 'every' calls, starting with the first
+        keep: the calls for which keep(call), a RecordedCall, is True
+        first: the first 'first' of the calls selected by 'every' and 'keep'
+        maxlen: the most recent 'maxlen' of the other selected calls
+
+    e.g. CallHistory(maxlen=100) keeps the last 100 calls and
+    CallHistory(first=10, maxlen=10) the first and last 10. With the
+    defaults, every call is kept.
+    """
+
+    def __init__(
+        self,
+        maxlen: Optional[int] = None,
+        every: int = 1,
+        first: int = 0,
+        keep: Optional[Callable[[RecordedCall], bool]] = None,
+    ):
+        if every < 1:
+            raise ValueError("'every' must be at least 1.")
+        self.maxlen = maxlen
+        self.every = every
+        self.first = first
+        self.keep = keep
+        self.calls = 0
+        self._first = []
+        self._recent = deque(maxlen=maxlen)
+
+    def __repr__(self):
+        return (
+            f"{self.__class__.__name__}(maxlen={self.maxlen}, every={self.every}, "
+            f"first={self.first}, calls={self.calls}, kept={len(self)})"
+        )
+
+    def add(self, call: RecordedCall) -> None:
+        """
+        Counts 'call' and keeps it if the retention options select it.
+        """
+        selected = self.calls % self.every == 0 and (
+            self.keep is None or self.keep(call)
+        )
+        self.calls += 1
+        if not selected:
+            return
+        if len(self._first) < self.first:
+            self._first.append(call)
+        else:
+            self._recent.append(call)
+
+    def clear(self) -> None:
+        self.calls = 0
+        self._first.clear()
+        self._recent.clear()
+
+    def __len__(self):
+        return len(self._first) + len(self._recent)
+
+    def __iter__(self) -> Iterator[RecordedCall]:
+        return itertools.chain(self._first, self._recent)
+
+    def __getitem__(self, index: Union[int, slice]) -> Any:
+        if isinstance(index, slice):
+            return list(self)[index]
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("CallHistory index out of range")
+        if index < len(self._first):
+            return self._first[index]
+        return self._recent[index - len(self._first)]
+
+
+class ColumnarCallHistory:
+    """
+    The calls of a HandcalcsCallRecorder stored by column, to keep the
+    record of a very large number of calls: one NumPy array for each
+    argument of the function, by name, and one for the return value, named
+    "return". A column of bools, ints, floats, or complex numbers is stored
+    with that dtype, promoted as needed, e.g. to float when a float follows
+    ints; a column of any other values, or of bools mixed with numbers, is
+    an object array.
+
+    Every call is kept. Reading an entry, e.g. history[10], returns a
+    RecordedCall of the stored values (as the column's dtype) whose latex
+    code is rendered, each time it is read, by calling the function again
+    with them.
+
+    NumPy is imported when the first call is added.
+    """
+
+    def __init__(self, capacity: int = 1024):
+        self.calls = 0
+        self._capacity = capacity
+        self._recorder = None
+        self._signature = None
+        self._names = None
+        self._columns = {}
+
+    def __repr__(self):
+        return f"{self.__class__.__name__}(calls={self.calls}, columns={list(self._columns)})"
+
+    def add(self, call: RecordedCall) -> None:
+        """
+        Adds the arguments and the return value of 'call' to the columns.
+        """
+        if self._signature is None:
+            self._recorder = call._recorder
+            self._signature = inspect.signature(call._recorder.callable)
+            parameters = self._signature.parameters.values()
+            if all(
+                parameter.kind <= parameter.POSITIONAL_OR_KEYWORD
+                for parameter in parameters
+            ):
+                self._names = tuple(self._signature.parameters) + ("return",)
+        if self._names and not call.kwargs and len(call.args) + 1 == len(self._names):
+            # A call with every argument given by position needs no binding
+            values = zip(self._names, call.args + (call.return_value,))
+        else:
+            bound = self._signature.bind(*call.args, **call.kwargs)
+            bound.apply_defaults()
+            values = dict(bound.arguments, **{"return": call.return_value}).items()
+        row = self.calls
+        if row == self._capacity:
+            self._capacity *= 2
+            for name, column in self._columns.items():
+                self._columns[name] = _resized(column, self._capacity)
+        for name, value in values:
+            column = self._columns.get(name)
+            if column is None:
+                column = self._columns[name] = _new_column(value, self._capacity)
+            kind = SCALAR_KINDS.get(type(value)) or _value_kind(value)
+            if kind != column.dtype.kind:
+                column = self._columns[name] = _promoted(column, kind)
+            try:
+                column[row] = value
+            except OverflowError:  # An int beyond int64
+                column = self._columns[name] = _promoted(column, "O")
+                column[row] = value
+        self.calls += 1
+
+    def columns(self) -> Dict[str, Any]:
+        """
+        Returns the columns, by name, trimmed to the number of calls. The
+        arrays are views of the columns' storage.
+        """
+        return {name: column[: self.calls] for name, column in self._columns.items()}
+
+    def render(self, row: int) -> str:
+        """
+        Returns the latex code, without delimiters, of the call in 'row'.
+        """
+        return self[row].latex
+
+    def to_npz(self, path: str) -> None:
+        """
+        Saves the columns to 'path' with numpy.savez_compressed(). Object
+        columns are pickled, so they are loaded with allow_pickle=True.
+        """
+        import numpy as np
+
+        np.savez_compressed(path, **self.columns())
+
+    def to_csv(self, path: str) -> None:
+        """
+        Writes the columns to 'path' as CSV, with a header row of their names.
+        """
+        import csv
+
+        columns = self.columns()
+        with open(path, "w", newline="", encoding="utf-8") as csv_file:
+            writer = csv.writer(csv_file)
+            writer.writerow(columns)
+            writer.writerows(zip(*(column.tolist() for column in columns.values())))
+
+    def clear(self) -> None:
+        self.calls = 0
+        self._columns.clear()
+
+    def __len__(self):
+        return self.calls
+
+    def __iter__(self) -> Iterator[RecordedCall]:
+        return (self[row] for row in range(self.calls))
+
+    def __getitem__(self, row: int) -> RecordedCall:
+        if row < 0:
+            row += self.calls
+        if not 0 <= row < self.calls:
+            raise IndexError("ColumnarCallHistory index out of range")
+        args = []
+        kwargs = {}
+        for name, parameter in self._signature.parameters.items():
+            value = _column_value(self._columns[name], row)
+            if parameter.kind is parameter.VAR_POSITIONAL:
+                args.extend(value)
+            elif parameter.kind is parameter.VAR_KEYWORD:
+                kwargs.update(value)
+            elif parameter.kind is parameter.KEYWORD_ONLY:
+                kwargs[name] = value
+            else:
+                args.append(value)
+        return_value = _column_value(self._columns["return"], row)
+        return RecordedCall(self._recorder, row, tuple(args), kwargs, return_value)
+
+
+# The kinds of NumPy dtype that a ColumnarCallHistory stores, in the order
+# they are promoted (bools only to object); any other value is stored in an
+# object column
+COLUMN_KINDS = {"b": "bool", "i": "int64", "f": "float64", "c": "complex128"}
+SCALAR_KINDS = {bool: "b", int: "i", float: "f", complex: "c"}
+
+
+def _value_kind(value: Any) -> str:
+    """
+    Returns the dtype kind of the column that 'value' is stored in.
+    """
+    if isinstance(value, bool):
+        return "b"
+    kind = getattr(getattr(value, "dtype", None), "kind", None)
+    if getattr(value, "ndim", None) == 0 and kind in COLUMN_KINDS:
+        return kind
+    if kind == "u" and getattr(value, "ndim", None) == 0:
+        value = int(value)
+    if isinstance(value, int):
+        return "i" if -(2**63) <= value < 2**63 else "O"
+    if isinstance(value, float):
+        return "f"
+    if isinstance(value, complex):
+        return "c"
+    return "O"
+
+
+def _new_column(value: Any, capacity: int) -> Any:
+    import numpy as np
+
+    return np.zeros(capacity, dtype=COLUMN_KINDS.get(_value_kind(value), object))
+
+
+def _resized(column: Any, capacity: int) -> Any:
+    import numpy as np
+
+    resized = np.zeros(capacity, dtype=column.dtype)
+    resized[: len(column)] = column
+    return resized
+
+
+def _promoted(column: Any, kind: str) -> Any:
+    """
+    Returns 'column' converted to a dtype that also holds values of 'kind'.
+    """
+    kinds = list(COLUMN_KINDS)
+    if kind == "O" or column.dtype.kind == "O":
+        return column.astype(object)
+    if "b" in (kind, column.dtype.kind):
+        # Numbers would turn bools into 1 and 0, and bools into numbers
+        return column.astype(object)
+    if kinds.index(kind) < kinds.index(column.dtype.kind):
+        return column
+    return column.astype(COLUMN_KINDS[kind])
+
+
+def _column_value(column: Any, row: int) -> Any:
+    """
+    Returns the value in 'row' of 'column' as a Python object.
+    """
+    value = column[row]
+    return (
+        value.item() if hasattr(value, "item") and column.dtype.kind != "O" else value
+    )
+
+
 class HandcalcsCallRecorder:
     """
     Records function calls for the func stored in .callable
+
+    The calls are kept in '_history', by default a CallHistory that keeps
+    every call. With '_lazy_latex', calling it returns a HandcalcResult and
+    the calls are kept with their scope, unrendered, until their latex code
+    is read; otherwise every call is rendered.
     """
 
     def __init__(
@@ -75,38 +607,62 @@ class HandcalcsCallRecorder:
         _right: str = "",
         _scientific_notation: Optional[bool] = None,
         _jupyter_display: bool = False,
+        _vectorized: bool = False,
+        _history: Optional[Union[CallHistory, ColumnarCallHistory]] = None,
+        _lazy_latex: bool = False,
     ):
         self.callable = func
-        self.history = list()
+        self.history = CallHistory() if _history is None else _history
         self._override = _override
         self._precision = _precision
         self._left = _left
         self._right = _right
         self._scientific_notation = _scientific_notation
         self._jupyter_display = _jupyter_display
+        self._lazy_latex = _lazy_latex
+        self.vectorized = _vectorized
+        self.cell_source = _func_source_to_cell(inspect.getsource(func))
+        self.capture_scope = ScopeCapture(func)
+        self.render_plans = LRUCache(RENDER_PLANS_PER_FUNCTION)
+        self.line_args = {
+            "override": "symbolic" if _vectorized else _override,
+            "precision": _precision,
+            "sci_not": _scientific_notation,
+        }
+        self.delimiters = (_left, _right)
         update_wrapper(self, func)
 
     def __repr__(self):
-        return f"{self.__class__.__name__}({self.callable.__name__}, num_of_calls: {len(self.history)})"
+        return f"{self.__class__.__name__}({self.callable.__name__}, num_of_calls: {self.calls})"
 
     @property
     def calls(self):
-        return len(self.history)
+        return self.history.calls
 
     def __call__(self, *args, **kwargs):
-        line_args = {
-            "override": self._override,
-            "precision": self._precision,
-            "sci_not": self._scientific_notation,
-        }
-        func_source = inspect.getsource(self.callable)
-        cell_source = _func_source_to_cell(func_source)
         # innerscope retrieves values of locals, closures, and globals
-        scope = innerscope.call(self.callable, *args, **kwargs)
-        renderer = LatexRenderer(cell_source, scope, line_args)
-        latex_code = renderer.render()
+        scope = self.capture_scope(*args, **kwargs)
+        if self._lazy_latex and not self._jupyter_display:
+            result = HandcalcResult(scope, self._latex_code, self.delimiters)
+            self.history.add(
+                RecordedCall(
+                    self,
+                    self.calls,
+                    args,
+                    kwargs,
+                    result.return_value,
+                    # A dict of the values, which does not keep the call's frame
+                    scope=dict(scope),
+                )
+            )
+            return result
+        latex_code = self._latex_code(scope)
         raw_latex_code = "".join(latex_code.replace("\\[", "", 1).rsplit("\\]", 1))
-        self.history.append({"return": scope.return_value, "latex": raw_latex_code})
+        self.history.add(
+            RecordedCall(
+                self, self.calls, args, kwargs, scope.return_value, raw_latex_code
+            )
+        )
         if self._jupyter_display:
             try:
                 from IPython.display import Latex, display
@@ -118,6 +674,200 @@ class HandcalcsCallRecorder:
             return scope.return_value
         return (self._left + raw_latex_code + self._right, scope.return_value)
 
+    def _latex_code(self, scope: dict) -> str:
+        """
+        Returns the latex code of the cell rendered with the values in 'scope'.
+        """
+        latex_code = _render_cell(
+            self.render_plans, self.cell_source, scope, self.line_args
+        )
+        if self.vectorized:
+            latex_code = render_vectorized(
+                latex_code,
+                self.callable,
+                self.cell_source,
+                scope,
+                self.line_args,
+                resolve_config(),
+            )
+        return latex_code
+
+    def render_many(
+        self,
+        calls: Iterable[Union[dict, tuple]],
+        processes: Optional[int] = None,
+        chunksize: int = RENDER_MANY_CHUNKSIZE,
+    ) -> Iterator[Tuple[str, Any]]:
+        """
+        Returns an iterator of the (latex_code, return_value) of each of
+        'calls', as render_many() of a @handcalc function does, adding each
+        one to the history as it is returned.
+        """
+        pending = deque()
+
+        def queued(calls):
+            for call in calls:
+                pending.append(call)
+                yield call
+
+        for latex_code, return_value in _render_many(
+            self, queued(calls), processes, chunksize
+        ):
+            call = pending.popleft()
+            args, kwargs = ((), call) if isinstance(call, dict) else (call, {})
+            raw_latex_code = latex_code[
+                len(self._left) : len(latex_code) - len(self._right)
+            ]
+            self.history.add(
+                RecordedCall(
+                    self, self.calls, args, kwargs, return_value, raw_latex_code
+                )
+            )
+            yield latex_code, return_value
+
+
+def _render_many(
+    decorated: Callable,
+    calls: Iterable[Union[dict, tuple]],
+    processes: Optional[int] = None,
+    chunksize: int = RENDER_MANY_CHUNKSIZE,
+) -> Iterator[Tuple[str, Any]]:
+    """
+    Returns an iterator of the (latex_code, return_value) of 'decorated' for
+    each of 'calls', a tuple of positional arguments or a dict of keyword
+    arguments, in order. The cell is rendered with the RenderPlan of the
+    config that is current when the iteration starts, and the latex code is
+    returned even if the function was decorated with jupyter_display=True.
+
+    If 'processes' is given, the calls are rendered by that many worker
+    processes, 'chunksize' calls at a time. Only a few chunks per process
+    are pending at once, so 'calls' can be a generator of any length. The
+    function must be defined at the top level of an importable module.
+    """
+    config = resolve_config()
+    if not processes:
+        plan = _get_render_plan(decorated, config)
+        for call in calls:
+            yield _render_call(decorated, plan, call)
+        return
+    function_ref = _function_ref(decorated)
+    calls = iter(calls)
+    with ProcessPoolExecutor(max_workers=processes) as executor:
+        pending = deque()
+        while True:
+            chunk = list(itertools.islice(calls, chunksize))
+            if chunk:
+                pending.append(
+                    executor.submit(_render_chunk, function_ref, dict(config), chunk)
+                )
+            if pending and (not chunk or len(pending) > 2 * processes):
+                yield from pending.popleft().result()
+            elif not chunk:
+                return
+
+
+def _render_call(
+    decorated: Callable, plan: RenderPlan, call: Union[dict, tuple]
+) -> Tuple[str, Any]:
+    """
+    Returns the (latex_code, return_value) of 'decorated' called with 'call',
+    a tuple of positional arguments or a dict of keyword arguments, rendered
+    with 'plan'.
+    """
+    args, kwargs = ((), call) if isinstance(call, dict) else (call, {})
+    scope = decorated.capture_scope(*args, **kwargs)
+    latex_code = render_plan(plan, scope)
+    if decorated.vectorized:
+        latex_code = render_vectorized(
+            latex_code,
+            decorated.__wrapped__,
+            decorated.cell_source,
+            scope,
+            decorated.line_args,
+            plan.config,
+        )
+    raw_latex_code = "".join(latex_code.replace("\\[", "", 1).rsplit("\\]", 1))
+    left, right = decorated.delimiters
+    return (left + raw_latex_code + right, scope.return_value)
+
+
+def _render_chunk(function_ref: Tuple[str, str], config_options: dict, chunk: list):
+    """
+    Returns the (latex_code, return_value) of each call in 'chunk' for the
+    decorated function named by 'function_ref', rendered in a worker process
+    with 'config_options'.
+    """
+    decorated = _resolve_function(function_ref)
+    plan = _get_render_plan(decorated, resolve_config(config_options))
+    return [_render_call(decorated, plan, call) for call in chunk]
+
+
+def _function_ref(decorated: Callable) -> Tuple[str, str]:
+    """
+    Returns the module and qualified name by which a worker process imports
+    'decorated'. Raises ValueError if 'decorated' cannot be imported by them.
+    """
+    function_ref = (decorated.__module__, decorated.__qualname__)
+    try:
+        found = _resolve_function(function_ref)
+    except (ImportError, AttributeError):
+        found = None
+    if found is not decorated:
+        raise ValueError(
+            f"render_many() can only use worker processes for a function defined "
+            f"at the top level of a module; {decorated.__qualname__} is not."
+        )
+    return function_ref
+
+
+def _resolve_function(function_ref: Tuple[str, str]) -> Callable:
+    module_name, qualname = function_ref
+    found = importlib.import_module(module_name)
+    for name in qualname.split("."):
+        found = getattr(found, name)
+    return found
+
+
+def _get_render_plan(decorated: Callable, config: ResolvedConfig) -> RenderPlan:
+    """
+    Returns the RenderPlan of 'decorated' for 'config', building it and
+    keeping it in the decorated function's 'render_plans' if it is new.
+    """
+    plan = decorated.render_plans.get(config)
+    if plan is None:
+        plan = build_render_plan(
+            decorated.cell_source,
+            decorated.line_args["override"],
+            config,
+            decorated.line_args["precision"],
+            decorated.line_args["sci_not"],
+        )
+        decorated.render_plans.set(config, plan)
+    return plan
+
+
+def _render_cell(
+    render_plans: LRUCache, cell_source: str, scope: dict, line_args: dict
+) -> str:
+    """
+    Returns the latex code of 'cell_source' rendered with the values in
+    'scope'. The cell is categorized and its lines compiled into a
+    RenderPlan once for each config; 'render_plans' keeps the plans of the
+    decorated function.
+    """
+    config = resolve_config()
+    plan = render_plans.get(config)
+    if plan is None:
+        plan = build_render_plan(
+            cell_source,
+            line_args["override"],
+            config,
+            line_args["precision"],
+            line_args["sci_not"],
+        )
+        render_plans.set(config, plan)
+    return render_plan(plan, scope)
+
 
 def _func_source_to_cell(source: str):
     """
@@ -125,33 +875,54 @@ def _func_source_to_cell(source: str):
     or return statement.
 
     `source` is a string representing a function's complete source code.
+    The function is parsed with `ast` so that only the signature (and its
+    decorators), the doc string, return statements, and any nested function
+    or class definitions are removed; all other lines are kept as written.
     """
     source_lines = source.split("\n")
-    acc = []
-    doc_string = False
-    for line in source_lines:
-        if (
-            not doc_string
-            and line.lstrip(" \t").startswith('"""')
-            and line.lstrip(" \t").rstrip().endswith('"""', 3)
-        ):
-            doc_string = False
-            continue
-        elif (
-            not doc_string
-            and line.lstrip(" \t").startswith('"""')
-            and not line.lstrip(" \t").rstrip().endswith('"""', 3)
-        ):
-            doc_string = True
-            continue
-        elif doc_string and '"""' in line:
-            doc_string = False
-            continue
-        if (
-            "def" not in line
-            and not doc_string
-            and "return" not in line
-            and "@" not in line
-        ):
-            acc.append(line)
+    dedented = textwrap.dedent(source)
+    func_def = ast.parse(dedented).body[0]
+    if not isinstance(func_def, (ast.FunctionDef, ast.AsyncFunctionDef)):
+        raise ValueError("handcalc can only be applied to a function definition.")
+    skipped = set()
+    body = func_def.body
+    if (
+        isinstance(body[0], ast.Expr)
+        and isinstance(body[0].value, ast.Constant)
+        and isinstance(body[0].value.value, str)
+    ):
+        skipped.update(range(body[0].lineno, body[0].end_lineno + 1))
+    for statement in body:
+        for node in ast.walk(statement):
+            if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)):
+                first = min([node.lineno] + [d.lineno for d in node.decorator_list])
+                skipped.update(range(first, node.end_lineno + 1))
+            elif isinstance(node, ast.Return):
+                skipped.update(range(node.lineno, node.end_lineno + 1))
+    header_end = _signature_end(dedented)
+    acc = [
+        line
+        for line_no, line in enumerate(source_lines, start=1)
+        if line_no > header_end and line_no not in skipped
+    ]
     return "\n".join(acc)
+
+
+def _signature_end(source: str) -> int:
+    """
+    Returns the line number of the colon that ends the signature of the
+    first function defined in 'source'.
+    """
+    depth = 0
+    in_signature = False
+    for token in tokenize.generate_tokens(io.StringIO(source).readline):
+        if token.type == tokenize.NAME and token.string == "def":
+            in_signature = True
+        elif in_signature and token.type == tokenize.OP:
+            if token.string in "([{":
+                depth += 1
+            elif token.string in ")]}":
+                depth -= 1
+            elif token.string == ":" and depth == 0:
+                return token.start[0]
+    raise ValueError("No function signature found in 'source'.")
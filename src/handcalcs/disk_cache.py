@@ -0,0 +1,194 @@
+#    Copyright 2020 Connor Ferster
+
+#    Licensed under the Apache License, Version 2.0 (the "License");
+#    you may not use this file except in compliance with the License.
+#    You may obtain a copy of the License at
+
+#        http://www.apache.org/licenses/LICENSE-2.0
+
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS,
+#    WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#    See the License for the specific language governing permissions and
+#    limitations under the License.
+"""
+A persistent store of rendered LaTeX, kept in an SQLite file so that it
+survives kernel restarts.
+
+Entries are addressed by a digest of everything that determines the
+rendered output (see handcalcs.caching.stable_digest()). The least recently
+used entries are removed once the store holds more than 'maxsize' entries.
+Any error reading or writing the file is treated as a miss so that a
+broken cache never stops a cell from rendering.
+"""
+
+import pathlib
+import sqlite3
+import threading
+from typing import Dict, NamedTuple, Optional
+
+from handcalcs.caching import CacheInfo
+
+FILE_NAME = "render_cache.sqlite3"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS entries (
+    key TEXT PRIMARY KEY,
+    latex TEXT NOT NULL,
+    last_used INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS entries_last_used ON entries (last_used);
+"""
+
+NEXT_USE = "(SELECT COALESCE(MAX(last_used), 0) + 1 FROM entries)"
+
+
+class DiskCacheStats(NamedTuple):
+    path: str
+    entries: int
+    maxsize: int
+    size_bytes: int
+
+
+class DiskCache:
+    """
+    A size-bounded, least recently used store of rendered LaTeX in the file
+    FILE_NAME within 'directory'. The directory and file are created on first
+    use.
+    """
+
+    def __init__(self, directory: str, maxsize: int = 2048):
+        self.directory = directory
+        self.path = pathlib.Path(directory).expanduser() / FILE_NAME
+        self.maxsize = max(maxsize, 0)
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.RLock()
+        self._connection = None
+
+    def __repr__(self):
+        return f"{self.__class__.__name__}({str(self.path)!r}, maxsize={self.maxsize})"
+
+    def get(self, key: str) -> Optional[str]:
+        """
+        Returns the LaTeX stored for 'key' and marks it as most recently used.
+        Returns None if 'key' is not in the cache or the file cannot be read.
+        """
+        with self._lock:
+            try:
+                connection = self._connect()
+                with connection:
+                    row = connection.execute(
+                        "SELECT latex FROM entries WHERE key = ?", (key,)
+                    ).fetchone()
+                    if row is not None:
+                        connection.execute(
+                            f"UPDATE entries SET last_used = {NEXT_USE} WHERE key = ?",
+                            (key,),
+                        )
+            except (sqlite3.Error, OSError):
+                row = None
+            if row is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            return row[0]
+
+    def set(self, key: str, latex: str) -> None:
+        """
+        Stores 'latex' for 'key', removing the least recently used entries if
+        the cache is over its size. Does nothing if the file cannot be written.
+        """
+        if not self.maxsize:
+            return
+        with self._lock:
+            try:
+                connection = self._connect()
+                with connection:
+                    connection.execute(
+                        "INSERT OR REPLACE INTO entries (key, latex, last_used)"
+                        f" VALUES (?, ?, {NEXT_USE})",
+                        (key, latex),
+                    )
+                    evicted = connection.execute(
+                        "DELETE FROM entries WHERE key IN (SELECT key FROM entries"
+                        " ORDER BY last_used DESC LIMIT -1 OFFSET ?)",
+                        (self.maxsize,),
+                    )
+                self.evictions += max(evicted.rowcount, 0)
+            except (sqlite3.Error, OSError):
+                pass
+
+    def clear(self) -> int:
+        """
+        Returns the number of entries removed after emptying the cache file
+        and resetting the statistics.
+        """
+        with self._lock:
+            removed = 0
+            if self.path.exists():
+                connection = self._connect()
+                with connection:
+                    removed = connection.execute("DELETE FROM entries").rowcount
+                connection.execute("VACUUM")
+            self.hits = 0
+            self.misses = 0
+            self.evictions = 0
+            return removed
+
+    def info(self) -> CacheInfo:
+        """
+        Returns the hits, misses, and evictions of this session along with
+        the maximum and current number of entries in the file.
+        """
+        return CacheInfo(
+            self.hits, self.misses, self.evictions, self.maxsize, self.stats().entries
+        )
+
+    def stats(self) -> DiskCacheStats:
+        """
+        Returns the location, number of entries, maximum number of entries, and
+        size in bytes of the cache file.
+        """
+        with self._lock:
+            entries = 0
+            size_bytes = 0
+            if self.path.exists():
+                connection = self._connect()
+                entries = connection.execute("SELECT COUNT(*) FROM entries").fetchone()[
+                    0
+                ]
+                size_bytes = self.path.stat().st_size
+            return DiskCacheStats(str(self.path), entries, self.maxsize, size_bytes)
+
+    def close(self) -> None:
+        with self._lock:
+            if self._connection is not None:
+                self._connection.close()
+                self._connection = None
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._connection is None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            connection = sqlite3.connect(
+                str(self.path), timeout=5.0, check_same_thread=False
+            )
+            connection.executescript(SCHEMA)
+            self._connection = connection
+        return self._connection
+
+
+_disk_caches: Dict[str, DiskCache] = {}
+
+
+def get_disk_cache(directory: str, maxsize: int) -> DiskCache:
+    """
+    Returns the DiskCache for 'directory', opening it on first use and
+    updating its 'maxsize' on later uses.
+    """
+    disk_cache = _disk_caches.get(directory)
+    if disk_cache is None:
+        disk_cache = _disk_caches[directory] = DiskCache(directory, maxsize)
+    disk_cache.maxsize = max(maxsize, 0)
+    return disk_cache
@@ -0,0 +1,248 @@
+#    Copyright 2020 Connor Ferster
+
+#    Licensed under the Apache License, Version 2.0 (the "License");
+#    you may not use this file except in compliance with the License.
+#    You may obtain a copy of the License at
+
+#        http://www.apache.org/licenses/LICENSE-2.0
+
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS,
+#    WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#    See the License for the specific language governing permissions and
+#    limitations under the License.
+"""
+The kinds of the tokens of a line parsed by handcalcs.handcalcs.expr_parser(),
+and a compact tree form of the parsed line.
+
+expr_parser() fixes the kind of each str token once, when the line is
+parsed, by making it a Name, Number, or Op. These are str subclasses, so the
+parsed deque, and every transform that passes a token along, carries its
+kind with it, and token_kind() reads the kind from the type of the token.
+Only plain str tokens are classified by their text: LaTeX written by the
+transforms, e.g. "\\left(" or "\\frac{", is never taken for a Name.
+
+from_deque() and to_deque() convert between the parsed deque and a tree of
+Group and Call nodes whose leaves are the tokens themselves. Any other item
+(e.g. a calculated value swapped into the expression) becomes a Value.
+"""
+
+from collections import deque
+import re
+from typing import Any, Iterator, List
+
+OPERATORS = frozenset("= + - * / // % ** ~ , < > >= <= == !=".split())
+NUMBER = re.compile(
+    r"(?:\d+\.?\d*|\.\d+)(?:[eE][+-]?\d+)?"
+    r"(?:(?:[+-](?:\d+\.?\d*|\.\d+)(?:[eE][+-]?\d+)?)?j)?"
+)
+# The text of a plain str token that is a name: a name as the grammar reads
+# it, or one already rewritten with primes or a LaTeX symbol, e.g. "\\Delta_T"
+NAME = re.compile(r"(?:\\[A-Za-z]+|[\w.'])+")
+
+
+class Token(str):
+    """
+    A str token of a parsed line whose kind is fixed by its class.
+    """
+
+    __slots__ = ()
+
+
+class Name(Token):
+    __slots__ = ()
+
+
+class Number(Token):
+    __slots__ = ()
+
+
+class Op(Token):
+    __slots__ = ()
+
+
+TOKEN_KINDS = frozenset([Name, Number, Op])
+
+
+class Node:
+    __slots__ = ()
+
+    def __eq__(self, other):
+        return type(self) is type(other) and all(
+            getattr(self, slot) == getattr(other, slot) for slot in self.__slots__
+        )
+
+    def __repr__(self):
+        fields = ", ".join(repr(getattr(self, slot)) for slot in self.__slots__)
+        return f"{self.__class__.__name__}({fields})"
+
+
+class Value(Node):
+    __slots__ = ("value",)
+
+    def __init__(self, value: Any):
+        self.value = value
+
+
+class Group(Node):
+    __slots__ = ("items",)
+
+    def __init__(self, items: list):
+        self.items = items
+
+
+class Call(Node):
+    __slots__ = ("name", "args")
+
+    def __init__(self, name: Name, args: list):
+        self.name = name
+        self.args = args
+
+
+def token_kind(token: Any) -> type:
+    """
+    Returns the kind of a single item of a parsed deque: Name, Number, Op,
+    or Value for anything else, e.g. a calculated value or LaTeX written by
+    a transform.
+    """
+    kind = type(token)
+    if kind in TOKEN_KINDS:
+        return kind
+    if not isinstance(token, str):
+        return Value
+    return text_kind(token)
+
+
+def text_kind(text: str) -> type:
+    """
+    Returns the kind of a plain str token, by its text.
+    """
+    if text in OPERATORS:
+        return Op
+    if NUMBER.fullmatch(text):
+        return Number
+    if NAME.fullmatch(text):
+        return Name
+    return Value
+
+
+def typed_tokens(d: deque) -> deque:
+    """
+    Returns 'd', a deque parsed from a line, with each str token made a Name,
+    Number, or Op. Every str token of a parsed line that is not an operator
+    or a number is a name.
+    """
+    acc = deque([])
+    stack = [(iter(d), acc)]
+    while stack:
+        items, target = stack[-1]
+        for item in items:
+            if isinstance(item, deque):
+                nested = deque([])
+                target.append(nested)
+                stack.append((iter(item), nested))
+                break
+            if type(item) is str:
+                kind = text_kind(item)
+                item = (Name if kind is Value else kind)(item)
+            target.append(item)
+        else:
+            stack.pop()
+    return acc
+
+
+def token_node(token: Any) -> Any:
+    """
+    Returns the leaf of the tree for a single item of a parsed deque.
+    """
+    kind = token_kind(token)
+    if kind is Value:
+        return Value(token)
+    if type(token) is kind:
+        return token
+    return kind(token)
+
+
+def container_node(items: list) -> Node:
+    """
+    Returns a Call if 'items' are a function name followed by, at most, one
+    argument node (a single argument or a Group of comma-separated arguments).
+    Returns a Group otherwise.
+    """
+    if (
+        items
+        and len(items) <= 2
+        and type(items[0]) is Name
+        and type(items[-1]) is not Op
+    ):
+        return Call(items[0], items[1:])
+    return Group(items)
+
+
+def from_deque(d: deque) -> Group:
+    """
+    Returns the parsed deque, 'd', as a tree of nodes. The outermost deque is
+    always returned as a Group.
+    """
+    root = []
+    stack = [(iter(d), root)]
+    while stack:
+        items, target = stack[-1]
+        for item in items:
+            if isinstance(item, deque):
+                stack.append((iter(item), []))
+                break
+            target.append(token_node(item))
+        else:
+            stack.pop()
+            if stack:
+                stack[-1][1].append(container_node(target))
+    return Group(root)
+
+
+def to_deque(node: Node) -> deque:
+    """
+    Returns 'node' as the nested deque of tokens used by the deque
+    transforms in handcalcs.handcalcs.
+    """
+    acc = deque([])
+    stack = [(iter(children(node)), acc)]
+    while stack:
+        nodes, target = stack[-1]
+        for child in nodes:
+            if isinstance(child, (Group, Call)):
+                nested = deque([])
+                target.append(nested)
+                stack.append((iter(children(child)), nested))
+                break
+            target.append(child.value if isinstance(child, Value) else child)
+        else:
+            stack.pop()
+    return acc
+
+
+def children(node: Node) -> list:
+    """
+    Returns the nodes contained in 'node', in source order.
+    """
+    if isinstance(node, Group):
+        return node.items
+    if isinstance(node, Call):
+        return [node.name, *node.args]
+    return []
+
+
+def walk(node: Any) -> Iterator[Any]:
+    """
+    Yields 'node' and every node within it, depth-first in source order.
+    """
+    stack = [node]
+    while stack:
+        node = stack.pop()
+        yield node
+        kind = type(node)
+        if kind is Group:
+            stack.extend(reversed(node.items))
+        elif kind is Call:
+            stack.extend(reversed(node.args))
+            stack.append(node.name)
@@ -12,9 +12,18 @@
 #    See the License for the specific language governing permissions and
 #    limitations under the License.
 
+from collections.abc import Mapping
+from contextlib import contextmanager
+import contextvars
+import copy
+from functools import lru_cache
 import json
-from typing import Any
+from typing import Any, Iterator, Optional
 import pathlib
+from types import MappingProxyType
+
+from handcalcs.caching import freeze, stable_digest
+from handcalcs.constants import GREEK_LOWER, GREEK_UPPER
 
 _config = {}
 
@@ -45,17 +54,218 @@ _OPTIONS_TEXT = "Configuration can be set on the following options:\n\t" + "\n\t
 
 
 def set_option(option: str, value: Any) -> None:
-    if option in _config and isinstance(value, type(_config[option])):
-        _config[option] = value
-    elif option in _config and not isinstance(value, type(_config[option])):
+    _validate_option(option, value)
+    _config[option] = value
+
+
+def _validate_option(option: str, value: Any) -> None:
+    if option in _config and not isinstance(value, type(_config[option])):
         raise ValueError(
             f"Option, {option}, must be set with a value of type {type(_config[option])},"
             f" not {type(value)}."
         )
-    else:
+    elif option not in _config:
         raise ValueError(f"{option} is not a valid option that can be set.")
 
 
+# The values that a ResolvedConfig derives from the options and holds
+# alongside them
+DERIVED_OPTIONS = ("line_end", "opener", "closer", "begin", "end", "greek")
+
+# The options that size the process-wide caches or choose the parser backend,
+# which are read from the global config alone
+PROCESS_OPTIONS = frozenset(
+    [
+        "parser_backend",
+        "parse_cache_size",
+        "packrat_cache_size",
+        "line_template_cache_size",
+        "name_cache_size",
+        "render_cache_size",
+        "disk_cache_size",
+    ]
+)
+
+
+@lru_cache(maxsize=32)
+def greek_symbols(greek_exclusions: tuple) -> dict:
+    """
+    Returns a dict of the words describing Greek terms and their symbols,
+    less the words in 'greek_exclusions'.
+    """
+    return {
+        name: symbol
+        for greek in (GREEK_UPPER, GREEK_LOWER)
+        for name, symbol in greek.items()
+        if name not in greek_exclusions
+    }
+
+
+def derive_options(options: Mapping) -> dict:
+    """
+    Returns the values derived from 'options' by name (see ResolvedConfig).
+    """
+    return {
+        "line_end": f"{options['line_break']}\n",
+        "opener": options["latex_block_start"],
+        "closer": options["latex_block_end"],
+        "begin": f"\\begin{{{options['math_environment_start']}}}",
+        "end": f"\\end{{{options['math_environment_end']}}}",
+        "greek": greek_symbols(tuple(options["greek_exclusions"])),
+    }
+
+
+class ResolvedConfig(Mapping):
+    """
+    An immutable snapshot of the config options, built once per render, with
+    the values derived from them:
+
+        .line_end: the "line_break" option followed by a newline
+        .opener, .closer: the "latex_block_start" and "latex_block_end" options
+        .begin, .end: the \\begin{...} and \\end{...} of the math environment
+        .greek: the Greek letter names that are swapped for their symbols,
+            less the "greek_exclusions"
+        .key: the options as a hashable value, equal for equal options
+        .digest: a hex digest of the options that is the same in every process,
+            or None if an option cannot be digested
+
+    It can be used wherever a config_options dict is expected. The derived
+    values are items of the mapping as well, after the options, so they are
+    passed along with the options as keyword arguments, e.g.
+    format_cell(cell, **config) reads config_options["line_end"].
+    """
+
+    __slots__ = ("_options", "_items", "_hash", "key", "digest") + DERIVED_OPTIONS
+
+    def __init__(self, options: Mapping):
+        options = MappingProxyType(
+            copy.deepcopy(
+                {
+                    option: value
+                    for option, value in options.items()
+                    if option not in DERIVED_OPTIONS
+                }
+            )
+        )
+        key = freeze(dict(options))
+        derived = derive_options(options)
+        fields = {
+            "_options": options,
+            "_items": MappingProxyType({**options, **derived}),
+            "key": key,
+            "_hash": hash(key),
+            "digest": stable_digest(key),
+            **derived,
+        }
+        for name, value in fields.items():
+            object.__setattr__(self, name, value)
+
+    def __setattr__(self, name: str, value: Any) -> None:
+        raise AttributeError(f"{self.__class__.__name__} is immutable.")
+
+    def __getitem__(self, option: str) -> Any:
+        return self._items[option]
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._items)
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+    def __hash__(self) -> int:
+        return self._hash
+
+    def __eq__(self, other: Any) -> bool:
+        if isinstance(other, ResolvedConfig):
+            return self.key == other.key
+        if isinstance(other, Mapping):
+            return self.matches(other)
+        return NotImplemented
+
+    def __repr__(self):
+        return f"{self.__class__.__name__}({dict(self._options)!r})"
+
+    def matches(self, options: Mapping) -> bool:
+        """
+        Returns True if 'options' are the options of this config, with or
+        without the derived values.
+        """
+        return options == self._options or options == self._items
+
+    def replace(self, **options: Any) -> "ResolvedConfig":
+        """
+        Returns a new ResolvedConfig with 'options' in place of the current
+        values.
+        """
+        for option, value in options.items():
+            _validate_option(option, value)
+        return ResolvedConfig({**self._options, **options})
+
+
+# The most recently resolved configs, newest first
+RECENT_CONFIGS = 8
+_resolved = []
+_overrides = contextvars.ContextVar("handcalcs_config_overrides", default=None)
+
+
+def resolve_config(config_options: Optional[Mapping] = None) -> ResolvedConfig:
+    """
+    Returns 'config_options' as a ResolvedConfig. If 'config_options' is None,
+    returns the global config with the overrides of any enclosing
+    config_override() blocks applied on top of it.
+
+    A ResolvedConfig is only built for options that are not equal to one of
+    the RECENT_CONFIGS most recently resolved, so the global config and
+    dicts passed in again are not copied on every call, and a change to them
+    is never missed.
+    """
+    global _resolved
+    if isinstance(config_options, ResolvedConfig):
+        return config_options
+    if config_options is None:
+        overrides = _overrides.get()
+        config_options = _config if overrides is None else {**_config, **overrides}
+    recent = _resolved
+    for resolved in recent:
+        if resolved.matches(config_options):
+            return resolved
+    resolved = ResolvedConfig(config_options)
+    _resolved = [resolved] + recent[: RECENT_CONFIGS - 1]
+    return resolved
+
+
+@contextmanager
+def config_override(**options: Any) -> Iterator[ResolvedConfig]:
+    """
+    Returns a context manager in which cells are rendered with 'options' in
+    place of the global config options, e.g.
+
+        with config_override(display_precision=5, param_columns=2):
+            ...
+
+    The global config is not changed: 'options' are applied on top of it
+    each time it is resolved, so set_option() still takes effect within the
+    block. Overrides only apply within the current thread (or asyncio task)
+    and can be nested. The context manager yields the config as resolved on
+    entry.
+
+    Raises ValueError for the options that size caches or choose the parser
+    backend, which are process-wide.
+    """
+    for option, value in options.items():
+        _validate_option(option, value)
+        if option in PROCESS_OPTIONS:
+            raise ValueError(
+                f"Option, {option}, applies to the whole process and cannot be"
+                " overridden; use set_option() instead."
+            )
+    token = _overrides.set({**(_overrides.get() or {}), **options})
+    try:
+        yield resolve_config()
+    finally:
+        _overrides.reset(token)
+
+
 def save_config() -> None:
     """
     Returns None. Saves the current global configuration as the default configuration
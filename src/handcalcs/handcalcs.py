@@ -12,25 +12,187 @@
 #    See the License for the specific language governing permissions and
 #    limitations under the License.
 
-from collections import deque, ChainMap
+import ast
+from collections import deque
 import copy
-from dataclasses import dataclass
-from functools import singledispatch
+from dataclasses import dataclass, field, fields, replace
+from functools import cached_property, lru_cache, partial, singledispatch, wraps
 import importlib
 import inspect
 import itertools
+import keyword
 import more_itertools
 import math
 import os
 import pathlib
 import re
-from typing import Any, Union, Optional, Tuple, List
+import sys
+from typing import Any, Callable, Iterable, Union, Optional, Tuple, List
 import pyparsing as pp
 
-from handcalcs.constants import GREEK_UPPER, GREEK_LOWER
-from handcalcs import global_config
+from handcalcs.caching import (
+    CacheInfo,
+    LRUCache,
+    approximate_size,
+    fingerprint,
+    freeze,
+    stable_digest,
+)
+from handcalcs.expr_ir import TOKEN_KINDS, Name, token_kind, typed_tokens
+from handcalcs import __version__, global_config
+from handcalcs.global_config import greek_symbols
+from handcalcs.disk_cache import get_disk_cache
 from handcalcs.integrations import DimensionalityError
 
+NAME_PATTERN = re.compile(r"(?<![\w.])[A-Za-z_]\w*(?:\.[A-Za-z_]\w*)*")
+# Spaces that separate tokens which would be parsed as a single token without
+# them, e.g. "4.2 + 3.2j" (one complex number once the spaces are removed)
+JOINABLE_SPACES = re.compile(
+    r"[\w.] +[\w.]|[*/<>=!] +[*/=]|\d *[+-] *[\d.]+(?:[eE][+-]?\d+)?j"
+)
+# The right side of a parameter line that can be recognized without parsing:
+# a number, a name, or either with a unary sign, e.g. "35", "-2.5", "np.pi"
+TRIVIAL_RIGHT_SIDE = re.compile(
+    r"[+-]?(?:\d+\.?\d*(?:[eE][+-]?\d+)?j?|\.\d+j?|[A-Za-z_][\w.]*)"
+)
+
+
+def deque_walker(transform):
+    """
+    Returns 'transform', a generator function that transforms a deque, as a
+    function that transforms a deque and all of its nested deques without
+    recursion.
+
+    Where 'transform' needs a nested deque, 'item', transformed, it yields it
+    instead of calling itself, e.g. "new_item = yield item". The nested deque
+    is transformed with the same arguments and the result is sent back.
+    Pending transforms are kept on an explicit stack so the depth of
+    nesting is not limited by the recursion limit.
+    """
+
+    @wraps(transform)
+    def walker(d, *args, **kwargs):
+        stack = [transform(d, *args, **kwargs)]
+        result = None
+        while stack:
+            try:
+                nested = stack[-1].send(result)
+            except StopIteration as finished:
+                stack.pop()
+                result = finished.value
+            else:
+                stack.append(transform(nested, *args, **kwargs))
+                result = None
+        return result
+
+    return walker
+
+
+def token_rewrite(*options: str, prepare: Optional[Callable] = None):
+    """
+    Returns a decorator that turns 'rewrite', a function that rewrites a
+    single token of a parsed line, into a function that rewrites every token
+    in a deque and all of its nested deques.
+
+    'options' name the config options that 'rewrite' reads. The undecorated
+    function is kept as the '.rewrite' attribute, and 'options' as
+    '.options', so several token rewrites can be applied in a single walk
+    (see rewrite_tokens()).
+
+    If 'prepare' is given, it is called with the config options once per
+    walk, rather than once per token, and returns the keyword arguments that
+    'rewrite' is called with, e.g. the options compiled into a matcher. It is
+    kept as the '.prepare' attribute.
+
+    A token keeps its kind (see expr_ir.token_kind()): a Name, Number, or Op
+    that 'rewrite' returns as a plain str is returned as the same kind.
+    """
+
+    def decorator(rewrite):
+        @wraps(rewrite)
+        def rewrite_token(item, *args, **kwargs):
+            rewritten = rewrite(item, *args, **kwargs)
+            kind = type(item)
+            if kind in TOKEN_KINDS and type(rewritten) is str:
+                return kind(rewritten)
+            return rewritten
+
+        @deque_walker
+        @wraps(rewrite)
+        def transform(d, *args, **kwargs):
+            swapped_deque = deque([])
+            for item in d:
+                if isinstance(item, deque):
+                    swapped_deque.append((yield item))
+                else:
+                    swapped_deque.append(rewrite_token(item, *args, **kwargs))
+            return swapped_deque
+
+        if prepare is not None:
+            walk_prepared = transform
+
+            @wraps(rewrite)
+            def transform(d, *args, **kwargs):
+                return walk_prepared(d, *args, **prepare(**kwargs))
+
+        transform.rewrite = rewrite_token
+        transform.options = options
+        transform.prepare = prepare
+        return transform
+
+    return decorator
+
+
+def name_rewrite(*options: str, prepare: Optional[Callable] = None):
+    """
+    Returns a decorator like token_rewrite() for 'rewrite', a function that
+    rewrites the text of a name, e.g. a variable or function name.
+
+    Only tokens of the Name kind (see expr_ir.token_kind()) are rewritten,
+    and the rewritten name is a Name as well: Number, Op, and Value tokens,
+    including the LaTeX written by earlier transforms, are returned
+    unchanged.
+    """
+
+    def decorator(rewrite):
+        @wraps(rewrite)
+        def rewrite_name(item, *args, **kwargs):
+            if token_kind(item) is Name:
+                return Name(rewrite(item, *args, **kwargs))
+            return item
+
+        return token_rewrite(*options, prepare=prepare)(rewrite_name)
+
+    return decorator
+
+
+@dataclass(frozen=True)
+class ValueSlot:
+    """
+    The place in a LineTemplate, or a RenderPlan, where the value of 'name'
+    is swapped in. If 'required', the value must be in the calculated results;
+    otherwise 'name' itself is swapped in when it is not.
+    """
+
+    name: str
+    required: bool = False
+
+
+@dataclass(eq=False)
+class LineTemplate:
+    """
+    A calculation line converted to latex without its values.
+
+    'tokens' are the converted symbolic and numeric portions of the line
+    with a ValueSlot wherever a name may be swapped for its value. 'slots'
+    are the indexes of those ValueSlots. A LineTemplate is hashed by
+    identity so its rendered tokens can be cached (see
+    render_line_template()).
+    """
+
+    tokens: deque
+    slots: Tuple[int, ...]
+
 
 # Six basic line types
 @dataclass
@@ -38,6 +200,7 @@ class CalcLine:
     line: deque
     comment: str
     latex: str
+    template: Optional[LineTemplate] = field(default=None, compare=False, repr=False)
 
 
 @dataclass
@@ -74,6 +237,7 @@ class LongCalcLine:
     line: deque
     comment: str
     latex: str
+    template: Optional[LineTemplate] = field(default=None, compare=False, repr=False)
 
 
 @dataclass
@@ -180,8 +344,39 @@ class LatexRenderer:
         self.override_scientific_notation = line_args["sci_not"]
         self.override_commands = line_args["override"]
 
-    def render(self, config_options: dict = global_config._config):
-        return latex(
+    def render(self, config_options: Optional[dict] = None):
+        config_options = global_config.resolve_config(config_options)
+        options = global_config._config
+        cache_size = options["render_cache_size"]
+        if _render_cache.maxsize != cache_size:
+            _render_cache.maxsize = cache_size
+        key = None
+        if cache_size or options["disk_cache"]:
+            key = render_cache_key(
+                self.source,
+                self.results,
+                self.override_commands,
+                config_options,
+                self.override_precision,
+                self.override_scientific_notation,
+            )
+        if key is not None and cache_size:
+            cached = _render_cache.get(key)
+            if cached is not None:
+                return cached
+        disk_cache = None
+        digest = None
+        if key is not None and options["disk_cache"]:
+            digest = stable_digest((__version__, key))
+        if digest is not None:
+            disk_cache = get_disk_cache(
+                options["disk_cache_dir"], options["disk_cache_size"]
+            )
+            cached = disk_cache.get(digest)
+            if cached is not None:
+                _render_cache.set(key, cached)
+                return cached
+        latex_code = latex(
             raw_python_source=self.source,
             calculated_results=self.results,
             override_commands=self.override_commands,
@@ -189,6 +384,64 @@ class LatexRenderer:
             cell_precision=self.override_precision,
             cell_notation=self.override_scientific_notation,
         )
+        if key is not None:
+            _render_cache.set(key, latex_code)
+        if disk_cache is not None:
+            disk_cache.set(digest, latex_code)
+        return latex_code
+
+
+_render_cache = LRUCache(global_config._config["render_cache_size"])
+
+
+def render_cache_key(
+    source: str,
+    results: dict,
+    override_commands: str,
+    config_options: dict,
+    cell_precision: Optional[int] = None,
+    cell_notation: Optional[bool] = None,
+) -> Optional[tuple]:
+    """
+    Returns the key under which the LaTeX rendered from 'source' is cached.
+    Only the values in 'results' of the names that appear in 'source' are
+    part of the key so that changes to unrelated variables do not cause a
+    miss. Returns None if any of those values cannot be fingerprinted, in
+    which case the cell is not cached.
+    """
+    config = global_config.resolve_config(config_options)
+    values = []
+    for name in find_names(source):
+        name = name.split(".", 1)[0]
+        if name not in results:
+            values.append((name,))
+            continue
+        value_key = fingerprint(results[name])
+        if value_key is None:
+            return None
+        values.append((name, value_key))
+    return (
+        source,
+        override_commands,
+        cell_precision,
+        cell_notation,
+        config.key if config.digest is None else config.digest,
+        tuple(values),
+    )
+
+
+def render_cache_info() -> CacheInfo:
+    """
+    Returns the hits, misses, evictions, and size of the LatexRenderer cache.
+    """
+    return _render_cache.info()
+
+
+def clear_render_cache() -> None:
+    """
+    Empties the LatexRenderer cache and resets its statistics.
+    """
+    _render_cache.clear()
 
 
 # Pure functions that do all the work
@@ -214,6 +467,7 @@ def latex(
     # param_columns = config_options.get("param_columns")
 
     source = raw_python_source
+    config_options = global_config.resolve_config(config_options)
 
     cell = categorize_raw_cell(
         source,
@@ -235,6 +489,109 @@ def latex(
     return cell.latex_code
 
 
+@dataclass
+class RenderPlan:
+    """
+    A cell categorized, and its calculation lines compiled into
+    LineTemplates, once for a given config so that it can be rendered
+    repeatedly with new values.
+
+    'cell' holds the categorized lines with a ValueSlot in place of every
+    value read from the calculated results.
+    """
+
+    cell: Union[CalcCell, ShortCalcCell, LongCalcCell, ParameterCell, SymbolicCell]
+    config: global_config.ResolvedConfig
+
+
+class ResultSlots(dict):
+    """
+    Stands in for the calculated results while a RenderPlan is built: every
+    name that is looked up is returned as a ValueSlot.
+    """
+
+    def __getitem__(self, name: str) -> ValueSlot:
+        hash(name)
+        return ValueSlot(name, required=True)
+
+    def get(self, name: str, default: Any = None) -> ValueSlot:
+        hash(name)
+        return ValueSlot(name)
+
+
+def build_render_plan(
+    raw_python_source: str,
+    override_commands: str,
+    config_options: dict,
+    cell_precision: Optional[int] = None,
+    cell_notation: Optional[bool] = None,
+) -> RenderPlan:
+    """
+    Returns the RenderPlan of the Python source for the config options.
+    render_plan() renders it with calculated results exactly as latex()
+    would render the source.
+    """
+    config_options = global_config.resolve_config(config_options)
+    cell = categorize_raw_cell(
+        raw_python_source,
+        ResultSlots(),
+        override_commands,
+        cell_precision,
+        cell_notation,
+    )
+    cell = categorize_lines(cell)
+    lines = list(cell.lines)
+    while lines:
+        line = lines.pop()
+        if isinstance(line, ConditionalLine):
+            lines.extend(line.expressions)
+        elif isinstance(line, (CalcLine, LongCalcLine)):
+            *line_deque, result = line.line
+            line.template = line_template(line_deque, **config_options)
+            if line.template is not None:
+                # Only the result is needed alongside the template
+                line.line = deque([result])
+    return RenderPlan(cell, config_options)
+
+
+def render_plan(plan: RenderPlan, calculated_results: dict) -> str:
+    """
+    Returns the latex code of the cell in 'plan' with the values in
+    'calculated_results'. Only the values are converted and formatted;
+    the lines are not categorized or parsed again.
+    """
+    fill = partial(fill_value_slot, calculated_results=calculated_results)
+    cell = replace(
+        plan.cell,
+        calculated_results=calculated_results,
+        lines=deque([fill(line) for line in plan.cell.lines]),
+    )
+    cell = convert_cell(cell, **plan.config)
+    cell = format_cell(cell, **plan.config)
+    return cell.latex_code
+
+
+def fill_value_slot(item: Any, calculated_results: dict) -> Any:
+    """
+    Returns 'item' with its value swapped in if it is a ValueSlot, or a copy
+    of 'item' with the values swapped into all of its deques if it is a
+    categorized line. Returns any other item as it is.
+    """
+    if isinstance(item, ValueSlot):
+        if item.required:
+            return calculated_results[item.name]
+        return dict_get(calculated_results, item.name)
+    if not hasattr(item, "__dataclass_fields__"):
+        return item
+    fill = partial(fill_value_slot, calculated_results=calculated_results)
+    filled = {
+        line_field.name: apply_rewrite(getattr(item, line_field.name), rewrite=fill)
+        for line_field in fields(item)
+        if isinstance(getattr(item, line_field.name), deque)
+    }
+    return replace(item, **filled)
+
+
 def categorize_raw_cell(
     raw_source: str,
     calculated_results: dict,
@@ -368,11 +725,12 @@ def categorize_line(
         line, comment = line.split("#", 1)
     except ValueError:
         comment = ""
+    analysis = LineAnalysis(line)
 
     # Override behaviour
     categorized_line = None
     if cell_override == "parameter":
-        if test_for_conditional_line(line):
+        if analysis.is_conditional:
             categorized_line = create_conditional_line(
                 line, calculated_results, cell_override, comment
             )
@@ -383,49 +741,39 @@ def categorize_line(
         return categorized_line
 
     elif cell_override == "long":
-        if test_for_parameter_line(line):  # A parameter can exist in a long cell, too
+        if analysis.is_parameter:  # A parameter can exist in a long cell, too
             categorized_line = ParameterLine(
                 split_parameter_line(line, calculated_results), comment, ""
             )
-        elif test_for_conditional_line(
-            line
+        elif (
+            analysis.is_conditional
         ):  # A conditional line can exist in a long cell, too
             categorized_line = create_conditional_line(
                 line, calculated_results, cell_override, comment
             )
-        elif test_for_numeric_line(
-            deque(
-                list(expr_parser(line))[1:]
-            )  # Leave off the declared variable, e.g. _x_ = ...
-        ):
-            categorized_line = NumericCalcLine(expr_parser(line), comment, "")
+        elif analysis.is_numeric:
+            categorized_line = NumericCalcLine(analysis.parsed, comment, "")
 
         else:
-            categorized_line = LongCalcLine(
-                expr_parser(line), comment, ""
-            )  # code_reader
+            categorized_line = LongCalcLine(analysis.parsed, comment, "")  # code_reader
         return categorized_line
 
     elif cell_override == "symbolic":
-        if test_for_conditional_line(
-            line
+        if (
+            analysis.is_conditional
         ):  # A conditional line can exist in a symbolic cell, too
             categorized_line = create_conditional_line(
                 line, calculated_results, cell_override, comment
             )
         else:
-            categorized_line = SymbolicLine(
-                expr_parser(line), comment, ""
-            )  # code_reader
+            categorized_line = SymbolicLine(analysis.parsed, comment, "")  # code_reader
         return categorized_line
 
     elif cell_override == "short":
-        if test_for_numeric_line(
-            deque(list(line)[1:])  # Leave off the declared variable
-        ):
-            categorized_line = NumericCalcLine(expr_parser(line), comment, "")
+        if analysis.is_numeric:
+            categorized_line = NumericCalcLine(analysis.parsed, comment, "")
         else:
-            categorized_line = CalcLine(expr_parser(line), comment, "")  # code_reader
+            categorized_line = CalcLine(analysis.parsed, comment, "")  # code_reader
 
         return categorized_line
     elif True:
@@ -435,25 +783,23 @@ def categorize_line(
     if line == "\n" or line == "":
         categorized_line = BlankLine(line, "", "")
 
-    elif test_for_parameter_line(line):
+    elif analysis.is_parameter:
         categorized_line = ParameterLine(
             split_parameter_line(line, calculated_results), comment, ""
         )
 
-    elif test_for_conditional_line(line):
+    elif analysis.is_conditional:
         categorized_line = create_conditional_line(
             line, calculated_results, cell_override, comment
         )
 
-    elif test_for_numeric_line(
-        deque(list(expr_parser(line))[1:])  # Leave off the declared variable
-    ):
-        categorized_line = NumericCalcLine(expr_parser(line), comment, "")
+    elif analysis.is_numeric:
+        categorized_line = NumericCalcLine(analysis.parsed, comment, "")
 
     elif "=" in line:
-        categorized_line = CalcLine(expr_parser(line), comment, "")  # code_reader
+        categorized_line = CalcLine(analysis.parsed, comment, "")  # code_reader
 
-    elif len(expr_parser(line)) == 1:
+    elif len(analysis.parsed) == 1:
         categorized_line = ParameterLine(
             split_parameter_line(line, calculated_results), comment, ""
         )
@@ -470,6 +816,50 @@ def categorize_line(
     return categorized_line
 
 
+@dataclass
+class LineAnalysis:
+    """
+    A single line of source code (comment removed) with the information used
+    to categorize it.
+
+    The line is parsed at most once, on the first access of .parsed, and every
+    classification that needs the parse tree is derived from that same tree.
+    The flags are computed on first access so that lines which can be
+    classified without parsing are never parsed.
+
+    .parsed is the tree that is handed on to the categorized line object and
+    may be mutated from then on.
+    """
+
+    source: str
+
+    @cached_property
+    def parsed(self) -> deque:
+        return expr_parser(self.source)
+
+    @cached_property
+    def is_parameter(self) -> bool:
+        return test_for_parameter_line(self.source, analysis=self)
+
+    @cached_property
+    def is_conditional(self) -> bool:
+        return test_for_conditional_line(self.source)
+
+    @cached_property
+    def is_numeric(self) -> bool:
+        return test_for_numeric_line(
+            deque(list(self.parsed)[1:])  # Leave off the declared variable
+        )
+
+    @cached_property
+    def names(self) -> Tuple[str, ...]:
+        """
+        The variable and function names referenced in the line, in order of
+        first appearance.
+        """
+        return find_names(self.source)
+
+
 def create_param_cell(
     raw_source: str,
     calculated_result: dict,
@@ -765,6 +1155,14 @@ def convert_calc(line, calculated_results, **config_options):
         *line_deque,
         result,
     ) = line.line  # Unpack deque of form [[calc_line, ...], ['=', 'result']]
+    if line.template is None:  # Not already compiled by build_render_plan()
+        line.template = line_template(line_deque, **config_options)
+    if line.template is not None:
+        line.line = fill_line_template(
+            line.template, calculated_results, **config_options
+        )
+        line.line += result
+        return line
     symbolic_portion, numeric_portion = swap_calculation(
         line_deque, calculated_results, **config_options
     )
@@ -791,6 +1189,14 @@ def convert_longcalc(line, calculated_results, **config_options):
         *line_deque,
         result,
     ) = line.line  # Unpack deque of form [[calc_line, ...], ['=', 'result']]
+    if line.template is None:  # Not already compiled by build_render_plan()
+        line.template = line_template(line_deque, **config_options)
+    if line.template is not None:
+        line.line = fill_line_template(
+            line.template, calculated_results, **config_options
+        )
+        line.line += result
+        return line
     symbolic_portion, numeric_portion = swap_calculation(
         line_deque, calculated_results, **config_options
     )
@@ -861,11 +1267,11 @@ def format_parameters_cell(cell: ParameterCell, **config_options):
     cell_notation = toggle_scientific_notation(
         config_options["use_scientific_notation"], cell.scientific_notation
     )
-    opener = config_options["latex_block_start"]
-    begin = f"\\begin{{{config_options['math_environment_start']}}}"
-    end = f"\\end{{{config_options['math_environment_end']}}}"
-    closer = config_options["latex_block_end"]
-    line_break = f"{config_options['line_break']}\n"
+    opener = config_options["opener"]
+    begin = config_options["begin"]
+    end = config_options["end"]
+    closer = config_options["closer"]
+    line_break = config_options["line_end"]
     cycle_cols = itertools.cycle(range(1, cols + 1))
     for line in cell.lines:
         line = round_and_render_line_objects_to_latex(
@@ -906,7 +1312,7 @@ def format_parameters_cell(cell: ParameterCell, **config_options):
 
 @format_cell.register(CalcCell)
 def format_calc_cell(cell: CalcCell, **config_options) -> str:
-    line_break = f"{config_options['line_break']}\n"
+    line_break = config_options["line_end"]
     if cell.precision is None:
         precision = config_options["display_precision"]
     else:
@@ -925,10 +1331,10 @@ def format_calc_cell(cell: CalcCell, **config_options) -> str:
     cell.lines = incoming
 
     latex_block = line_break.join([line.latex for line in cell.lines if line.latex])
-    opener = config_options["latex_block_start"]
-    begin = f"\\begin{{{config_options['math_environment_start']}}}"
-    end = f"\\end{{{config_options['math_environment_end']}}}"
-    closer = config_options["latex_block_end"]
+    opener = config_options["opener"]
+    begin = config_options["begin"]
+    end = config_options["end"]
+    closer = config_options["closer"]
     cell.latex_code = "\n".join([opener, begin, latex_block, end, closer]).replace(
         "\n" + end, end
     )
@@ -938,7 +1344,7 @@ def format_calc_cell(cell: CalcCell, **config_options) -> str:
 @format_cell.register(ShortCalcCell)
 def format_shortcalc_cell(cell: ShortCalcCell, **config_options) -> str:
     incoming = deque([])
-    line_break = f"{config_options['line_break']}\n"
+    line_break = config_options["line_end"]
     if cell.precision is None:
         precision = config_options["display_precision"]
     else:
@@ -955,10 +1361,10 @@ def format_shortcalc_cell(cell: ShortCalcCell, **config_options) -> str:
     cell.lines = incoming
 
     latex_block = line_break.join([line.latex for line in cell.lines if line.latex])
-    opener = config_options["latex_block_start"]
-    begin = f"\\begin{{{config_options['math_environment_start']}}}"
-    end = f"\\end{{{config_options['math_environment_end']}}}"
-    closer = config_options["latex_block_end"]
+    opener = config_options["opener"]
+    begin = config_options["begin"]
+    end = config_options["end"]
+    closer = config_options["closer"]
     cell.latex_code = "\n".join([opener, begin, latex_block, end, closer]).replace(
         "\n" + end, end
     )
@@ -967,7 +1373,7 @@ def format_shortcalc_cell(cell: ShortCalcCell, **config_options) -> str:
 
 @format_cell.register(LongCalcCell)
 def format_longcalc_cell(cell: LongCalcCell, **config_options) -> str:
-    line_break = f"{config_options['line_break']}\n"
+    line_break = config_options["line_end"]
     if cell.precision is None:
         precision = config_options["display_precision"]
     else:
@@ -986,10 +1392,10 @@ def format_longcalc_cell(cell: LongCalcCell, **config_options) -> str:
     cell.lines = incoming
 
     latex_block = line_break.join([line.latex for line in cell.lines if line.latex])
-    opener = config_options["latex_block_start"]
-    begin = f"\\begin{{{config_options['math_environment_start']}}}"
-    end = f"\\end{{{config_options['math_environment_end']}}}"
-    closer = config_options["latex_block_end"]
+    opener = config_options["opener"]
+    begin = config_options["begin"]
+    end = config_options["end"]
+    closer = config_options["closer"]
     cell.latex_code = "\n".join([opener, begin, latex_block, end, closer]).replace(
         "\n" + end, end
     )
@@ -998,7 +1404,7 @@ def format_longcalc_cell(cell: LongCalcCell, **config_options) -> str:
 
 @format_cell.register(SymbolicCell)
 def format_symbolic_cell(cell: SymbolicCell, **config_options) -> str:
-    line_break = f"{config_options['line_break']}\n"
+    line_break = config_options["line_end"]
     if cell.precision is None:
         precision = config_options["display_precision"]
     else:
@@ -1016,10 +1422,10 @@ def format_symbolic_cell(cell: SymbolicCell, **config_options) -> str:
     cell.lines = incoming
 
     latex_block = line_break.join([line.latex for line in cell.lines if line.latex])
-    opener = config_options["latex_block_start"]
-    begin = f"\\begin{{{config_options['math_environment_start']}}}"
-    end = f"\\end{{{config_options['math_environment_end']}}}"
-    closer = config_options["latex_block_end"]
+    opener = config_options["opener"]
+    begin = config_options["begin"]
+    end = config_options["end"]
+    closer = config_options["closer"]
     cell.latex_code = "\n".join([opener, begin, latex_block, end, closer]).replace(
         "\n" + end, end
     )
@@ -1057,10 +1463,20 @@ def round_and_render_calc(
         config_options["use_scientific_notation"], cell_notation
     )
     preferred_formatter = config_options["preferred_string_formatter"]
-    rendered_line = render_latex_str(
-        idx_line, use_scientific_notation, precision, preferred_formatter
-    )
-    rendered_line = swap_dec_sep(rendered_line, config_options["decimal_separator"])
+    if line.template is not None:
+        rendered_line = render_line_template(
+            line.template,
+            idx_line,
+            use_scientific_notation,
+            precision,
+            preferred_formatter,
+            config_options["decimal_separator"],
+        )
+    else:
+        rendered_line = render_latex_str(
+            idx_line, use_scientific_notation, precision, preferred_formatter
+        )
+        rendered_line = swap_dec_sep(rendered_line, config_options["decimal_separator"])
     line.line = rendered_line
     line.latex = " ".join(rendered_line)
     return line
@@ -1095,10 +1511,20 @@ def round_and_render_longcalc(
         config_options["use_scientific_notation"], cell_notation
     )
     preferred_formatter = config_options["preferred_string_formatter"]
-    rendered_line = render_latex_str(
-        idx_line, use_scientific_notation, precision, preferred_formatter
-    )
-    rendered_line = swap_dec_sep(rendered_line, config_options["decimal_separator"])
+    if line.template is not None:
+        rendered_line = render_line_template(
+            line.template,
+            idx_line,
+            use_scientific_notation,
+            precision,
+            preferred_formatter,
+            config_options["decimal_separator"],
+        )
+    else:
+        rendered_line = render_latex_str(
+            idx_line, use_scientific_notation, precision, preferred_formatter
+        )
+        rendered_line = swap_dec_sep(rendered_line, config_options["decimal_separator"])
     line.line = rendered_line
     line.latex = " ".join(rendered_line)
     return line
@@ -1127,7 +1553,7 @@ def round_and_render_parameter(
 def round_and_render_conditional(
     line: ConditionalLine, cell_precision: int, cell_notation: bool, **config_options
 ) -> ConditionalLine:
-    conditional_line_break = f"{config_options['line_break']}\n"
+    conditional_line_break = config_options["line_end"]
     outgoing = deque([])
     idx_line = line.true_condition
     precision = cell_precision
@@ -1631,7 +2057,7 @@ def format_conditional_line(line: ConditionalLine, **config_options) -> Conditio
             comment_space = "\\;"
             comment = format_strings(line.comment, comment=True)
 
-        line_break = f"{config_options['line_break']}\n"
+        line_break = config_options["line_end"]
         first_line = f"&\\text{a}Since, {b} {latex_condition} : {comment_space} {comment} {line_break}"
         if line.condition_type == "else":
             first_line = ""
@@ -1659,7 +2085,7 @@ def format_long_calc_line(line: LongCalcLine, **config_options) -> LongCalcLine:
     latex_code = line.latex
     long_latex = latex_code.replace("=", "\\\\&=")  # Change all...
     long_latex = long_latex.replace("\\\\&=", "&=", 1)  # ...except the first one
-    line_break = f"{config_options['line_break']}\n"
+    line_break = config_options["line_end"]
     comment_space = ""
     comment = ""
     if line.comment:
@@ -1737,10 +2163,15 @@ def split_conditional(line: str, calculated_results: dict, cell_override: str):
     )
 
 
-def test_for_parameter_line(line: str) -> bool:
+def test_for_parameter_line(
+    line: str, analysis: Optional["LineAnalysis"] = None
+) -> bool:
     """
     Returns True if `line` appears to be a line to simply declare a
     parameter (e.g. "a = 34") instead of an actual calculation.
+
+    If the LineAnalysis of 'line' is provided, the right side of the line is
+    taken from its parse tree instead of being parsed separately.
     """
     # Fast Tests
     if not line.strip():  # Blank lines
@@ -1751,18 +2182,27 @@ def test_for_parameter_line(line: str) -> bool:
         return False
 
     # Exploratory Tests
-    _, right_side = line.split("=", 1)
-    right_side = right_side.replace(" ", "")
+    _, raw_right_side = line.split("=", 1)
+    right_side = raw_right_side.replace(" ", "")
+    if TRIVIAL_RIGHT_SIDE.fullmatch(right_side):
+        return True
 
     if (right_side.find("(") == 0) and (
         right_side.find(")") == len(right_side) - 1
     ):  # Blocked by parentheses
         return True
 
-    try:
-        right_side_deque = expr_parser(right_side)
-    except pp.ParseException:
-        right_side_deque = deque([right_side])
+    right_side_deque = None
+    if analysis is not None and not JOINABLE_SPACES.search(raw_right_side):
+        try:
+            right_side_deque = right_side_of_parsed(analysis.parsed)
+        except pp.ParseException:
+            pass
+    if right_side_deque is None:
+        try:
+            right_side_deque = expr_parser(right_side)
+        except pp.ParseException:
+            right_side_deque = deque([right_side])
 
     if len(right_side_deque) == 1:
         return True
@@ -1772,6 +2212,33 @@ def test_for_parameter_line(line: str) -> bool:
         return False
 
 
+def right_side_of_parsed(parsed: deque) -> Optional[deque]:
+    """
+    Returns the deque that expr_parser() would return for the right side of
+    the assignment represented by 'parsed'. Returns None if 'parsed' does not
+    represent an assignment, e.g. when the right side could not be parsed.
+    """
+    if len(parsed) < 3 or parsed[1] != "=":
+        return None
+    right_side = list(parsed)[2:]
+    if len(right_side) == 1 and isinstance(right_side[0], deque):
+        return copy.copy(right_side[0])
+    return deque(right_side)
+
+
+def find_names(source: str) -> Tuple[str, ...]:
+    """
+    Returns the unique variable and function names that appear in the
+    line of code, 'source', in order of first appearance. Dotted names,
+    e.g. "np.pi", are returned whole.
+    """
+    names = {}
+    for name in NAME_PATTERN.findall(source):
+        if not keyword.iskeyword(name):
+            names.setdefault(name, None)
+    return tuple(names)
+
+
 def test_for_parameter_cell(raw_python_source: str) -> bool:
     """
     Returns True if the text, "# Parameters" or "#Parameters" is the line
@@ -1849,12 +2316,31 @@ def test_for_numeric_line(
     In other words, the calculation has no "variables" in it,
     whatsoever.
     """
+    is_numeric, _ = numeric_line_walker(d)
+    return is_numeric
+
+
+@deque_walker
+def numeric_line_walker(d: deque) -> Tuple[bool, bool]:
+    """
+    Returns a tuple of test_for_numeric_line(d) and whether str(d) contains
+    any of the comparison characters that test_for_py_operator(d) looks for.
+    The operator test of each nested deque is taken from the walk of that
+    deque so that no deque is walked more than once.
+    """
     bool_acc = []
+    has_operator = False
     func_flag = False
     if get_function_name(d):
         func_flag = True
         # bool_acc.append((item, True))
     for item in d:
+        if isinstance(item, deque):
+            item_is_numeric, item_has_operator = yield item
+            has_operator = has_operator or item_has_operator
+        else:
+            # str(d) contains the repr() of each item
+            has_operator = has_operator or any(op in repr(item) for op in "<>=")
         # if func_deque:
         if func_flag:
             func_flag = False
@@ -1862,6 +2348,14 @@ def test_for_numeric_line(
             continue
         if is_number(item):
             bool_acc.append(True)
+        elif isinstance(item, deque):
+            if item_has_operator:
+                bool_acc.append(True)
+            elif get_function_name(item):
+                bool_acc.append(True)
+                bool_acc.append(item_is_numeric)
+            else:
+                bool_acc.append(item_is_numeric)
         elif test_for_py_operator(item):
             bool_acc.append(True)
         elif (
@@ -1870,20 +2364,9 @@ def test_for_numeric_line(
             bool_acc.append(True)
         elif item == ",":  # Numbers separated with commas: ok
             bool_acc.append(True)
-        elif isinstance(item, deque):
-            if get_function_name(item):
-                bool_acc.append(True)
-                bool_acc.append(
-                    test_for_numeric_line(
-                        d=item,
-                        # func_deque=True
-                    )
-                )
-            else:
-                bool_acc.append(test_for_numeric_line(d=item))
         else:
             bool_acc.append(False)
-    return all(bool_acc)
+    return all(bool_acc), has_operator
 
 
 def toggle_scientific_notation(
@@ -1933,7 +2416,7 @@ def split_parameter_line(line: str, calculated_results: dict) -> deque:
         deque([<parameter>, "&=", <value>])
     """
     param = line.replace(" ", "").split("=", 1)[0]
-    param_line = deque([param, "=", calculated_results[param]])
+    param_line = deque([Name(param), "=", calculated_results[param]])
     return param_line
 
 
@@ -2046,6 +2529,182 @@ def swap_calculation(calculation: deque, calc_results: dict, **config_options) -
     return (symbolic_portion, numeric_portion)
 
 
+_line_templates = LRUCache(global_config._config["line_template_cache_size"])
+# The rendered tokens of the LineTemplates, keyed on the template and the
+# rendering options, sized to a few sets of options for each cached template
+RENDERINGS_PER_TEMPLATE = 4
+_template_renderings = LRUCache(RENDERINGS_PER_TEMPLATE * 1024)
+# Functions whose conversion reads values from the calculated results
+VALUE_DEPENDENT_FUNCS = ("log", "quad", "integrate")
+
+
+def line_template(calculation: deque, **config_options) -> Optional[LineTemplate]:
+    """
+    Returns the LineTemplate for the parsed calculation line, 'calculation',
+    compiling it on first use. Templates are kept in an LRU cache keyed on
+    the line and the config options and sized by the
+    "line_template_cache_size" option.
+
+    Returns None for lines whose conversion depends on calculated values
+    other than those swapped in by swap_values (logarithms with a base and
+    integrals).
+    """
+    cache_size = global_config._config["line_template_cache_size"]
+    if _line_templates.maxsize != cache_size:
+        _line_templates.maxsize = cache_size
+        _template_renderings.maxsize = RENDERINGS_PER_TEMPLATE * cache_size
+    key = (deque_to_tuple(deque(calculation)), freeze(config_options))
+    template = _line_templates.get(key)
+    if template is None:
+        template = compile_line_template(calculation, **config_options)
+        _line_templates.set(key, template or False)
+    return template or None
+
+
+def compile_line_template(
+    calculation: deque, **config_options
+) -> Optional[LineTemplate]:
+    """
+    Returns 'calculation' converted into a LineTemplate, as swap_calculation()
+    would convert it, but with a ValueSlot in place of each name in the
+    numeric portion. Returns None if the conversion depends on other values.
+    """
+    for token in flatten(deque(calculation)):
+        if isinstance(token, str) and any(
+            func in token for func in VALUE_DEPENDENT_FUNCS
+        ):
+            return None
+    calculation = deque(calculation)
+    symbolic_portion = swap_symbolic_calcs(calculation, {}, **config_options)
+    numeric_portion = numeric_template(deque(list(calculation)[1:]), **config_options)
+    slots = [
+        len(symbolic_portion) + index
+        for index, token in enumerate(numeric_portion)
+        if isinstance(token, ValueSlot)
+    ]
+    return LineTemplate(symbolic_portion + numeric_portion, tuple(slots))
+
+
+def numeric_template(expression: deque, **config_options) -> deque:
+    """
+    Returns the parsed 'expression' converted into latex tokens, as
+    swap_numeric_calcs() would convert it, but with a ValueSlot in place of
+    each name. The expression must not contain any VALUE_DEPENDENT_FUNCS.
+    """
+    numeric_expression = deque(expression)
+    for function in (
+        insert_parentheses,
+        swap_math_funcs,
+        swap_chained_fracs,
+        swap_frac_divs,
+        swap_superscripts,
+    ):
+        if function is swap_math_funcs:
+            numeric_expression = function(numeric_expression, {}, **config_options)
+        else:
+            numeric_expression = function(numeric_expression, **config_options)
+    tokens = rewrite_tokens(
+        flatten(numeric_expression),
+        [swap_py_operators, swap_comparison_ops],
+        **config_options,
+    )
+    fixed_rewrites = value_rewrites(**config_options)
+    numeric_portion = deque([])
+    for token in tokens:
+        if isinstance(token, str) and token.isidentifier():
+            numeric_portion.append(ValueSlot(token))
+        else:
+            numeric_portion += rewrite_tokens([token], fixed_rewrites, **config_options)
+    return numeric_portion
+
+
+def fill_line_template(
+    template: LineTemplate, calc_results: dict, **config_options
+) -> deque:
+    """
+    Returns the tokens of 'template' with the value of each ValueSlot
+    swapped in from 'calc_results', i.e. the result of swap_calculation()
+    joined into one deque.
+    """
+    rewrites = [
+        partial(swap_values.rewrite, tex_results=calc_results),
+        name_translator(value_rewrites(**config_options), **config_options),
+    ]
+    tokens = deque(template.tokens)
+    values = rewrite_tokens(
+        [tokens[index].name for index in template.slots], rewrites, **config_options
+    )
+    for index, value in zip(template.slots, values):
+        tokens[index] = value
+    return tokens
+
+
+def render_line_template(
+    template: LineTemplate,
+    line: deque,
+    use_scientific_notation: bool,
+    precision: int,
+    preferred_formatter: str,
+    dec_sep: str,
+) -> deque:
+    """
+    Returns 'line', the filled tokens of 'template' followed by any other
+    tokens, rendered as render_latex_str() and swap_dec_sep() would render
+    them. The tokens that are not value slots are rendered once for each set
+    of rendering options and kept in an LRU cache shared by every render.
+    """
+    options = (use_scientific_notation, precision, preferred_formatter, dec_sep)
+    slots = set(template.slots)
+    key = (template, options)
+    rendered_tokens = _template_renderings.get(key)
+    if rendered_tokens is None:
+        rendered_tokens = tuple(
+            None if index in slots else render_token(token, *options)
+            for index, token in enumerate(template.tokens)
+        )
+        _template_renderings.set(key, rendered_tokens)
+    rendered_line = deque([])
+    for index, token in enumerate(line):
+        if index < len(rendered_tokens) and index not in slots:
+            rendered_line.append(rendered_tokens[index])
+        else:
+            rendered_line.append(render_token(token, *options))
+    return rendered_line
+
+
+def render_token(
+    token: Any,
+    use_scientific_notation: bool,
+    precision: int,
+    preferred_formatter: str,
+    dec_sep: str,
+) -> str:
+    """
+    Returns the single 'token' rendered by render_latex_str() and
+    swap_dec_sep().
+    """
+    rendered = render_latex_str(
+        [token], use_scientific_notation, precision, preferred_formatter
+    )
+    return swap_dec_sep(rendered, dec_sep)[0]
+
+
+def line_template_cache_info() -> CacheInfo:
+    """
+    Returns the hits, misses, evictions, and size of the LineTemplate cache.
+    """
+    return _line_templates.info()
+
+
+def clear_line_template_cache() -> None:
+    """
+    Empties the LineTemplate cache, and the cache of their rendered tokens,
+    and resets their statistics.
+    """
+    _line_templates.clear()
+    _template_renderings.clear()
+
+
 def swap_symbolic_calcs(
     calculation: deque, calc_results: dict, **config_options
 ) -> deque:
@@ -2053,36 +2712,22 @@ def swap_symbolic_calcs(
     symbolic_expression = copy.copy(calculation)
     functions_on_symbolic_expressions = [
         insert_parentheses,
-        swap_custom_symbols,
+        translate_custom_symbols,
         swap_custom_brackets,
         swap_math_funcs,
         swap_superscripts,
         swap_chained_fracs,
         swap_frac_divs,
-        swap_py_operators,
-        swap_comparison_ops,
-        swap_for_greek,
-        swap_prime_notation,
-        swap_long_var_strs,
-        swap_double_subscripts,
-        extend_subscripts,
-        swap_superscripts,
-        flatten_deque,
     ]
     for function in functions_on_symbolic_expressions:
-        # breakpoint()
         if function is swap_math_funcs:
             symbolic_expression = function(symbolic_expression, calc_results)
-        elif (
-            function is extend_subscripts
-            and not config_options["underscore_subscripts"]
-        ):
-            symbolic_expression = replace_underscores(
-                symbolic_expression, **config_options
-            )
         else:
             symbolic_expression = function(symbolic_expression, **config_options)
-    return symbolic_expression
+    return rewrite_tokens(
+        flatten(symbolic_expression),
+        [name_translator(symbolic_rewrites(**config_options), **config_options)],
+    )
 
 
 def swap_numeric_calcs(
@@ -2094,36 +2739,191 @@ def swap_numeric_calcs(
         swap_math_funcs,
         swap_chained_fracs,
         swap_frac_divs,
-        swap_py_operators,
-        swap_comparison_ops,
-        swap_values,
-        swap_for_greek,
-        swap_prime_notation,
         swap_superscripts,
-        swap_double_subscripts,
-        extend_subscripts,
-        flatten_deque,
     ]
     for function in functions_on_numeric_expressions:
-        if function in (swap_values, swap_math_funcs):
+        if function is swap_math_funcs:
             numeric_expression = function(
                 numeric_expression, calc_results, **config_options
             )
-        elif (
-            function is extend_subscripts
-            and not config_options["underscore_subscripts"]
-        ):
-            numeric_expression = replace_underscores(
-                numeric_expression, **config_options
-            )
         else:
             numeric_expression = function(numeric_expression, **config_options)
-    return numeric_expression
+    token_rewrites = [
+        swap_py_operators,
+        swap_comparison_ops,
+        partial(swap_values.rewrite, tex_results=calc_results),
+        name_translator(value_rewrites(**config_options), **config_options),
+    ]
+    return rewrite_tokens(flatten(numeric_expression), token_rewrites, **config_options)
 
 
-def swap_integrals(d: deque, calc_results: dict, **config_options) -> deque:
+def symbolic_rewrites(**config_options) -> list:
     """
-    Returns 'calculation' with any function named "quad" or "integrate"
+    Returns the token rewrites that swap_symbolic_calcs applies to every token
+    once the expression has been restructured.
+    """
+    return [
+        swap_py_operators,
+        swap_comparison_ops,
+        swap_for_greek,
+        swap_prime_notation,
+        swap_long_var_strs,
+        swap_double_subscripts,
+        subscript_rewrite(**config_options),
+    ]
+
+
+def value_rewrites(**config_options) -> list:
+    """
+    Returns the token rewrites that swap_numeric_calcs applies after
+    swap_values, i.e. the rewrites that are applied to the swapped-in values.
+    """
+    return [
+        swap_for_greek,
+        swap_prime_notation,
+        swap_double_subscripts,
+        subscript_rewrite(**config_options),
+    ]
+
+
+def subscript_rewrite(**config_options) -> Callable:
+    """
+    Returns extend_subscripts if the "underscore_subscripts" option is set and
+    replace_underscores otherwise.
+    """
+    if config_options["underscore_subscripts"]:
+        return extend_subscripts
+    return replace_underscores
+
+
+def rewrite_tokens(tokens: Iterable, rewrites: list, **config_options) -> deque:
+    """
+    Returns a deque of 'tokens' with each of 'rewrites' applied, in order, to
+    every token. 'rewrites' are functions made with token_rewrite(), which
+    are given the config options they read, or functions of the token alone.
+
+    The rewrites only look at one token at a time, so applying all of them
+    during a single walk gives the same result as applying each of them to
+    the whole expression in turn. A str token that appears more than once
+    is only rewritten the first time.
+    """
+    bound_rewrites = bind_rewrites(rewrites, **config_options)
+    rewritten = deque([])
+    seen = {}
+    for token in tokens:
+        is_str = isinstance(token, str)
+        if is_str:
+            key = (type(token), token)
+            if key in seen:
+                rewritten.append(seen[key])
+                continue
+        new_token = token
+        for rewrite in bound_rewrites:
+            new_token = rewrite(new_token)
+        if is_str:
+            seen[key] = new_token
+        rewritten.append(new_token)
+    return rewritten
+
+
+def bind_rewrites(rewrites: list, **config_options) -> List[Callable]:
+    """
+    Returns 'rewrites' as functions of the token alone: the rewrites made with
+    token_rewrite() are given the config options they read.
+    """
+    bound_rewrites = []
+    for rewrite in rewrites:
+        options = getattr(rewrite, "options", ())
+        prepare = getattr(rewrite, "prepare", None)
+        rewrite = getattr(rewrite, "rewrite", rewrite)
+        if options:
+            if prepare:
+                kwargs = prepare(**config_options)
+            else:
+                kwargs = {option: config_options[option] for option in options}
+            rewrite = partial(rewrite, **kwargs)
+        bound_rewrites.append(rewrite)
+    return bound_rewrites
+
+
+_name_translations = LRUCache(global_config._config["name_cache_size"])
+
+
+def name_translator(rewrites: list, **config_options) -> Callable:
+    """
+    Returns a function of one token that applies each of 'rewrites', in
+    order, to the token. 'rewrites' are functions made with token_rewrite()
+    that depend on nothing but the token and the config options they read.
+
+    The result for each distinct str token and kind, e.g. a variable name, is
+    kept in an LRU cache shared by every render and sized by the "name_cache_size"
+    option. Entries are keyed on 'rewrites' and the values of the options
+    they read ("greek_exclusions", "underscore_subscripts", "custom_symbols")
+    so a change to any of those options is never served a stale translation.
+    """
+    cache_size = global_config._config["name_cache_size"]
+    if _name_translations.maxsize != cache_size:
+        _name_translations.maxsize = cache_size
+    options = sorted(
+        {option for rewrite in rewrites for option in getattr(rewrite, "options", ())}
+    )
+    chain = (
+        tuple(rewrites),
+        tuple(freeze(config_options[option]) for option in options),
+    )
+    bound_rewrites = bind_rewrites(rewrites, **config_options)
+
+    def translate(token: Any) -> Any:
+        is_str = isinstance(token, str)
+        if is_str:
+            key = (chain, type(token), token)
+            translated = _name_translations.get(key, _NOT_MEMOIZED)
+            if translated is not _NOT_MEMOIZED:
+                return translated
+        translated = token
+        for rewrite in bound_rewrites:
+            translated = rewrite(translated)
+        if is_str:
+            _name_translations.set(key, translated)
+        return translated
+
+    return translate
+
+
+@token_rewrite()
+def apply_rewrite(item: Any, rewrite: Callable) -> Any:
+    """
+    Returns 'item' rewritten by 'rewrite', a function of one token.
+    """
+    return rewrite(item)
+
+
+def translate_custom_symbols(d: deque, **config_options) -> deque:
+    """
+    Returns 'd' with the custom symbols swapped in, as swap_custom_symbols()
+    does, using a name_translator().
+    """
+    return apply_rewrite(d, name_translator([swap_custom_symbols], **config_options))
+
+
+def name_cache_info() -> CacheInfo:
+    """
+    Returns the hits, misses, evictions, and size of the name_translator()
+    cache.
+    """
+    return _name_translations.info()
+
+
+def clear_name_cache() -> None:
+    """
+    Empties the name_translator() cache and resets its statistics.
+    """
+    _name_translations.clear()
+
+
+def swap_integrals(d: deque, calc_results: dict, **config_options) -> deque:
+    """
+    Returns 'calculation' with any function named "quad" or "integrate"
     rendered as an integral.
     """
     swapped_deque = deque([])
@@ -2152,33 +2952,162 @@ def swap_integrals(d: deque, calc_results: dict, **config_options) -> deque:
         return d
 
 
-def swap_custom_symbols(d: deque, **config_options) -> deque:
+def prepare_custom_symbols(**config_options) -> dict:
     """
-    Swaps the custom symbols from the 'config_options'.
+    Returns the keyword arguments of swap_custom_symbols(): the
+    "custom_symbols" option compiled by custom_symbol_stages().
     """
-    swapped_items = deque([])
-    for item in d:
-        if isinstance(item, deque):
-            new_item = swap_custom_symbols(item, **config_options)
-            swapped_items.append(new_item)
-        elif isinstance(item, str):
-            custom_symbols = config_options.get("custom_symbols", {})
-            new_item = item
-            for symbol, latex_symbol in custom_symbols.items():
-                if (
-                    symbol in new_item
-                ):  # Changed to new_item to allow changes to a string accumulate
-                    new_item = new_item.replace(
-                        symbol, latex_symbol
-                    )  # Changed to new_item to allow changes to a string accumulate
-                    # Removed break to permit multiple replacements
-            swapped_items.append(new_item)
+    custom_symbols = config_options.get("custom_symbols", {})
+    return {"symbol_stages": custom_symbol_stages(tuple(custom_symbols.items()))}
+
+
+@token_rewrite("custom_symbols", prepare=prepare_custom_symbols)
+def swap_custom_symbols(item: Any, symbol_stages: tuple = ()) -> Any:
+    """
+    Swaps the custom symbols from the 'config_options', compiled into
+    'symbol_stages'. Each symbol is replaced in the result of replacing the
+    symbols before it, so the replacements accumulate in the order of the
+    "custom_symbols" option. The swapped token keeps the kind of 'item'.
+    """
+    if isinstance(item, str):
+        kind = type(item)
+        for swap_stage in symbol_stages:
+            item = swap_stage(item)
+        if kind in TOKEN_KINDS and type(item) is str:
+            item = kind(item)
+    return item
+
+
+@lru_cache(maxsize=32)
+def custom_symbol_stages(custom_symbols: tuple) -> tuple:
+    """
+    Returns the (symbol, latex_symbol) pairs of 'custom_symbols' compiled
+    into a tuple of functions of a str that, applied in order, replace the
+    symbols as swapping each one in turn with str.replace() would.
+
+    Consecutive symbols are swapped by a single regex when none of them can
+    change where another one matches: no symbol overlaps another symbol or
+    the latex of an earlier symbol in the same stage (one contains the
+    other, or the end of one is the start of the other), and no earlier
+    latex is empty. A symbol that could is swapped by a later stage.
+    """
+    stages = []
+    stage = StageStrings()
+    for symbol, latex_symbol in custom_symbols:
+        if not symbol:
+            continue
+        if stage.overlaps(symbol):
+            stages.append(stage.symbols)
+            stage = StageStrings()
+        stage.add(symbol, latex_symbol, [latex_symbol])
+    stages.append(stage.symbols)
+    return tuple(symbol_swapper(symbols) for symbols in stages if symbols)
+
+
+class StageStrings:
+    """
+    The symbols of a stage of custom_symbol_stages(), or the markers of a
+    stage of custom_bracket_stages(), and the substrings, proper prefixes,
+    and proper suffixes of the symbols and the latex they are swapped for,
+    to test a new symbol against all of them at once.
+    """
+
+    def __init__(self):
+        self.symbols = {}
+        self.has_empty = False
+        self.strings = set()
+        self.substrings = set()
+        self.prefixes = set()
+        self.suffixes = set()
+
+    def add(self, symbol: str, replacement: Any, latex: Iterable[str]) -> None:
+        self.symbols[symbol] = replacement
+        for string in (symbol, *latex):
+            if not string:
+                self.has_empty = True
+                continue
+            self.strings.add(string)
+            self.substrings.update(substrings(string))
+            self.prefixes.update(string[:size] for size in range(1, len(string)))
+            self.suffixes.update(string[-size:] for size in range(1, len(string)))
+
+    def overlaps(self, symbol: str) -> bool:
+        return (
+            self.has_empty
+            or symbol in self.substrings
+            or not self.strings.isdisjoint(substrings(symbol))
+            or any(symbol[:size] in self.suffixes for size in range(1, len(symbol)))
+            or any(symbol[-size:] in self.prefixes for size in range(1, len(symbol)))
+        )
+
+
+def substrings(string: str) -> Iterable[str]:
+    """
+    Returns every non-empty substring of 'string'.
+    """
+    return (
+        string[start:end]
+        for start in range(len(string))
+        for end in range(start + 1, len(string) + 1)
+    )
+
+
+def symbol_swapper(symbols: dict) -> Callable[[str], str]:
+    """
+    Returns a function that swaps each of the keys of 'symbols', which do not
+    overlap one another, for its value in one scan of a str.
+    """
+    if len(symbols) == 1:
+        ((symbol, latex_symbol),) = symbols.items()
+        return lambda item: (
+            item.replace(symbol, latex_symbol) if symbol in item else item
+        )
+    pattern = re.compile(trie_pattern(list(symbols)))
+    swap = lambda match: symbols[match.group()]
+    return lambda item: pattern.sub(swap, item)
+
+
+def trie_pattern(words: List[str]) -> str:
+    """
+    Returns a regex that matches any of 'words', none of which is a prefix
+    of another, with the common prefixes factored out (e.g. "ab|ac" becomes
+    "a(?:b|c)") so the regex engine tests each character once.
+    """
+    branches = {}
+    for word in words:
+        branches.setdefault(word[0], []).append(word[1:])
+    alternatives = []
+    for first, rests in branches.items():
+        if rests == [""]:
+            alternatives.append(re.escape(first))
         else:
-            swapped_items.append(item)
-    return swapped_items
+            alternatives.append(re.escape(first) + trie_pattern(rests))
+    if len(alternatives) == 1:
+        return alternatives[0]
+    return "(?:" + "|".join(alternatives) + ")"
+
+
+BRACKETS = {
+    "parenthesis": ("(", ")"),
+    "square_brackets": ("[", "]"),
+    "angle_brackets": (r"\langle", r"\rangle"),
+    "curly_brackets": (r"\lbrace", r"\rbrace"),
+    "pipes": ("|", "|"),
+    "double_pipes": (r"\|", r"\|"),
+}
+
+
+def prepare_custom_brackets(**config_options) -> dict:
+    """
+    Returns the keyword arguments of swap_custom_brackets(): the
+    "custom_brackets" option compiled by custom_bracket_stages().
+    """
+    custom_brackets = config_options.get("custom_brackets", {})
+    return {"bracket_stages": custom_bracket_stages(tuple(custom_brackets.items()))}
 
 
-def swap_custom_brackets(d: deque, **config_options) -> deque:
+@token_rewrite("custom_brackets", prepare=prepare_custom_brackets)
+def swap_custom_brackets(item: Any, bracket_stages: tuple = ()) -> Any:
     """
     Swaps custom bracket character or string with their corresponding LaTeX brackets.
     Set with user defined dictionary 'custom_brackets' in config_options
@@ -2202,78 +3131,57 @@ def swap_custom_brackets(d: deque, **config_options) -> deque:
     - pipes
     - double_pipes
     """
-    swapped_items = deque([])
-    for item in d:
-        if isinstance(item, deque):
-            new_item = swap_custom_brackets(item, **config_options)
-            swapped_items.append(new_item)
-        elif isinstance(item, str):
-            custom_brackets = config_options.get("custom_brackets", {})
-            new_item = item
-
-            # Process each bracket type
-            for bracket_type, custom_str in custom_brackets.items():
-                if custom_str and custom_str in new_item:
-                    if bracket_type == "parenthesis":
-                        new_item = _replace_alternating_brackets(
-                            new_item, custom_str, "(", ")"
-                        )
-                    elif bracket_type == "square_brackets":
-                        new_item = _replace_alternating_brackets(
-                            new_item, custom_str, "[", "]"
-                        )
-                    elif bracket_type == "angle_brackets":
-                        new_item = _replace_alternating_brackets(
-                            new_item, custom_str, r"\langle", r"\rangle"
-                        )
-                    elif bracket_type == "curly_brackets":
-                        new_item = _replace_alternating_brackets(
-                            new_item, custom_str, r"\lbrace", r"\rbrace"
-                        )
-                    elif bracket_type == "pipes":
-                        new_item = _replace_alternating_brackets(
-                            new_item, custom_str, "|", "|"
-                        )
-                    elif bracket_type == "double_pipes":
-                        new_item = _replace_alternating_brackets(
-                            new_item, custom_str, r"\|", r"\|"
-                        )
-
-            swapped_items.append(new_item)
-        else:
-            swapped_items.append(item)
-    return swapped_items
+    if isinstance(item, str):
+        for swap_stage in bracket_stages:
+            item = swap_stage(item)
+    return item
 
 
-def _replace_alternating_brackets(
-    text: str, custom_str: str, left_bracket: str, right_bracket: str
-) -> str:
+@lru_cache(maxsize=32)
+def custom_bracket_stages(custom_brackets: tuple) -> tuple:
     """
-    Helper function to replace alternating occurrences of custom_str with left and right brackets.
-    Supports both single and multi-character custom_str strings.
+    Returns the (bracket_type, custom_str) pairs of 'custom_brackets'
+    compiled into a tuple of functions of a str that, applied in order, swap
+    each custom_str for alternating left and right brackets, one bracket
+    type after another.
+
+    As in custom_symbol_stages(), consecutive bracket types whose markers
+    cannot change where another one matches are swapped in a single scan.
     """
-    if custom_str not in text:
-        return text
+    stages = []
+    stage = StageStrings()
+    for bracket_type, custom_str in custom_brackets:
+        if not custom_str or bracket_type not in BRACKETS:
+            continue
+        if stage.overlaps(custom_str):
+            stages.append(stage.symbols)
+            stage = StageStrings()
+        brackets = BRACKETS[bracket_type]
+        stage.add(custom_str, brackets, brackets)
+    stages.append(stage.symbols)
+    return tuple(bracket_swapper(markers) for markers in stages if markers)
 
-    result = ""
-    is_left = True  # Start with left bracket
-    i = 0
-    str_len = len(custom_str)
 
-    while i < len(text):
-        # Check if we're at the start of a custom_str occurrence
-        if text[i : i + str_len] == custom_str:
-            if is_left:
-                result += left_bracket
-            else:
-                result += right_bracket
-            is_left = not is_left  # Toggle for next occurrence
-            i += str_len  # Skip past the entire custom_str
-        else:
-            result += text[i]
-            i += 1
+def bracket_swapper(markers: dict) -> Callable[[str], str]:
+    """
+    Returns a function that swaps each of the keys of 'markers', which do not
+    overlap one another, for the left and the right of its (left, right)
+    brackets in turn, in one scan of a str.
+    """
+    pattern = re.compile(f"({trie_pattern(list(markers))})")
 
-    return result
+    def swap_brackets(item: str) -> str:
+        parts = pattern.split(item)
+        if len(parts) == 1:
+            return item
+        is_right = dict.fromkeys(markers, False)
+        for index in range(1, len(parts), 2):
+            marker = parts[index]
+            parts[index] = markers[marker][is_right[marker]]
+            is_right[marker] = not is_right[marker]
+        return "".join(parts)
+
+    return swap_brackets
 
 
 def swap_log_func(d: deque, calc_results: dict, **config_options) -> deque:
@@ -2326,7 +3234,7 @@ def swap_log_func(d: deque, calc_results: dict, **config_options) -> deque:
     else:
         log_func = "\\ln"
 
-    swapped_deque.append(log_func + str(base))
+    swapped_deque.append(Name(log_func + str(base)))
     if has_single_lpar:
         swapped_deque.append("\\left(")
     swapped_deque.append(operand)
@@ -2378,11 +3286,18 @@ def flatten(items: Any, omit_parentheses: bool = False) -> deque:
     used to exists, except if the reason for the sub-deque was to encapsulate
     either a fraction or an integral (then no parentheses).
     """
-    if isinstance(items, deque):
-        for item in items:
-            yield from flatten(item)  # recursion!
-    else:
+    if not isinstance(items, deque):
         yield items
+        return
+    stack = [iter(items)]
+    while stack:
+        for item in stack[-1]:
+            if isinstance(item, deque):
+                stack.append(iter(item))
+                break
+            yield item
+        else:
+            stack.pop()
 
 
 def eval_conditional(conditional_str: str, **kwargs) -> str:
@@ -2410,14 +3325,16 @@ def eval_conditional(conditional_str: str, **kwargs) -> str:
         return conditional_str
 
 
-def expr_parser(line: str) -> list:
-    import sys
-
-    sys.setrecursionlimit(3000)
-    pp.ParserElement.enablePackrat()
+def build_expr_grammar() -> pp.ParserElement:
+    """
+    Returns a new pyparsing grammar that parses a line of Python code into
+    nested lists of str tokens.
 
+    Building the grammar is expensive relative to using it. Use
+    get_expr_grammar() to retrieve the shared, already-built grammar.
+    """
     variable = pp.Word(pp.alphanums + "_.")
-    numbers = pp.pyparsing_common.fnumber.setParseAction("".join)
+    numbers = pp.pyparsing_common.fnumber.copy().setParseAction("".join)
     imag = pp.Literal("j")
     plusminus = pp.oneOf("+ -")
     imag_num = pp.Combine(numbers + imag)
@@ -2446,13 +3363,537 @@ def expr_parser(line: str) -> list:
             (arithop, 2, pp.opAssoc.LEFT),
         ],
     )
+    return expr
 
-    parsed = list_to_deque(
-        more_itertools.collapse(expr.parseString(line).asList(), levels=1)
-    )
+
+_expr_grammar = None
+_packrat_memo = LRUCache(global_config._config["packrat_cache_size"])
+_NOT_MEMOIZED = object()
+
+
+def get_expr_grammar() -> pp.ParserElement:
+    """
+    Returns the grammar used by expr_parser(). The grammar is built on the
+    first call and the same object is returned for the rest of the process.
+
+    The grammar memoizes its partial parses in its own bounded packrat memo
+    (see install_packrat_memo()) instead of enabling pyparsing's process-wide
+    packrat cache, so other users of pyparsing are not affected.
+    """
+    global _expr_grammar
+    if _expr_grammar is None:
+        grammar = build_expr_grammar()
+        install_packrat_memo(grammar, _packrat_memo)
+        _expr_grammar = grammar
+    return _expr_grammar
+
+
+def install_packrat_memo(grammar: pp.ParserElement, memo: LRUCache) -> None:
+    """
+    Makes every element reachable from 'grammar' memoize its partial parses
+    in 'memo'. Only the elements of 'grammar' are changed: pyparsing's own
+    packrat setting and any other grammars in the process are left alone.
+
+    The elements must not be shared with other grammars.
+    """
+    grammar.streamline()
+    seen = set()
+    elements = [grammar]
+    while elements:
+        element = elements.pop()
+        if id(element) in seen:
+            continue
+        seen.add(id(element))
+        element._parse = memoized_parse(element, memo)
+        elements.extend(getattr(element, "exprs", []))
+        if getattr(element, "expr", None) is not None:
+            elements.append(element.expr)
+
+
+def memoized_parse(element: pp.ParserElement, memo: LRUCache) -> Callable:
+    """
+    Returns a replacement for the _parse() method of 'element' that stores
+    each result, or parse failure, in 'memo'. This is the same memoization
+    that pyparsing performs when packrat parsing is enabled globally.
+    """
+    parse_no_cache = element._parseNoCache
+
+    def parse(instring, loc, *args, **kwargs):
+        key = (element, instring, loc, args, tuple(kwargs.items()))
+        value = memo.get(key, _NOT_MEMOIZED)
+        if value is _NOT_MEMOIZED:
+            try:
+                loc_end, tokens = parse_no_cache(instring, loc, *args, **kwargs)
+            except pp.ParseBaseException as err:
+                memo.set(key, err.__class__(*err.args))
+                raise
+            memo.set(key, (loc_end, tokens.copy()))
+            return loc_end, tokens
+        if isinstance(value, Exception):
+            raise value
+        loc_end, tokens = value
+        return loc_end, tokens.copy()
+
+    return parse
+
+
+def packrat_cache_info() -> CacheInfo:
+    """
+    Returns the hits, misses, evictions, and size of the packrat memo used
+    by the pyparsing grammar.
+    """
+    return _packrat_memo.info()
+
+
+def packrat_cache_memory() -> int:
+    """
+    Returns the approximate memory, in bytes, held by the entries of the
+    packrat memo used by the pyparsing grammar. The grammar elements that
+    make up part of each key are not counted.
+    """
+    entries = []
+    for (element, *key), value in _packrat_memo.items():
+        if isinstance(value, Exception):
+            value = (value, value.args)
+        else:
+            value = (value[0], value[1].asList())
+        entries.append((tuple(key), value))
+    return approximate_size(entries)
+
+
+def clear_packrat_cache() -> None:
+    """
+    Empties the packrat memo used by the pyparsing grammar and resets its
+    statistics.
+    """
+    _packrat_memo.clear()
+
+
+_parse_cache = LRUCache(global_config._config["parse_cache_size"])
+
+
+def expr_parser(line: str) -> deque:
+    """
+    Returns 'line' parsed into a deque of str tokens with sub-deques
+    for each parenthetical group, function call, exponent, or unary operation.
+    Each token is a Name, Number, or Op (see handcalcs.expr_ir).
+
+    The parser backend is chosen by the "parser_backend" option:
+    "pyparsing" (default) or "ast". Both return the same structure.
+
+    Parse results are kept in an LRU cache keyed on the backend and 'line'
+    and sized by the "parse_cache_size" option. The cache stores immutable
+    copies so every call returns a new deque that is safe to mutate.
+    """
+    cache_size = global_config._config["parse_cache_size"]
+    if _parse_cache.maxsize != cache_size:
+        _parse_cache.maxsize = cache_size
+    backend = global_config._config["parser_backend"]
+    cached = _parse_cache.get((backend, line))
+    if cached is not None:
+        return list_to_deque(cached)
+    try:
+        parser = EXPR_PARSERS[backend]
+    except KeyError:
+        raise ValueError(
+            f"'parser_backend' must be one of {list(EXPR_PARSERS)}, not '{backend}'."
+        )
+    parsed = typed_tokens(parser(line))
+    _parse_cache.set((backend, line), deque_to_tuple(parsed))
     return parsed
 
 
+def parse_cache_info() -> CacheInfo:
+    """
+    Returns the hits, misses, evictions, and size of the expr_parser() cache.
+    """
+    return _parse_cache.info()
+
+
+def clear_parse_cache() -> None:
+    """
+    Empties the expr_parser() cache and resets its statistics.
+    """
+    _parse_cache.clear()
+
+
+# Lines with parentheses nested deeper than this are parsed a group at a
+# time by parse_by_groups(): the pyparsing grammar recurses through dozens of
+# frames for each level of nesting
+PARSE_NESTING_LIMIT = 10
+# The names that stand in for the groups that parse_by_groups() has parsed
+GROUP_PLACEHOLDER = re.compile(r"_hc_group_(\d+)")
+
+
+def pyparsing_expr_parser(line: str) -> deque:
+    """
+    Returns 'line' parsed into a deque with the pyparsing grammar from
+    get_expr_grammar(). Raises pp.ParseException if 'line' cannot be parsed.
+
+    pyparsing parses nested parentheses recursively, so lines nested deeper
+    than PARSE_NESTING_LIMIT are parsed with parse_by_groups() instead. The
+    recursion limit is never changed.
+    """
+    expr = get_expr_grammar()
+    cache_size = global_config._config["packrat_cache_size"]
+    if _packrat_memo.maxsize != cache_size:
+        _packrat_memo.maxsize = cache_size
+    if nesting_depth(line) > PARSE_NESTING_LIMIT and not GROUP_PLACEHOLDER.search(line):
+        parsed = parse_by_groups(expr, line)
+    else:
+        parsed = expr.parseString(line).asList()
+    return list_to_deque(more_itertools.collapse(parsed, levels=1))
+
+
+def nesting_depth(line: str) -> int:
+    """
+    Returns the deepest nesting of parentheses in 'line'.
+    """
+    depth = deepest = 0
+    for char in line:
+        if char == "(":
+            depth += 1
+            deepest = max(deepest, depth)
+        elif char == ")":
+            depth -= 1
+    return deepest
+
+
+def parse_by_groups(expr: pp.ParserElement, line: str) -> list:
+    """
+    Returns 'line' parsed with 'expr' as expr.parseString(line).asList()
+    returns it, but with the contents of each pair of parentheses parsed on
+    their own, innermost first, so that no parse recurses deeper than one
+    level of nesting.
+
+    A group that has been parsed is replaced in the text of the group around
+    it by a name, e.g. "(_hc_group_0)", which the grammar reads as a single
+    operand, as it reads the group itself. The tokens of the group are then
+    spliced in for the name by fill_groups().
+    """
+    groups = []
+    stack = [[]]
+    for char in line:
+        if char == "(":
+            stack.append([])
+        elif char == ")" and len(stack) > 1:
+            content = "".join(stack.pop())
+            if content.strip():
+                parsed = expr.parseString(content).asList()
+                groups.append(fill_groups(parsed, groups))
+                content = f"_hc_group_{len(groups) - 1}"
+            stack[-1].append(f"({content})")
+        else:
+            stack[-1].append(char)
+    while len(stack) > 1:  # Parentheses that are not closed
+        content = "".join(stack.pop())
+        stack[-1].append(f"({content}")
+    return fill_groups(expr.parseString("".join(stack[0])).asList(), groups)
+
+
+def fill_groups(parsed: list, groups: list) -> list:
+    """
+    Returns a copy of 'parsed' with the tokens of the parsed 'groups' in
+    place of the names that stand in for them in parse_by_groups(). The
+    groups are spliced in as they are, without being walked again.
+    """
+    acc = []
+    stack = [(iter(parsed), acc)]
+    while stack:
+        items, target = stack[-1]
+        for item in items:
+            if isinstance(item, list):
+                nested = []
+                target.append(nested)
+                stack.append((iter(item), nested))
+                break
+            placeholder = isinstance(item, str) and GROUP_PLACEHOLDER.fullmatch(item)
+            if placeholder:
+                target.extend(groups[int(placeholder.group(1))])
+            else:
+                target.append(item)
+        else:
+            stack.pop()
+    return acc
+
+
+class _UnsupportedSyntax(Exception):
+    pass
+
+
+AST_OPERATORS = {
+    ast.Add: "+",
+    ast.Sub: "-",
+    ast.Mult: "*",
+    ast.Div: "/",
+    ast.FloorDiv: "//",
+    ast.Mod: "%",
+    ast.Eq: "==",
+    ast.NotEq: "!=",
+    ast.Lt: "<",
+    ast.LtE: "<=",
+    ast.Gt: ">",
+    ast.GtE: ">=",
+    ast.UAdd: "+",
+    ast.USub: "-",
+    ast.Invert: "~",
+}
+AST_WORD = re.compile(r"[A-Za-z0-9_.]+")
+AST_NUMBER = re.compile(r"\d+\.?\d*(?:[eE][+-]?\d+)?j?")
+# Numbers written without spaces around a + or - that pyparsing reads as a
+# single complex number token, e.g. "1+2j"
+AST_COMPLEX_PAIR = re.compile(r"\d[+-]+\d[\w.+-]*j")
+AST_IGNORED_CHARS = re.compile(r"[\s()]")
+
+
+def ast_expr_parser(line: str) -> deque:
+    """
+    Returns 'line' parsed into a deque with Python's ast module. The deque is
+    the same as the one returned by pyparsing_expr_parser().
+
+    Lines that use syntax the pyparsing grammar reads differently from Python
+    (or does not read at all) are handed to pyparsing_expr_parser().
+    """
+    try:
+        return ast_to_deque(line)
+    except (SyntaxError, ValueError, _UnsupportedSyntax):
+        return pyparsing_expr_parser(line)
+
+
+def ast_to_deque(line: str) -> deque:
+    """
+    Returns 'line' parsed into a deque with Python's ast module. Raises
+    _UnsupportedSyntax if 'line' has syntax that cannot be represented the same
+    way as the pyparsing grammar represents it.
+
+    The pyparsing grammar places all operators other than '**' and the unary
+    operators at one level of precedence so any operator chain that is not
+    in parentheses is flattened into the enclosing deque.
+    """
+    source = line.strip()
+    if not source.isascii() or AST_COMPLEX_PAIR.search(source):
+        raise _UnsupportedSyntax(line)
+    module = ast.parse(source)
+    if len(module.body) != 1:
+        raise _UnsupportedSyntax(line)
+    statement = module.body[0]
+    if isinstance(statement, ast.Assign):
+        items = []
+        for target in statement.targets:
+            items += [("flat", target), "="]
+        items.append(("flat", statement.value))
+    elif isinstance(statement, ast.Expr) and is_ast_chain(statement.value):
+        items = [("chain", statement.value)]
+    elif isinstance(statement, ast.Expr):
+        items = [("operand", statement.value)]
+    else:
+        raise _UnsupportedSyntax(line)
+    tokens = ast_tokens(items, source)
+    text = "".join(token for token in tokens if isinstance(token, str))
+    if text != AST_IGNORED_CHARS.sub("", source):
+        # Some of the source, e.g. a trailing comma, is not in the tokens
+        raise _UnsupportedSyntax(line)
+    parsed = tokens_to_deque(tokens)
+    if len(parsed) == 1 and isinstance(parsed[0], deque):
+        return parsed[0]
+    return parsed
+
+
+_GROUP_START = object()
+_GROUP_END = object()
+
+
+def ast_tokens(items: list, source: str) -> list:
+    """
+    Returns the str tokens of the ast nodes in 'items', in source order, with
+    _GROUP_START and _GROUP_END marking where each sub-deque begins and ends.
+
+    Each node in 'items' is a tuple of (mode, node) where mode is one of:
+        "flat": an operator chain not in parentheses is spliced into the
+            enclosing chain, anything else is a single operand
+        "chain": the operands and operators of an operator chain
+        "operand": a single operand
+    str items are passed through as tokens.
+
+    The nodes are expanded with an explicit stack so that the depth of the
+    tree is not limited by the recursion limit.
+    """
+    tokens = []
+    stack = list(reversed(items))
+    while stack:
+        item = stack.pop()
+        if not isinstance(item, tuple):
+            tokens.append(item)
+            continue
+        mode, node = item
+        if mode == "flat":
+            if is_ast_chain(node) and not is_parenthesized(node, source):
+                mode = "chain"
+            else:
+                mode = "operand"
+        if mode == "chain":
+            expanded = ast_chain_items(node)
+        else:
+            expanded = ast_operand_items(node, source)
+        stack.extend(reversed(expanded))
+    return tokens
+
+
+def tokens_to_deque(tokens: list) -> deque:
+    """
+    Returns the tokens from ast_tokens() as a nested deque.
+    """
+    stack = [deque([])]
+    for token in tokens:
+        if token is _GROUP_START:
+            stack.append(deque([]))
+        elif token is _GROUP_END:
+            group = stack.pop()
+            stack[-1].append(group)
+        else:
+            stack[-1].append(token)
+    return stack[0]
+
+
+def is_ast_chain(node: ast.AST) -> bool:
+    """
+    Returns True if 'node' is an operator chain that the pyparsing grammar
+    would flatten: any binary operation other than '**', a comparison,
+    or a tuple.
+    """
+    if isinstance(node, ast.BinOp):
+        return not isinstance(node.op, ast.Pow)
+    return isinstance(node, (ast.Compare, ast.Tuple))
+
+
+def ast_chain_items(node: ast.AST) -> list:
+    """
+    Returns the operands and operators in the operator chain, 'node', as
+    items for ast_tokens().
+    """
+    if isinstance(node, ast.BinOp):
+        return [("flat", node.left), ast_operator(node.op), ("flat", node.right)]
+    elif isinstance(node, ast.Compare):
+        items = [("flat", node.left)]
+        for op, comparator in zip(node.ops, node.comparators):
+            items += [ast_operator(op), ("flat", comparator)]
+        return items
+    items = []
+    for elt in node.elts:
+        if items:
+            items.append(",")
+        items.append(("flat", elt))
+    return items
+
+
+def ast_operand_items(node: ast.AST, source: str) -> list:
+    """
+    Returns 'node' as items for ast_tokens() that make up a single operand:
+    a str for names and numbers and a group for everything else.
+    """
+    if is_ast_chain(node):
+        return [_GROUP_START, ("chain", node), _GROUP_END]
+    elif isinstance(node, ast.BinOp):
+        return [
+            _GROUP_START,
+            ("operand", node.left),
+            "**",
+            ("operand", node.right),
+            _GROUP_END,
+        ]
+    elif isinstance(node, ast.UnaryOp):
+        return [
+            _GROUP_START,
+            ast_operator(node.op),
+            ("operand", node.operand),
+            _GROUP_END,
+        ]
+    elif isinstance(node, ast.Call):
+        if any(isinstance(arg, ast.Starred) for arg in node.args):
+            raise _UnsupportedSyntax(source)
+        items = [_GROUP_START, ast_dotted_name(node.func, source)]
+        if len(node.args) == 1 and not node.keywords:
+            items.append(("operand", node.args[0]))
+        elif node.args or node.keywords:
+            args = []
+            for arg in node.args:
+                if args:
+                    args.append(",")
+                args.append(("flat", arg))
+            for kwarg in node.keywords:
+                if kwarg.arg is None:
+                    raise _UnsupportedSyntax(source)
+                if args:
+                    args.append(",")
+                args += [kwarg.arg, "=", ("flat", kwarg.value)]
+            items += [_GROUP_START] + args + [_GROUP_END]
+        return items + [_GROUP_END]
+    elif isinstance(node, (ast.Name, ast.Attribute)):
+        return [ast_dotted_name(node, source)]
+    elif isinstance(node, ast.Constant):
+        text = source[node.col_offset : node.end_col_offset]
+        if AST_NUMBER.fullmatch(text) or (
+            AST_WORD.fullmatch(text) and not text[0].isdigit()
+        ):
+            return [text]
+    raise _UnsupportedSyntax(source)
+
+
+def ast_dotted_name(node: ast.AST, source: str) -> str:
+    """
+    Returns the source text of 'node' if it is a name or dotted name written
+    without spaces, e.g. "np.pi".
+    """
+    text = source[node.col_offset : node.end_col_offset]
+    while isinstance(node, ast.Attribute):
+        node = node.value
+    if not isinstance(node, ast.Name) or not AST_WORD.fullmatch(text):
+        raise _UnsupportedSyntax(source)
+    return text
+
+
+def ast_operator(op: ast.AST) -> str:
+    try:
+        return AST_OPERATORS[type(op)]
+    except KeyError:
+        raise _UnsupportedSyntax(op)
+
+
+def is_parenthesized(node: ast.AST, source: str) -> bool:
+    """
+    Returns True if 'node' is directly enclosed in parentheses in 'source'.
+    The parentheses of a function call around its only argument count as
+    enclosing parentheses.
+    """
+    start, end = node.col_offset, node.end_col_offset
+    if isinstance(node, ast.Tuple):
+        # The parentheses of a tuple are included in its position
+        if source[start] != "(":
+            return False
+        depth = 0
+        for idx in range(start, end):
+            if source[idx] == "(":
+                depth += 1
+            elif source[idx] == ")":
+                depth -= 1
+                if not depth:
+                    return idx == end - 1
+        return False
+    while start > 0 and source[start - 1] in " \t":
+        start -= 1
+    while end < len(source) and source[end] in " \t":
+        end += 1
+    return (
+        start > 0
+        and source[start - 1] == "("
+        and end < len(source)
+        and source[end] == ")"
+    )
+
+
+EXPR_PARSERS = {"pyparsing": pyparsing_expr_parser, "ast": ast_expr_parser}
+
+
 # def convert_to_number(x: str):
 #     x = "".join(x)
 #     try:
@@ -2466,83 +3907,82 @@ def expr_parser(line: str) -> list:
 
 def list_to_deque(los: List[str]) -> deque:
     """
-    Return `los` converted into a deque.
+    Return `los` converted into a deque. Nested lists and tuples are
+    converted into nested deques.
     """
     acc = deque([])
-    for s in los:
-        if isinstance(s, list):
-            acc.append(list_to_deque(s))
+    stack = [(iter(los), acc)]
+    while stack:
+        items, target = stack[-1]
+        for s in items:
+            if isinstance(s, (list, tuple)):
+                nested = deque([])
+                target.append(nested)
+                stack.append((iter(s), nested))
+                break
+            target.append(s)
         else:
-            acc.append(s)
+            stack.pop()
     return acc
 
 
-def swap_double_subscripts(pycode_as_deque: deque, **config_options) -> deque:
+def deque_to_tuple(d: deque) -> tuple:
+    """
+    Return 'd' converted into a tuple. Nested deques are converted into
+    nested tuples.
+    """
+    acc = []
+    stack = [(iter(d), acc)]
+    while stack:
+        items, target = stack[-1]
+        for s in items:
+            if isinstance(s, deque):
+                stack.append((iter(s), []))
+                break
+            target.append(s)
+        else:
+            stack.pop()
+            if stack:
+                stack[-1][1].append(tuple(target))
+    return tuple(acc)
+
+
+@name_rewrite()
+def swap_double_subscripts(name: str, **config_options) -> str:
     """
     For variables or function names that contain a double subscript '__',
     the double subscript will be replaced with LaTeX space: "\\ "
     """
-    swapped_deque = deque([])
-    for item in pycode_as_deque:
-        if isinstance(item, deque):
-            new_item = swap_double_subscripts(item)
-        elif isinstance(item, str) and "__" in item:
-            new_item = item.replace("__", "\\ ")
-        else:
-            new_item = item
-        swapped_deque.append(new_item)
-    return swapped_deque
+    if "__" in name:
+        return name.replace("__", "\\ ")
+    return name
 
 
-def extend_subscripts(pycode_as_deque: deque, **config_options) -> deque:
+@name_rewrite()
+def extend_subscripts(name: str, **config_options) -> str:
     """
     For variables named with a subscript, e.g. V_c, this function ensures that any
     more than one subscript, e.g. s_ze, is included in the latex subscript notation.
-    For any item in 'pycode_as_deque' that has more than one character in the subscript,
+    For any name that has more than one character in the subscript,
     e.g. s_ze, then it will be converted to s_{ze}. Also handles nested subscripts.
     """
-    swapped_deque = deque([])
-    for item in pycode_as_deque:
-        if isinstance(item, deque):
-            new_item = extend_subscripts(item)  # recursion!
-            swapped_deque.append(new_item)
-        elif isinstance(item, str) and "_" in item and not "\\int" in item:
-            new_item = ""
-            for char in item:
-                if char == "_":
-                    new_item += char
-                    new_item += "{"
-                else:
-                    new_item += char
-            num_braces = new_item.count("{") - new_item.count(
-                "}"
-            )  # count unclosed braces
+    if "_" in name and not "\\int" in name:
+        new_name = name.replace("_", "_{")
+        num_braces = new_name.count("{") - new_name.count("}")  # count unclosed braces
+        return new_name + "}" * num_braces
+    return name
 
-            new_item += "}" * num_braces
-            swapped_deque.append(new_item)
-        else:
-            swapped_deque.append(item)
-    return swapped_deque
 
-
-def replace_underscores(pycode_as_deque: deque, **config_options) -> deque:
+@name_rewrite()
+def replace_underscores(name: str, **config_options) -> str:
     """
-    Returns 'pycode_as_deque' with underscores replaced with spaces.
+    Returns 'name' with underscores replaced with spaces.
     Used when global_config['underscore_subscripts'] == False
     """
-    swapped_deque = deque([])
-    for item in pycode_as_deque:
-        if isinstance(item, deque):
-            new_item = replace_underscores(item)
-            swapped_deque.append(new_item)
-        elif isinstance(item, str):
-            new_item = item.replace("_", "\\ ")
-            swapped_deque.append(new_item)
-        else:
-            swapped_deque.append(item)
-    return swapped_deque
+    return name.replace("_", "\\ ")
 
 
+@deque_walker
 def swap_chained_fracs(d: deque, **config_options) -> deque:
     """
     Swaps out the division symbol, "/", with a Latex fraction.
@@ -2564,7 +4004,7 @@ def swap_chained_fracs(d: deque, **config_options) -> deque:
     close_bracket_token = False
     for item in d:
         if isinstance(item, deque):
-            swapped_deque.append(swap_chained_fracs(item))  # recursion!
+            swapped_deque.append((yield item))
 
         elif item == "/" and not past_first_frac:
             past_first_frac = True
@@ -2618,6 +4058,7 @@ def test_for_py_operator(item: str):
     return False
 
 
+@deque_walker
 def swap_frac_divs(code: deque, **config_options) -> deque:
     """
     Swaps out the division symbol, "/", with a Latex fraction.
@@ -2637,7 +4078,7 @@ def swap_frac_divs(code: deque, **config_options) -> deque:
         if code[next_idx] == "/" and isinstance(item, deque):
             new_item = f"{ops}{a}"
             swapped_deque.append(new_item)
-            swapped_deque.append(swap_frac_divs(item, **config_options))  # recursion!
+            swapped_deque.append((yield item))
         elif code[next_idx] == "/" and not isinstance(item, deque):
             new_item = f"{ops}{a}"
             swapped_deque.append(new_item)
@@ -2647,22 +4088,21 @@ def swap_frac_divs(code: deque, **config_options) -> deque:
             close_bracket_token += 1
         elif close_bracket_token:
             if isinstance(item, deque):
-                swapped_deque.append(
-                    swap_frac_divs(item, **config_options)
-                )  # recursion!
+                swapped_deque.append((yield item))
             else:
                 swapped_deque.append(item)
             new_item = f"{b}" * close_bracket_token
             close_bracket_token = 0
             swapped_deque.append(new_item)
         elif isinstance(item, deque):
-            new_item = swap_frac_divs(item, **config_options)  # recursion!
+            new_item = yield item
             swapped_deque.append(new_item)
         else:
             swapped_deque.append(item)
     return swapped_deque
 
 
+@deque_walker
 def swap_math_funcs(
     pycode_as_deque: deque, calc_results: dict, **config_options
 ) -> deque:
@@ -2682,7 +4122,7 @@ def swap_math_funcs(
                 item = swap_func_name(item, poss_func_name)
                 if poss_func_name == "sqrt":
                     item = insert_func_braces(item)
-                new_item = swap_math_funcs(item, calc_results)
+                new_item = yield item
                 swapped_deque.append(new_item)
             elif poss_func_name == func_name_match:
                 # Begin checking for specialized function names
@@ -2701,11 +4141,11 @@ def swap_math_funcs(
                     item = swap_func_name(item, poss_func_name, new_func)
                     # if possible_func:
                     #     item = insert_func_braces(item)
-                    new_item = swap_math_funcs(item, calc_results)
+                    new_item = yield item
                     swapped_deque.append(new_item)
 
                 else:
-                    swapped_deque.append(swap_math_funcs(item, calc_results))
+                    swapped_deque.append((yield item))
         else:
             swapped_deque.append(item)
     return swapped_deque
@@ -2775,42 +4215,35 @@ def insert_func_braces(d: deque, **config_options) -> deque:
 
 def swap_func_name(d: deque, old: str, new: str = "", **config_options) -> deque:
     """
-    Returns 'd' with the function name swapped out
+    Returns 'd' with the function name swapped out. The swapped name keeps
+    the token kind of the name it replaces.
     """
     swapped_deque = deque([])
     for elem in d:
         if elem == old:
-            if new:
-                swapped_deque.append(new)
-            else:
-                swapped_func = get_func_latex(elem)
-                swapped_deque.append(swapped_func)
+            swapped_func = new or get_func_latex(elem)
+            if type(elem) in TOKEN_KINDS:
+                swapped_func = type(elem)(swapped_func)
+            swapped_deque.append(swapped_func)
         else:
             swapped_deque.append(elem)
     return swapped_deque
 
 
-def swap_py_operators(pycode_as_deque: deque, **config_options) -> deque:
+@token_rewrite()
+def swap_py_operators(item: Any, **config_options) -> Any:
     """
     Swaps out Python mathematical operators that do not exist in Latex.
-    Specifically, swaps "*", "**", and "%" for "\\cdot", "^", and "\\bmod",
+    Specifically, swaps "*", "%", and "," for "\\cdot", "\\bmod", and ",\\ ",
     respectively.
     """
-    swapped_deque = deque([])
-    for item in pycode_as_deque:
-        if type(item) is deque:
-            new_item = swap_py_operators(item)  # recursion!
-            swapped_deque.append(new_item)
-        else:
-            if item == "*":
-                swapped_deque.append("\\cdot")
-            elif item == "%":
-                swapped_deque.append("\\bmod")
-            elif item == ",":
-                swapped_deque.append(",\\ ")
-            else:
-                swapped_deque.append(item)
-    return swapped_deque
+    if item == "*":
+        return "\\cdot"
+    elif item == "%":
+        return "\\bmod"
+    elif item == ",":
+        return ",\\ "
+    return item
 
 
 def swap_scientific_notation_str(item: str) -> str:
@@ -2899,31 +4332,26 @@ def swap_scientific_notation_float(
 #     return swapped_deque
 
 
-def swap_comparison_ops(pycode_as_deque: deque, **config_options) -> deque:
+COMPARISON_OPS = {
+    "<": "\\lt",
+    ">": "\\gt",
+    "<=": "\\leq",
+    ">=": "\\geq",
+    "==": "=",
+    "!=": "\\neq",
+}
+
+
+@token_rewrite()
+def swap_comparison_ops(item: Any, **config_options) -> Any:
     """
-    Returns a deque representing 'pycode_as_deque' with any python
-    comparison operators, eg. ">", ">=", "!=", "==" swapped with
-    their latex equivalent.
+    Returns 'item' swapped with its latex equivalent if it is a python
+    comparison operator, eg. ">", ">=", "!=", "==".
     """
-    py_ops = {
-        "<": "\\lt",
-        ">": "\\gt",
-        "<=": "\\leq",
-        ">=": "\\geq",
-        "==": "=",
-        "!=": "\\neq",
-    }
-    swapped_deque = deque([])
-    for item in pycode_as_deque:
-        if type(item) is deque:
-            new_item = swap_comparison_ops(item)
-            swapped_deque.append(new_item)
-        else:
-            new_item = dict_get(py_ops, item)
-            swapped_deque.append(new_item)
-    return swapped_deque
+    return dict_get(COMPARISON_OPS, item)
 
 
+@deque_walker
 def swap_superscripts(pycode_as_deque: deque, **config_options) -> deque:
     """
     Returns the python code deque with any exponentials swapped
@@ -2940,20 +4368,20 @@ def swap_superscripts(pycode_as_deque: deque, **config_options) -> deque:
         next_idx = min(idx + 1, len(pycode_as_deque) - 1)
         next_item = pycode_as_deque[next_idx]
         if isinstance(item, deque):  # and not close_bracket_token:
-            if "**" == str(next_item):
+            if isinstance(next_item, str) and next_item == "**":
                 pycode_with_supers.append(l_par)
-                new_item = swap_superscripts(item)
+                new_item = yield item
                 pycode_with_supers.append(new_item)
                 pycode_with_supers.append(r_par)
             else:
-                new_item = swap_superscripts(item)  # recursion!
+                new_item = yield item
                 pycode_with_supers.append(new_item)
             if close_bracket_token:
                 pycode_with_supers.append(b)
                 close_bracket_token = False
 
         else:
-            if "**" == str(next_item):
+            if isinstance(next_item, str) and next_item == "**":
                 pycode_with_supers.append(l_par)
                 pycode_with_supers.append(item)
                 pycode_with_supers.append(r_par)
@@ -2972,36 +4400,25 @@ def swap_superscripts(pycode_as_deque: deque, **config_options) -> deque:
     return pycode_with_supers
 
 
-def swap_for_greek(pycode_as_deque: deque, **config_options) -> deque:
+def prepare_greek_symbols(**config_options) -> dict:
+    """
+    Returns the keyword arguments of swap_for_greek(): the Greek symbols less
+    the "greek_exclusions" option, as a ResolvedConfig holds them. Options
+    that were not resolved, e.g. a plain dict, are looked up in
+    greek_symbols().
+    """
+    if "greek" in config_options:
+        return {"greek": config_options["greek"]}
+    return {"greek": greek_symbols(tuple(config_options["greek_exclusions"]))}
+
+
+@name_rewrite("greek_exclusions", prepare=prepare_greek_symbols)
+def swap_for_greek(name: str, greek: dict) -> str:
     """
-    Returns full line of code as deque with any Greek terms swapped in for words describing
+    Returns 'name' with any Greek terms swapped in for words describing
     Greek terms, e.g. 'beta' -> 'β'
     """
-    greeks_to_exclude = config_options["greek_exclusions"]
-    swapped_deque = deque([])
-    greek_chainmap = ChainMap(GREEK_LOWER, GREEK_UPPER)
-    for item in pycode_as_deque:
-        if isinstance(item, deque):
-            new_item = swap_for_greek(item, **config_options)
-            swapped_deque.append(new_item)
-        elif "_" in str(item):
-            components = str(item).split("_")
-            swapped_components = [
-                (
-                    dict_get(greek_chainmap, component)
-                    if component not in greeks_to_exclude
-                    else component
-                )
-                for component in components
-            ]
-            new_item = "_".join(swapped_components)
-            swapped_deque.append(new_item)
-        elif item not in greeks_to_exclude:
-            new_item = dict_get(greek_chainmap, item)
-            swapped_deque.append(new_item)
-        else:
-            swapped_deque.append(item)
-    return swapped_deque
+    return "_".join(greek.get(component, component) for component in name.split("_"))
 
 
 def test_for_long_var_strs(elem: Any, **config_options) -> bool:
@@ -3039,77 +4456,48 @@ def test_for_long_var_strs(elem: Any, **config_options) -> bool:
     return True
 
 
-def swap_long_var_strs(pycode_as_deque: deque, **config_options) -> deque:
+@token_rewrite("underscore_subscripts")
+def swap_long_var_strs(item: Any, **config_options) -> Any:
     """
-    Returns a new deque that represents 'pycode_as_deque' but
-    with all long variable names "escaped" so that they do not
-    render as italic variables but rather upright text.
+    Returns 'item' "escaped" so that it does not render as an italic
+    variable but rather upright text if it is a long variable name.
 
     ***Must be just before swap_subscripts in stack.***
     """
-    swapped_deque = deque([])
     begin = "\\mathrm{"
     end = "}"
-    for item in pycode_as_deque:
-        if isinstance(item, deque):
-            new_item = swap_long_var_strs(item, **config_options)
-            swapped_deque.append(new_item)
-        elif test_for_long_var_strs(item, **config_options) and not is_number(
-            str(item)
-        ):
-            try:
-                top_level, remainder = str(item).split("_", 1)
-                if config_options["underscore_subscripts"]:
-                    new_item = begin + top_level + end + "_" + remainder
-                else:
-                    new_item = begin + top_level + "_" + remainder + end
-                swapped_deque.append(new_item)
-            except:
-                new_item = begin + item + end
-                swapped_deque.append(new_item)
-        else:
-            swapped_deque.append(item)
-    return swapped_deque
+    if test_for_long_var_strs(item, **config_options) and not is_number(str(item)):
+        try:
+            top_level, remainder = str(item).split("_", 1)
+            if config_options["underscore_subscripts"]:
+                return begin + top_level + end + "_" + remainder
+            else:
+                return begin + top_level + "_" + remainder + end
+        except:
+            return begin + item + end
+    return item
 
 
-def swap_prime_notation(d: deque, **config_options) -> deque:
+@token_rewrite()
+def swap_prime_notation(item: Any, **config_options) -> Any:
     """
-    Returns a deque representing 'd' with all elements
-    with  "_prime" substrings replaced with "'".
+    Returns 'item' with any "_prime" substrings replaced with "'".
     """
-    swapped_deque = deque([])
-    for item in d:
-        if isinstance(item, deque):
-            new_item = swap_prime_notation(item)
-            swapped_deque.append(new_item)
-        elif isinstance(item, str):
-            new_item = item.replace("_prime", "'")
-            swapped_deque.append(new_item)
-        else:
-            swapped_deque.append(item)
-    return swapped_deque
+    if isinstance(item, str):
+        return item.replace("_prime", "'")
+    return item
 
 
-def swap_values(pycode_as_deque: deque, tex_results: dict, **config_options) -> deque:
+@token_rewrite()
+def swap_values(item: Any, tex_results: dict, **config_options) -> Any:
     """
-    Returns a the 'pycode_as_deque' with any symbolic terms swapped out for their corresponding
-    values.
+    Returns 'item' swapped out for its corresponding value if it is a
+    symbolic term.
     """
-    outgoing = deque([])
-    for item in pycode_as_deque:
-        swapped_value = ""
-        if isinstance(item, deque):
-            outgoing.append(
-                swap_values(item, tex_results, **config_options)
-            )  # recursion!
-        else:
-            swapped_value = dict_get(tex_results, item)
-            if isinstance(swapped_value, str) and swapped_value != item:
-                swapped_value = format_strings(
-                    swapped_value, comment=False, **config_options
-                )
-            outgoing.append(swapped_value)
-    return outgoing
+    swapped_value = dict_get(tex_results, item)
+    if isinstance(swapped_value, str) and swapped_value != item:
+        swapped_value = format_strings(swapped_value, comment=False, **config_options)
+    return swapped_value
 
 
 def test_for_unary(d: deque) -> bool:
@@ -3138,8 +4526,7 @@ def get_function_name(d: deque) -> str:
     Returns the function name if 'd' represents a deque containing a function
     name (both typical case and special case).
     """
-    dummy_deque = copy.deepcopy(d)
-    dummy_deque.popleft()
+    dummy_deque = deque(itertools.islice(d, 1, None))
     if test_for_function_name(d):
         return d[0]
     elif test_for_function_name(dummy_deque):
@@ -3231,12 +4618,12 @@ def insert_function_parentheses(d: deque) -> deque:
             swapped_deque.append(item)
             swapped_deque.append(rpar)
         elif idx == 1 and isinstance(item, deque):
-            new_item = copy.deepcopy(item)
+            new_item = copy.copy(item)
             new_item.appendleft(lpar)
             new_item.append(rpar)
             swapped_deque.append(new_item)
         elif idx == 2 and isinstance(item, deque) and d[0] == "\\left(":
-            new_item = copy.deepcopy(item)
+            new_item = copy.copy(item)
             new_item.appendleft(lpar)
             new_item.append(rpar)
             swapped_deque.append(new_item)
@@ -3269,6 +4656,7 @@ def insert_arithmetic_parentheses(d: deque) -> deque:
     return swapped_deque
 
 
+@deque_walker
 def insert_parentheses(pycode_as_deque: deque, **config_options) -> deque:
     """
     Returns a deque representing 'pycode_as_deque' but with appropriate
@@ -3290,7 +4678,7 @@ def insert_parentheses(pycode_as_deque: deque, **config_options) -> deque:
                     skip_fraction_token = True
                 if poss_func_name not in func_exclude:
                     item = insert_function_parentheses(item)
-                new_item = insert_parentheses(item)
+                new_item = yield item
                 swapped_deque.append(new_item)
 
             elif (
@@ -3302,7 +4690,7 @@ def insert_parentheses(pycode_as_deque: deque, **config_options) -> deque:
                 if test_for_fraction_exception(item, next_item):
 
                     skip_fraction_token = True
-                    new_item = insert_parentheses(item)
+                    new_item = yield item
                     swapped_deque.append(new_item)
                 else:
                     if (
@@ -3312,17 +4700,17 @@ def insert_parentheses(pycode_as_deque: deque, **config_options) -> deque:
                     ):  # Allow swap_superscript to handle its parenths
                         item = insert_arithmetic_parentheses(item)
 
-                    new_item = insert_parentheses(item)
+                    new_item = yield item
                     swapped_deque.append(new_item)
 
             elif test_for_unary(item):
                 item = insert_unary_parentheses(item)
-                new_item = insert_parentheses(item)
+                new_item = yield item
                 swapped_deque.append(new_item)
             else:
                 if skip_fraction_token and prev_item == "/":
                     skip_fraction_token = False
-                new_item = insert_parentheses(item)
+                new_item = yield item
                 swapped_deque.append(new_item)
         else:
             if item == "/":
@@ -0,0 +1,240 @@
+#    Copyright 2020 Connor Ferster
+
+#    Licensed under the Apache License, Version 2.0 (the "License");
+#    you may not use this file except in compliance with the License.
+#    You may obtain a copy of the License at
+
+#        http://www.apache.org/licenses/LICENSE-2.0
+
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS,
+#    WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#    See the License for the specific language governing permissions and
+#    limitations under the License.
+"""
+The results table of @handcalc(vectorized=True) functions, which are called
+with NumPy arrays of inputs: the derivation is rendered once, symbolically,
+and followed by a table of the inputs and results of each case instead of
+every element of every array.
+
+NumPy is only imported when a vectorized function is called.
+"""
+
+import ast
+import inspect
+import textwrap
+from typing import Any, Callable, Dict, List, Tuple
+
+from handcalcs.expr_ir import Name
+from handcalcs.global_config import ResolvedConfig
+from handcalcs.handcalcs import (
+    latex_repr,
+    name_translator,
+    rewrite_tokens,
+    swap_custom_brackets,
+    swap_custom_symbols,
+    swap_dec_sep,
+    swap_scientific_notation_str,
+    symbolic_rewrites,
+    toggle_scientific_notation,
+)
+
+
+def render_vectorized(
+    derivation: str,
+    func: Callable,
+    cell_source: str,
+    scope: dict,
+    line_args: dict,
+    config_options: ResolvedConfig,
+) -> str:
+    """
+    Returns the latex code of 'derivation', the cell of 'func' rendered
+    symbolically, followed by the table of the values in 'scope'. Both are
+    gathered in the latex block of 'derivation', using the block delimiters
+    and line break derived by 'config_options'.
+    """
+    columns, constants = table_columns(func, cell_source, scope)
+    precision = line_args["precision"]
+    if precision is None:
+        precision = config_options["display_precision"]
+    use_scientific_notation = toggle_scientific_notation(
+        config_options["use_scientific_notation"], line_args["sci_not"]
+    )
+    options = (use_scientific_notation, precision, config_options)
+    opener = config_options["opener"]
+    closer = config_options["closer"]
+    body = "".join(derivation.replace(opener, "", 1).rsplit(closer, 1)).strip()
+    rows = [body]
+    if constants:
+        rows.append(constants_line(constants, *options))
+    if columns:
+        rows.append(results_table(columns, *options))
+    line_break = config_options["line_end"]
+    return (
+        f"{opener}\n\\begin{{gathered}}\n"
+        f"{line_break.join(rows)}\n"
+        f"\\end{{gathered}}\n{closer}"
+    )
+
+
+def table_columns(
+    func: Callable, cell_source: str, scope: dict
+) -> Tuple[Dict[Tuple[str, str], Any], Dict[str, Any]]:
+    """
+    Returns the columns of the results table and the constants of the call
+    of 'func' in 'scope'. The columns map ("inputs" or "results", name) to
+    the flattened array of the value of 'name' broadcast to the shape of the
+    cases. Inputs are the arguments of 'func' and results the names assigned
+    in 'cell_source'. The constants are the inputs and results that are not
+    arrays, e.g. E = 200000, by name.
+
+    Raises ValueError if the arrays cannot be broadcast together.
+    """
+    try:
+        import numpy as np
+    except ModuleNotFoundError:
+        raise ModuleNotFoundError(
+            "The vectorized option of @handcalc requires numpy to be installed."
+        )
+
+    names = [("inputs", name) for name in inspect.signature(func).parameters]
+    names += [("results", name) for name in assigned_names(cell_source)]
+    arrays = {}
+    constants = {}
+    for group, name in names:
+        if name not in scope or name in constants or (group, name) in arrays:
+            continue
+        value = scope[name]
+        if getattr(value, "ndim", 0) >= 1 and hasattr(value, "shape"):
+            arrays[(group, name)] = np.asarray(value)
+        elif not (callable(value) or inspect.ismodule(value)):
+            constants[name] = value
+    try:
+        shape = np.broadcast_shapes(*(array.shape for array in arrays.values()))
+    except ValueError as error:
+        raise ValueError(
+            f"The arrays of a vectorized @handcalc function must broadcast "
+            f"together: {error}"
+        ) from None
+    columns = {
+        key: np.broadcast_to(array, shape).ravel() for key, array in arrays.items()
+    }
+    return columns, constants
+
+
+def assigned_names(cell_source: str) -> List[str]:
+    """
+    Returns the names assigned in 'cell_source', in order.
+    """
+    names = []
+    for node in ast.walk(ast.parse(textwrap.dedent(cell_source))):
+        if isinstance(node, ast.Name) and isinstance(node.ctx, ast.Store):
+            if node.id not in names:
+                names.append(node.id)
+    return names
+
+
+def constants_line(
+    constants: Dict[str, Any],
+    use_scientific_notation: bool,
+    precision: int,
+    config_options: dict,
+) -> str:
+    """
+    Returns the 'constants', which are the same in every case, as
+    "name = value" separated by quads.
+    """
+    formatter = config_options["preferred_string_formatter"]
+    values = [
+        latex_repr(value, use_scientific_notation, precision, formatter)
+        for value in constants.values()
+    ]
+    values = swap_dec_sep(values, config_options["decimal_separator"])
+    return " ,\\quad ".join(
+        f"{latex_name(name, config_options)} = {value}"
+        for name, value in zip(constants, values)
+    )
+
+
+def results_table(
+    columns: Dict[Tuple[str, str], Any],
+    use_scientific_notation: bool,
+    precision: int,
+    config_options: dict,
+) -> str:
+    """
+    Returns an array environment with a row for each case of 'columns',
+    numbered from 0, and the inputs and the results separated by rules. When
+    there are more cases than the "vectorized_table_rows" option, only the
+    first and last cases are shown, around a row of vertical dots.
+    """
+    import numpy as np
+
+    count = len(next(iter(columns.values())))
+    head, tail = elided_rows(count, config_options["vectorized_table_rows"])
+    rows = np.concatenate([np.arange(head), np.arange(count - tail, count)])
+    formatted = [
+        format_column(column[rows], use_scientific_notation, precision, config_options)
+        for column in columns.values()
+    ]
+    groups = [group for group, _ in columns]
+    alignment = "c|" + "|".join(
+        "c" * groups.count(group) for group in ("inputs", "results") if group in groups
+    )
+    header = ["i"] + [latex_name(name, config_options) for _, name in columns]
+    table = [" & ".join(header) + " \\\\", "\\hline"]
+    for position, row in enumerate(rows.tolist()):
+        if position == head and tail:
+            table.append(" & ".join(["\\vdots"] * len(header)) + " \\\\")
+        cells = [str(row)] + [column[position] for column in formatted]
+        table.append(" & ".join(cells) + " \\\\")
+    return f"\\begin{{array}}{{{alignment}}}\n" + "\n".join(table) + "\n\\end{array}"
+
+
+def elided_rows(count: int, max_rows: int) -> Tuple[int, int]:
+    """
+    Returns the number of rows to show from the start and from the end of
+    'count' rows so that no more than 'max_rows' are shown. All of the rows
+    are shown if 'max_rows' is not positive.
+    """
+    if max_rows <= 0 or count <= max_rows:
+        return count, 0
+    head = (max_rows + 1) // 2
+    return head, max_rows - head
+
+
+def format_column(
+    values: Any, use_scientific_notation: bool, precision: int, config_options: dict
+) -> List[str]:
+    """
+    Returns the NumPy array 'values' formatted as latex_repr() formats each
+    of its elements. Arrays of floats are formatted in a single vectorized
+    operation.
+    """
+    import numpy as np
+
+    if values.dtype.kind == "f":
+        notation = "e" if use_scientific_notation else "f"
+        formatted = np.char.mod(f"%.{precision}{notation}", values).tolist()
+        if use_scientific_notation:
+            formatted = [swap_scientific_notation_str(item) for item in formatted]
+    else:
+        formatter = config_options["preferred_string_formatter"]
+        formatted = [
+            latex_repr(item, use_scientific_notation, precision, formatter)
+            for item in values.tolist()
+        ]
+    return list(swap_dec_sep(formatted, config_options["decimal_separator"]))
+
+
+def latex_name(name: str, config_options: dict) -> str:
+    """
+    Returns the variable 'name' in latex, as it is rendered in a calculation.
+    """
+    rewrites = [
+        swap_custom_symbols,
+        swap_custom_brackets,
+        name_translator(symbolic_rewrites(**config_options), **config_options),
+    ]
+    return rewrite_tokens([Name(name)], rewrites, **config_options)[0]
@@ -0,0 +1,109 @@
+from handcalcs.caching import (
+    LRUCache,
+    CacheInfo,
+    approximate_size,
+    fingerprint,
+    freeze,
+    stable_digest,
+)
+from decimal import Decimal
+import math
+import sys
+
+
+def test_lru_cache():
+    cache = LRUCache(maxsize=2)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    assert cache.get("a") == 1  # "b" is now the least recently used
+    cache.set("c", 3)
+    assert "b" not in cache
+    assert cache.get("b", "missing") == "missing"
+    assert cache.info() == CacheInfo(hits=1, misses=1, evictions=1, maxsize=2, currsize=2)
+
+    cache.maxsize = 1
+    assert len(cache) == 1 and "c" in cache
+    cache.clear()
+    assert cache.info() == CacheInfo(hits=0, misses=0, evictions=0, maxsize=1, currsize=0)
+
+
+def test_lru_cache_disabled():
+    cache = LRUCache(maxsize=0)
+    cache.set("a", 1)
+    assert cache.get("a") is None
+    assert cache.info().currsize == 0
+
+
+def test_lru_cache_items():
+    cache = LRUCache(maxsize=2)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    cache.get("a")
+    assert cache.items() == [("b", 2), ("a", 1)]
+
+
+def test_approximate_size():
+    word = "x" * 100
+    assert approximate_size(word) == sys.getsizeof(word)
+    assert approximate_size([word, word]) == sys.getsizeof([word, word]) + sys.getsizeof(word)
+    assert approximate_size({"a": (word,)}) > approximate_size(word)
+
+
+def test_freeze():
+    assert freeze({"b": [1, 2], "a": {"x": "y"}}) == (("b", (1, 2)), ("a", (("x", "y"),)))
+    assert hash(freeze({"b": [1, 2], "a": {1, 3}})) == hash(freeze({"b": (1, 2), "a": {3, 1}}))
+    assert freeze({"a": 1, "b": 2}) != freeze({"b": 2, "a": 1})  # Order is significant
+
+
+def test_fingerprint():
+    assert fingerprint(1) != fingerprint(1.0)
+    assert fingerprint([1, (2.5, "a")]) == fingerprint([1, (2.5, "a")])
+    assert fingerprint({"a": 1}) != fingerprint({"a": 2})
+    assert fingerprint(math) == fingerprint(math)
+    assert fingerprint(object()) is None
+    assert fingerprint([1, object()]) is None
+    assert fingerprint(0.0) != fingerprint(-0.0)  # Equal, but rendered differently
+    assert fingerprint({1: "a"}) != fingerprint({True: "a"})
+
+    class Metres(float):
+        def __repr__(self):
+            return f"{float(self)} m"
+
+    assert fingerprint(Metres(2.0)) != fingerprint(2.0)
+    assert fingerprint(Metres(2.0)) == fingerprint(Metres(2.0))
+
+
+def test_cache_info_hit_rate():
+    assert CacheInfo(hits=3, misses=1, evictions=0, maxsize=8, currsize=1).hit_rate == 0.75
+    assert CacheInfo(hits=0, misses=0, evictions=0, maxsize=8, currsize=0).hit_rate == 0.0
+
+
+def test_stable_digest():
+    key = ("c = a + b", (("a", fingerprint(1.5)), ("b", fingerprint(math))))
+    assert stable_digest(key) == stable_digest(key)
+    assert stable_digest(key) != stable_digest(("c = a + b", (("a", fingerprint(2.5)),)))
+    assert stable_digest(("a", "b")) != stable_digest(("ab",))
+    assert stable_digest((1, 1.0)) != stable_digest((1.0, 1))
+    assert stable_digest(("x", object())) is None
+
+    class Label:  # Hashable, but rendered by str() and _repr_latex_()
+        def __init__(self, text):
+            self.text = text
+
+        def __eq__(self, other):
+            return True
+
+        def __hash__(self):
+            return 0
+
+        def __repr__(self):
+            return "Label()"
+
+        def __str__(self):
+            return self.text
+
+    assert stable_digest(fingerprint(Label("a"))) is None
+    assert stable_digest(("x", fingerprint(2.0))) is not None
+    assert stable_digest(fingerprint(Decimal("1.5"))) != stable_digest(
+        fingerprint(Decimal("1.50"))
+    )
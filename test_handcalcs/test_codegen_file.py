@@ -0,0 +1,89 @@
+import ast
+import importlib.util
+import textwrap
+
+import pytest
+
+from handcalcs.__main__ import main
+from handcalcs.codegen import (
+    generate_module,
+    load_module,
+    used_names,
+    verify_render_function,
+)
+
+CALCS = textwrap.dedent('''\
+    from handcalcs import handcalc
+
+    @handcalc(precision=2)
+    def beam_check(w_f, L, E, I_x, phi_M_n):
+        M_f = w_f * L**2 / 8  # Factored moment
+        Delta = 5 * w_f * L**4 / (384 * E * I_x)
+        if M_f <= phi_M_n: flexure = "OK"
+        else: flexure = "NG"
+        return M_f / phi_M_n
+
+    @handcalc(override="params", left="$", right="$")
+    def params(alpha_1, b):
+        a = alpha_1
+        beta = b
+        return a
+    ''')
+
+
+def load_generated(path, source):
+    path.write_text(source)
+    spec = importlib.util.spec_from_file_location(path.stem, path)
+    generated = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(generated)
+    return generated
+
+
+def test_generate_module(tmp_path):
+    calcs_path = tmp_path / "codegen_calcs.py"
+    calcs_path.write_text(CALCS)
+    calcs = load_module(str(calcs_path))
+    source = generate_module(calcs)
+    assert "import pyparsing" not in source
+    assert "from handcalcs" not in source and "import handcalcs" not in source
+
+    generated = load_generated(tmp_path / "codegen_calcs_render.py", source)
+    assert set(generated.RENDERERS) == {"beam_check", "params"}
+    beam_calls = [(10, 6000, 200000, 1e8, 5e8), (45.5, 11000, 200000, 3e7, 1.2e8)]
+    assert verify_render_function(calcs.beam_check, generated.render_beam_check, beam_calls) == 2
+    params_calls = [(1, 2.5), ("steel", -3), {"alpha_1": 1e-9, "b": [1, 2]}]
+    assert verify_render_function(calcs.params, generated.render_params, params_calls) == 3
+
+    assert main(["codegen", str(calcs_path), "-o", str(tmp_path / "cli.py")]) == 0
+    assert (tmp_path / "cli.py").read_text() == source
+
+
+def test_generate_module_uncompilable(tmp_path):
+    calcs_path = tmp_path / "codegen_log.py"
+    calcs_path.write_text(textwrap.dedent('''\
+        from math import log
+        from handcalcs import handcalc
+
+        @handcalc()
+        def log_base(a, b):
+            c = log(a, b)
+            return c
+        '''))
+    with pytest.raises(ValueError, match="cannot be compiled ahead of time"):
+        generate_module(load_module(str(calcs_path)))
+
+
+def test_used_names_of_nested_defs():
+    source = textwrap.dedent('''\
+        def outer(a):
+            def inner(x, *rest, scale=factor):
+                return x * a * offset
+
+            class Helper(Base):
+                def method(self, y):
+                    return y + limit
+
+            return inner(a) + Helper().method(a)
+        ''')
+    node = ast.parse(source).body[0]
+    assert used_names(node) == {"factor", "offset", "Base", "limit"}
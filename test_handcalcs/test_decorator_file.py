@@ -1,4 +1,5 @@
 from handcalcs.decorator import HandcalcsCallRecorder, handcalc
+import itertools
 import pytest
 
 # Define a simple arithmetic function for testing
@@ -34,3 +35,199 @@ def test_decorator_with_recording():
     latex, result = decorated_func(1.0, 2.0)
     assert result == 3.0
     assert latex == '\n\\begin{aligned}\nc &= a + b  = 1.000 + 2.000 &= 3.000  \n\\end{aligned}\n'
+
+def beam_deflection(
+    w: float,
+    L: float,
+) -> float:
+    """
+    Returns the midspan deflection.
+    """
+    deflection = w * L**2 / 8  # default_load @ midspan
+    return_period = 50
+    return deflection
+
+def test_func_source_to_cell():
+    from handcalcs.decorator import _func_source_to_cell
+    import inspect
+    cell_source = _func_source_to_cell(inspect.getsource(beam_deflection))
+    assert cell_source == (
+        "    deflection = w * L**2 / 8  # default_load @ midspan\n"
+        "    return_period = 50\n"
+    )
+
+def test_source_read_once(monkeypatch):
+    import inspect
+    decorated_func = handcalc()(simple_func)
+    monkeypatch.setattr(inspect, "getsource", lambda func: pytest.fail("source read again"))
+    latex, result = decorated_func(1.0, 2.0)
+    assert result == 3.0
+    assert decorated_func.cell_source == "    c = a + b\n"
+
+def test_render_plan_per_config():
+    from handcalcs import config_override
+    decorated_func = handcalc()(simple_func)
+    decorated_func(1.0, 2.0)
+    decorated_func(3.0, 4.0)
+    assert decorated_func.render_plans.info().currsize == 1
+    with config_override(line_break="\\\\"):
+        decorated_func(1.0, 2.0)
+    assert decorated_func.render_plans.info().currsize == 2
+
+@handcalc(left="$", right="$")
+def sweep_func(a: float, b: float) -> float:
+    c = a * b
+    return c
+
+def test_render_many():
+    calls = [{"a": 1.0, "b": 2.0}, (3.0, 4.0), {"a": 0.5, "b": -1.0}]
+    expected = [sweep_func(**call) if isinstance(call, dict) else sweep_func(*call) for call in calls]
+    rendered = sweep_func.render_many(iter(calls))
+    assert not isinstance(rendered, list)
+    assert list(rendered) == expected
+    assert list(sweep_func.render_many(calls * 3, processes=2, chunksize=2)) == expected * 3
+
+    recorder = handcalc(record=True)(simple_func)
+    results = list(recorder.render_many([(1, 2), (3, 4)]))
+    assert [result[1] for result in results] == [3, 7]
+    assert recorder.calls == 2
+    assert recorder.history[1]["latex"] == results[1][0]
+    with pytest.raises(ValueError, match="top level of a module"):
+        list(handcalc()(simple_func).render_many([(1, 2)], processes=2))
+
+def test_lazy_bounded_history():
+    from handcalcs.decorator import CallHistory
+    assert handcalc(record=CallHistory())(simple_func)(2, 3) == handcalc(
+        record=True
+    )(simple_func)(2, 3)
+
+    recorder = handcalc(record=CallHistory(maxlen=3), lazy_latex=True)(simple_func)
+    for a in range(10):
+        assert recorder(a, 1.0).return_value == a + 1.0
+    assert recorder.calls == 10 and len(recorder.history) == 3
+    assert [call.index for call in recorder.history] == [7, 8, 9]
+    assert recorder.history[0]._latex is None  # Not rendered yet
+    assert recorder.history[-1]["latex"] == '\n\\begin{aligned}\nc &= a + b  = 9 + 1.000 &= 10.000  \n\\end{aligned}\n'
+    assert recorder.history[-1]._latex is not None
+
+    history = CallHistory(first=2, maxlen=2, every=2)
+    recorder = handcalc(record=history)(simple_func)
+    for a in range(20):
+        recorder(a, 0)
+    assert [call.args[0] for call in history] == [0, 2, 16, 18]
+
+    history = CallHistory(keep=lambda call: call.return_value > 17)
+    recorder = handcalc(record=history)(simple_func)
+    for a in range(20):
+        recorder(a, 0)
+    assert [call["return"] for call in history] == [18, 19]
+
+
+call_counter = itertools.count()
+
+def counted_sum(a, b):
+    call_number = next(call_counter)
+    c = a + b
+    return c
+
+
+def test_history_renders_the_recorded_scope():
+    from handcalcs.decorator import CallHistory
+    recorder = handcalc(record=CallHistory(maxlen=1), lazy_latex=True)(counted_sum)
+    recorder(1, 2)
+    assert "&= 0  \n" in recorder.history[0]["latex"]  # The call_number of the call
+    assert next(call_counter) == 1  # Rendered without calling the function again
+
+
+def test_columnar_history(tmp_path):
+    np = pytest.importorskip("numpy")
+    from fractions import Fraction
+    from handcalcs.decorator import ColumnarCallHistory
+    history = ColumnarCallHistory(capacity=4)
+    recorder = handcalc(record=history, lazy_latex=True)(simple_func)
+    for a in range(10):
+        assert recorder(a, 1).return_value == a + 1
+    recorder(10, 1.5)  # Promotes the "b" and "return" columns to float
+    columns = history.columns()
+    assert list(columns) == ["a", "b", "return"]
+    assert columns["a"].dtype == np.int64 and columns["b"].dtype == np.float64
+    assert columns["return"].tolist() == [a + 1 for a in range(10)] + [11.5]
+    assert len(history) == recorder.calls == 11
+    assert history[-1].args == (10, 1.5) and history[-1]["return"] == 11.5
+    assert history.render(9) == '\n\\begin{aligned}\nc &= a + b  = 9 + 1.000 &= 10.000  \n\\end{aligned}\n'
+
+    history.to_npz(tmp_path / "calls.npz")
+    with np.load(tmp_path / "calls.npz") as saved:
+        assert saved["a"].tolist() == list(range(11))
+    history.to_csv(tmp_path / "calls.csv")
+    lines = (tmp_path / "calls.csv").read_text().splitlines()
+    assert lines[0] == "a,b,return" and lines[-1] == "10,1.5,11.5"
+
+    recorder(12, Fraction(1, 2))  # Not a NumPy scalar type: an object column
+    assert history.columns()["b"].dtype == object
+    assert history[-1].args == (12, Fraction(1, 2))
+
+    history = ColumnarCallHistory()
+    recorder = handcalc(record=history, lazy_latex=True)(simple_func)
+    recorder(1, 2)
+    recorder(3, True)  # A bool after ints: an object column, not 1
+    recorder(False, 0.5)
+    assert [type(b) for b in history.columns()["b"]] == [int, bool, float]
+    assert history[1].args[1] is True and history[2].args[0] is False
+    assert "3 + True" in history.render(1)
+
+
+def test_lazy_latex():
+    from handcalcs.decorator import HandcalcResult
+    decorated = handcalc(left="$", right="$", lazy_latex=True)(simple_func)
+    result = decorated(2, 3)
+    assert isinstance(result, HandcalcResult) and result.return_value == 5
+    assert result.scope["c"] == 5
+    assert result._latex_code is None  # Not rendered yet
+    assert result.latex == '$\n\\begin{aligned}\nc &= a + b  = 2 + 3 &= 5  \n\\end{aligned}\n$'
+    assert result._repr_latex_().startswith("\\[")
+    assert tuple(result) == handcalc(left="$", right="$")(simple_func)(2, 3)
+
+    recorder = handcalc(record=True, lazy_latex=True)(simple_func)
+    assert recorder(2, 3).latex == result.latex[1:-1]
+    assert recorder.history[0]["latex"] == result.latex[1:-1]
+
+
+def test_scope_capture_reads_current_globals():
+    from handcalcs.decorator import ScopeCapture
+    namespace = {}
+    exec("def f(a):\n    b = a * k\n    return b", namespace)
+    capture_scope = ScopeCapture(namespace["f"])  # 'k' is not assigned yet
+    namespace["k"] = 2
+    assert capture_scope(3)["b"] == 6
+    scoped = capture_scope._built[1]
+    assert capture_scope(4)["b"] == 8 and capture_scope._built[1] is scoped
+    namespace["k"] = 10
+    assert capture_scope(4)["b"] == 40
+
+
+def test_scope_capture_takes_fast_path(monkeypatch):
+    import innerscope
+    from handcalcs.decorator import ScopeCapture
+    capture_scope = ScopeCapture(simple_func)
+    assert capture_scope._analyzed is not None
+
+    def analyze_again(*args, **kwargs):
+        raise AssertionError("innerscope analyzed the function again")
+
+    monkeypatch.setattr(innerscope, "call", analyze_again)
+    monkeypatch.setattr(innerscope, "scoped_function", analyze_again)
+    scoped = capture_scope._built[1]
+    assert capture_scope(2, 3).return_value == 5
+    assert capture_scope(4, 5)["c"] == 9
+    assert capture_scope._built[1] is scoped
+
+
+def test_scope_capture_without_innerscope_internals(monkeypatch):
+    import innerscope
+    from handcalcs.decorator import ScopeCapture
+    monkeypatch.setattr(innerscope, "scoped_function", lambda func: object())
+    capture_scope = ScopeCapture(simple_func)
+    assert capture_scope._analyzed is None
+    scope = capture_scope(2, 3)
+    assert scope["c"] == 5 and scope.return_value == 5
@@ -0,0 +1,52 @@
+from handcalcs.__main__ import main
+from handcalcs.caching import CacheInfo
+from handcalcs.disk_cache import DiskCache
+import handcalcs.global_config
+import handcalcs.handcalcs
+
+
+def test_disk_cache(tmp_path):
+    disk_cache = DiskCache(str(tmp_path / "cache"), maxsize=2)
+    assert disk_cache.get("a") is None
+    disk_cache.set("a", "x")
+    disk_cache.set("b", "y")
+    assert disk_cache.get("a") == "x"  # "b" is now the least recently used
+    disk_cache.set("c", "z")
+    assert disk_cache.get("b") is None
+    assert disk_cache.info() == CacheInfo(hits=1, misses=2, evictions=1, maxsize=2, currsize=2)
+    disk_cache.close()
+
+    reopened = DiskCache(str(tmp_path / "cache"), maxsize=2)
+    assert reopened.get("c") == "z"
+    assert reopened.clear() == 2
+    assert reopened.stats().entries == 0
+    reopened.close()
+
+
+def test_disk_cache_render(tmp_path):
+    handcalcs.global_config.set_option("disk_cache", True)
+    handcalcs.global_config.set_option("disk_cache_dir", str(tmp_path))
+    line_args = {"override": "", "precision": None, "sci_not": None}
+    results = {"a": 1.5, "b": 2, "c": 3.5}
+    try:
+        first = handcalcs.handcalcs.LatexRenderer("c = a + b", results, line_args).render()
+        second = handcalcs.handcalcs.LatexRenderer("c = a + b", results, line_args).render()
+        results["b"] = [object()]  # Cannot be fingerprinted; not cached
+        handcalcs.handcalcs.LatexRenderer("c = a + b", results, line_args).render()
+    finally:
+        handcalcs.global_config.set_option("disk_cache", False)
+        handcalcs.global_config.set_option("disk_cache_dir", "~/.cache/handcalcs")
+    assert first == second
+    disk_cache = handcalcs.disk_cache.get_disk_cache(str(tmp_path), 2048)
+    assert (disk_cache.hits, disk_cache.misses, disk_cache.stats().entries) == (1, 1, 1)
+    disk_cache.close()
+
+
+def test_cache_command(tmp_path, capsys):
+    disk_cache = DiskCache(str(tmp_path))
+    disk_cache.set("a", "x")
+    disk_cache.close()
+    assert main(["cache", "stats", "--dir", str(tmp_path)]) == 0
+    assert "entries: 1" in capsys.readouterr().out
+    assert main(["cache", "clear", "--dir", str(tmp_path)]) == 0
+    assert "Removed 1 entries" in capsys.readouterr().out
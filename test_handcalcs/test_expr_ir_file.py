@@ -0,0 +1,96 @@
+from collections import deque
+
+from handcalcs.expr_ir import (
+    Call,
+    Group,
+    Name,
+    Number,
+    Op,
+    Value,
+    from_deque,
+    to_deque,
+    token_kind,
+    walk,
+)
+from handcalcs.handcalcs import (
+    expr_parser,
+    extend_subscripts,
+    greek_symbols,
+    name_rewrite,
+    swap_for_greek,
+)
+
+
+def test_from_deque():
+    assert from_deque(expr_parser("y = sqrt(a_1 + 2.5e3) * b**-2 + 1+2j")) == Group(
+        [
+            Name("y"),
+            Op("="),
+            Call(Name("sqrt"), [Group([Name("a_1"), Op("+"), Number("2.5e3")])]),
+            Op("*"),
+            Group([Name("b"), Op("**"), Group([Op("-"), Number("2")])]),
+            Op("+"),
+            Number("1+2j"),
+        ]
+    )
+    assert from_deque(deque(["f", deque(["g"]), deque(["x", "**", 2.0])])) == Group(
+        [Name("f"), Call(Name("g"), []), Group([Name("x"), Op("**"), Value(2.0)])]
+    )
+
+
+def test_to_deque():
+    lines = [
+        "y = sqrt(a_1 + 2.5e3) * b**-2 + 1+2j",
+        "z = min(a, b, c) / (x - ceil(y))",
+        "u = -a**2 >= f()",
+    ]
+    for line in lines:
+        parsed = expr_parser(line)
+        assert to_deque(from_deque(parsed)) == parsed
+
+
+
+def test_walk():
+    tree = from_deque(expr_parser("y = sin(a) + b"))
+    names = [node for node in walk(tree) if isinstance(node, Name)]
+    assert names == ["y", "sin", "a", "b"]
+
+
+def test_token_kind():
+    kinds = [token_kind(token) for token in ["a_1", "2.5e3", "**", "1+2j", 3.0]]
+    assert kinds == [Name, Number, Op, Number, Value]
+    assert token_kind("\\left(") is Value
+    assert token_kind("\\frac{") is Value
+
+
+def test_typed_tokens():
+    parsed = expr_parser("y = f(a_1) * 2.5 + b")
+    assert [type(token) for token in parsed] == [Name, Op, deque, Op, Number, Op, Name]
+    assert [type(token) for token in parsed[2]] == [Name, Name]
+    assert token_kind(Name("\\alpha")) is Name
+
+
+def test_name_rewrite():
+    class Tagged:
+        def __str__(self):
+            return "phi_b"
+
+    tagged = Tagged()
+    greek = greek_symbols(())
+    assert swap_for_greek.rewrite("phi_b", greek=greek) == "\\phi_b"
+    assert swap_for_greek.rewrite(tagged, greek=greek) is tagged
+    assert extend_subscripts.rewrite("2.5e3") == "2.5e3"
+    assert extend_subscripts(
+        deque(["s_ze", "=", deque(["sqrt", "x_1"]), "+", 2.5, "**", "b_c_d"])
+    ) == deque(["s_{ze}", "=", deque(["sqrt", "x_{1}"]), "+", 2.5, "**", "b_{c_{d}}"])
+
+    @name_rewrite()
+    def shout(name):
+        return name.upper()
+
+    shouted = shout(expr_parser("y = f(a) * 2 + b"))
+    assert shouted == deque(["Y", "=", deque(["F", "A"]), "*", "2", "+", "B"])
+    assert type(shouted[0]) is Name
+    assert shout(deque(["\\left(", "a", "\\right)"])) == deque(
+        ["\\left(", "A", "\\right)"]
+    )
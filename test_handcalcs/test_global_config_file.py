@@ -0,0 +1,76 @@
+from handcalcs import global_config
+import pytest
+
+
+def test_resolved_config():
+    config = global_config.resolve_config()
+    assert config is global_config.resolve_config()
+    assert config == global_config._config
+    assert hash(config) == hash(global_config.ResolvedConfig(dict(global_config._config)))
+    with pytest.raises(AttributeError):
+        config.key = ()
+    with pytest.raises(TypeError):
+        config["display_precision"] = 5
+
+    excluded = config.replace(greek_exclusions=["beta"])
+    assert excluded["greek_exclusions"] == ["beta"]
+    assert excluded.digest != config.digest
+    assert "beta" in config.greek and "beta" not in excluded.greek
+    assert excluded["greek"] is excluded.greek
+    assert config.line_end == config["line_break"] + "\n"
+    assert config.begin == "\\begin{aligned}"
+    assert global_config.resolve_config(dict(config)) is config
+    with pytest.raises(ValueError):
+        config.replace(display_precision="5")
+
+    global_config.set_option("display_precision", 4)
+    assert global_config.resolve_config()["display_precision"] == 4
+    global_config.set_option("display_precision", 3)
+
+
+def test_resolve_config_sees_changes():
+    options = dict(global_config._config)
+    config = global_config.resolve_config(options)
+    assert global_config.resolve_config(dict(options)) is config
+    options["display_precision"] = 6
+    assert global_config.resolve_config(options)["display_precision"] == 6
+
+    exclusions = global_config._config["greek_exclusions"]
+    global_config._config["greek_exclusions"] = exclusions + ["beta"]
+    try:
+        assert global_config.resolve_config()["greek_exclusions"][-1] == "beta"
+    finally:
+        global_config._config["greek_exclusions"] = exclusions
+    assert global_config.resolve_config()["greek_exclusions"] == exclusions
+
+
+def test_config_override():
+    with global_config.config_override(display_precision=5) as config:
+        assert global_config.resolve_config() is config
+        with global_config.config_override(param_columns=2):
+            inner = global_config.resolve_config()
+            assert (inner["display_precision"], inner["param_columns"]) == (5, 2)
+        assert global_config.resolve_config()["param_columns"] == 3
+    assert global_config.resolve_config()["display_precision"] == 3
+    assert global_config._config["display_precision"] == 3
+
+
+def test_config_override_sees_set_option():
+    with global_config.config_override(display_precision=5):
+        global_config.set_option("param_columns", 2)
+        try:
+            config = global_config.resolve_config()
+            assert (config["display_precision"], config["param_columns"]) == (5, 2)
+        finally:
+            global_config.set_option("param_columns", 3)
+        assert global_config.resolve_config()["param_columns"] == 3
+
+
+def test_config_override_rejects_process_options():
+    for option, value in [("parser_backend", "ast"), ("name_cache_size", 8)]:
+        with pytest.raises(ValueError):
+            with global_config.config_override(**{option: value}):
+                pass
+    with pytest.raises(ValueError):
+        with global_config.config_override(line_end="\n"):
+            pass
@@ -14,10 +14,12 @@
 
 
 import inspect
+import sys
 from collections import deque
 
 import handcalcs
 import pytest
+import pyparsing as pp
 import forallpeople as si
 
 
@@ -1319,6 +1321,14 @@ def test_swap_custom_brackets():
     assert handcalcs.handcalcs.swap_custom_brackets(
         deque(["myvarˉˆ7ˆˉ_ǁAǁ", "=", "1"]), **config_options # Test mixed brackets
     ) == deque([r"myvar(\langle7\rangle)_\|A\|", "=", "1"])
+    assert handcalcs.handcalcs.swap_custom_brackets(
+        deque(["aˉ1ˉ", deque(["bˉ2ˉˉ"])]), **config_options # Test nested deques
+    ) == deque(["a(1)", deque(["b(2)("])])
+    stages = handcalcs.handcalcs.custom_bracket_stages(
+        (("parenthesis", "_"), ("pipes", "_"), ("square_brackets", "__"), ("bogus", "x"))
+    )
+    assert len(stages) == 3  # Each marker overlaps the one before it
+    assert stages[0]("a_1_") == "a(1)"
 
 def test_test_for_scientific_float():
     assert handcalcs.handcalcs.test_for_scientific_float("1.233e-3") == True
@@ -1703,6 +1713,384 @@ def test_expr_parser():
     )
 
 
+def test_get_expr_grammar():
+    grammar = handcalcs.handcalcs.get_expr_grammar()
+    assert handcalcs.handcalcs.get_expr_grammar() is grammar
+    assert handcalcs.handcalcs.expr_parser("z = x**2") == deque(
+        ["z", "=", deque(["x", "**", "2"])]
+    )
+
+
+def test_packrat_memo():
+    assert not pp.ParserElement._packratEnabled
+    handcalcs.handcalcs.clear_packrat_cache()
+    empty_memory = handcalcs.handcalcs.packrat_cache_memory()
+    assert handcalcs.handcalcs.pyparsing_expr_parser("z = sqrt(x**2 + y)") == deque(
+        ["z", "=", deque(["sqrt", deque([deque(["x", "**", "2"]), "+", "y"])])]
+    )
+    assert not pp.ParserElement._packratEnabled
+    info = handcalcs.handcalcs.packrat_cache_info()
+    assert info.currsize > 0 and info.maxsize == 4096
+    assert handcalcs.handcalcs.packrat_cache_memory() > empty_memory
+
+    handcalcs.global_config.set_option("packrat_cache_size", 10)
+    try:
+        handcalcs.handcalcs.pyparsing_expr_parser("z = a + b")
+        assert handcalcs.handcalcs.packrat_cache_info().currsize == 10
+    finally:
+        handcalcs.global_config.set_option("packrat_cache_size", 4096)
+        handcalcs.handcalcs.clear_packrat_cache()
+    assert handcalcs.handcalcs.packrat_cache_info().currsize == 0
+
+
+def test_expr_parser_cache():
+    handcalcs.handcalcs.clear_parse_cache()
+    first = handcalcs.handcalcs.expr_parser("z = x**2 + y")
+    first[2].append("corrupted")
+    first.append("corrupted")
+    second = handcalcs.handcalcs.expr_parser("z = x**2 + y")
+    assert second == deque(["z", "=", deque(["x", "**", "2"]), "+", "y"])
+    info = handcalcs.handcalcs.parse_cache_info()
+    assert (info.hits, info.misses, info.currsize) == (1, 1, 1)
+
+    handcalcs.global_config.set_option("parse_cache_size", 1)
+    try:
+        handcalcs.handcalcs.expr_parser("z = a + b")
+        assert handcalcs.handcalcs.parse_cache_info().evictions == 1
+    finally:
+        handcalcs.global_config.set_option("parse_cache_size", 512)
+        handcalcs.handcalcs.clear_parse_cache()
+
+
+def test_expr_parser_cache_per_backend():
+    handcalcs.handcalcs.clear_parse_cache()
+    backend = handcalcs.global_config._config["parser_backend"]
+    parsed = {}
+    try:
+        for parser_backend in ["pyparsing", "ast", "pyparsing"]:
+            handcalcs.global_config.set_option("parser_backend", parser_backend)
+            parsed[parser_backend] = handcalcs.handcalcs.expr_parser("z = x**2 + y")
+    finally:
+        handcalcs.global_config.set_option("parser_backend", backend)
+    info = handcalcs.handcalcs.parse_cache_info()
+    assert (info.hits, info.misses, info.currsize) == (1, 2, 2)
+    assert parsed["ast"] == parsed["pyparsing"]
+    handcalcs.handcalcs.clear_parse_cache()
+
+
+def test_render_cache():
+    handcalcs.handcalcs.clear_render_cache()
+    handcalcs.global_config.set_option("render_cache_size", 2)
+    try:
+        line_args = {"override": "", "precision": None, "sci_not": None}
+        source = "c = a + b"
+        results = {"a": 1, "b": 2, "c": 3, "d": 4}
+        renderer = handcalcs.handcalcs.LatexRenderer(source, results, line_args)
+        first = renderer.render()
+        assert renderer.render() == first
+
+        results["d"] = 5  # Not referenced by the cell
+        assert handcalcs.handcalcs.LatexRenderer(source, results, line_args).render() == first
+        results["a"] = 2
+        assert handcalcs.handcalcs.LatexRenderer(source, results, line_args).render() != first
+        info = handcalcs.handcalcs.render_cache_info()
+        assert (info.hits, info.misses, info.currsize) == (2, 2, 2)
+
+        results["b"] = object()  # Cannot be fingerprinted; rendered without the cache
+        handcalcs.handcalcs.LatexRenderer(source, results, line_args).render()
+        assert handcalcs.handcalcs.render_cache_info().misses == 2
+    finally:
+        handcalcs.global_config.set_option("render_cache_size", 0)
+        handcalcs.handcalcs.clear_render_cache()
+
+
+def test_render_cache_equal_values_in_other_units():
+    pint = pytest.importorskip("pint")
+    ureg = pint.UnitRegistry()
+    line_args = {"override": "", "precision": None, "sci_not": None}
+    handcalcs.handcalcs.clear_render_cache()
+    handcalcs.global_config.set_option("render_cache_size", 64)
+    try:
+        rendered = []
+        for m in [1 * ureg.m, 100 * ureg.cm]:
+            assert m == 1 * ureg.m and hash(m) == hash(1 * ureg.m)
+            results = {"m": m, "a": 2, "F": m * 2}
+            renderer = handcalcs.handcalcs.LatexRenderer("F = m*a", results, line_args)
+            rendered.append(renderer.render())
+    finally:
+        handcalcs.global_config.set_option("render_cache_size", 0)
+        handcalcs.handcalcs.clear_render_cache()
+    assert "meter" in rendered[0] and "centimeter" in rendered[1]
+
+
+def test_render_plan():
+    h = handcalcs.handcalcs
+    config = handcalcs.global_config.resolve_config()
+    source = (
+        "b = 2 # Parameter\n"
+        "c = a * b / 4\n"
+        "if c > 1: d = c - 1\n"
+        "else: d = 0\n"
+    )
+    plan = h.build_render_plan(source, "", config)
+    for results in ({"a": 3, "b": 2, "c": 1.5, "d": 0.5}, {"a": 1, "b": 2, "c": 0.5, "d": 0}):
+        assert h.render_plan(plan, results) == h.latex(source, results, "", config)
+    with pytest.raises(KeyError):
+        h.render_plan(plan, {"a": 3, "c": 1.5, "d": 0.5})
+
+
+def test_ast_parser_backend():
+    renderers = [
+        cell_1_renderer,
+        cell_2_renderer,
+        cell_2b_renderer,
+        cell_3_renderer,
+        cell_4_renderer,
+        cell_5_renderer,
+        cell_6_renderer,
+        cell_7_renderer,
+        cell_7b_renderer,
+        cell_8_renderer,
+        cell_9_renderer,
+        cell_10_renderer,
+        cell_11_renderer,
+    ]
+    for renderer in renderers:
+        for line in renderer.source.splitlines():
+            line = line.split("#")[0]
+            if not line.strip() or line.rstrip().endswith(":"):
+                continue
+            assert handcalcs.handcalcs.ast_expr_parser(
+                line
+            ) == handcalcs.handcalcs.pyparsing_expr_parser(line)
+
+    backend = handcalcs.global_config._config["parser_backend"]
+    latex = {}
+    try:
+        for parser_backend in ["pyparsing", "ast"]:
+            handcalcs.global_config.set_option("parser_backend", parser_backend)
+            latex[parser_backend] = [
+                renderer.render(config_options=config_options)
+                for renderer in renderers
+            ]
+    finally:
+        handcalcs.global_config.set_option("parser_backend", backend)
+        handcalcs.handcalcs.clear_parse_cache()
+    assert latex["ast"] == latex["pyparsing"]
+
+
+def test_ast_expr_parser():
+    lines = [
+        "x = a + b * c - d",
+        "x = (a + b) * c",
+        "x = -a**b**-c",
+        "x = f(a, b + c, (d))",
+        "x = f((a, b), k=3)",
+        "x = np.sin(x) ** 2 // 3 % 2",
+        "1 < x <= 5",
+        "x = 2 * 1+2j",
+        "x = f(a, )",
+        "x = a[0]",
+        "x = kN.to('ksf')",
+    ]
+    for line in lines:
+        assert handcalcs.handcalcs.ast_expr_parser(
+            line
+        ) == handcalcs.handcalcs.pyparsing_expr_parser(line)
+    with pytest.raises(pp.ParseException):
+        handcalcs.handcalcs.ast_expr_parser("")
+
+
+def test_for_parameter_line_fast_path():
+    handcalcs.handcalcs.clear_parse_cache()
+    for line in ["f_c = 35", "b = -2.5", "e = 1.5e-3", "z = 3j", "k = np.pi"]:
+        assert handcalcs.handcalcs.test_for_parameter_line(line) is True
+    assert handcalcs.handcalcs.parse_cache_info().misses == 0
+    assert handcalcs.handcalcs.test_for_parameter_line("b = 300 * mm") is False
+    assert handcalcs.handcalcs.test_for_parameter_line("c = 4.2 + 3.2j") is True
+
+
+def test_deeply_nested_expressions():
+    recursion_limit = sys.getrecursionlimit()
+    handcalcs.handcalcs.get_expr_grammar()
+    assert sys.getrecursionlimit() == recursion_limit
+
+    depth = 150
+    line = "y = " + "sin(" * depth + "x / 2" + ")" * depth
+    parsed = handcalcs.handcalcs.expr_parser(line)
+    assert parsed[2][0] == "sin"
+    latex_code = handcalcs.handcalcs.latex(
+        line, {"x": 1.0, "y": 0.5}, "symbolic", config_options
+    )
+    assert latex_code.count("\\sin \\left(") == depth
+    assert "\\frac{ x }{ 2 }" + " \\right)" * depth in latex_code
+
+    terms = 1000
+    line = "y = " + " + ".join(f"x**{i}" for i in range(terms))
+    assert len(handcalcs.handcalcs.expr_parser(line)) == 2 * terms + 1
+    assert sys.getrecursionlimit() == recursion_limit
+
+    # Deeper than the 200 nested parentheses that Python's parser accepts, so
+    # the ast backend falls back to pyparsing as well
+    backend = handcalcs.global_config._config["parser_backend"]
+    try:
+        for parser_backend in ["pyparsing", "ast"]:
+            handcalcs.global_config.set_option("parser_backend", parser_backend)
+            depth = 250
+            line = "y = " + "sin(" * depth + "x / 2" + ")" * depth
+            latex_code = handcalcs.handcalcs.latex(
+                line, {"x": 1.0, "y": 0.5}, "symbolic", config_options
+            )
+            assert latex_code.count("\\sin \\left(") == depth
+            assert "\\frac{ x }{ 2 }" + " \\right)" * depth in latex_code
+
+            depth = 1000
+            line = "y = " + "(x + " * depth + "1" + ")" * depth
+            parsed = handcalcs.handcalcs.expr_parser(line)
+            for _ in range(depth):
+                parsed = parsed[-1]
+            assert parsed == deque(["x", "+", "1"])
+            assert sys.getrecursionlimit() == recursion_limit
+    finally:
+        handcalcs.global_config.set_option("parser_backend", backend)
+
+    expr = handcalcs.handcalcs.get_expr_grammar()
+    for line in [
+        "y = -(a + f(b, (c)))**2 / (d - (e))",
+        "y = f( ) + (x) + g(h(i, j), (k, l))",
+        "y = (a + 1j*(b)) // 3",
+        "y = 2(x + 1) + x.(a)",
+    ]:
+        assert handcalcs.handcalcs.parse_by_groups(
+            expr, line
+        ) == expr.parseString(line).asList()
+
+
+def test_deque_walker():
+    @handcalcs.handcalcs.deque_walker
+    def depth(d):
+        deepest = 0
+        for item in d:
+            if isinstance(item, deque):
+                deepest = max(deepest, (yield item))
+        return deepest + 1
+
+    nested = deque(["a"])
+    for _ in range(5000):
+        nested = deque(["a", nested])
+    assert depth(nested) == 5001
+
+
+def test_line_analysis():
+    analysis = handcalcs.handcalcs.LineAnalysis("y = sqrt(x) + np.pi")
+    assert analysis.parsed == deque(["y", "=", deque(["sqrt", "x"]), "+", "np.pi"])
+    assert analysis.parsed is analysis.parsed
+    assert analysis.is_parameter is False
+    assert analysis.is_conditional is False
+    assert analysis.is_numeric is False
+    assert analysis.names == ("y", "sqrt", "x", "np.pi")
+
+    assert handcalcs.handcalcs.LineAnalysis("a = 4.2 + 3.2j").is_parameter is True
+    assert handcalcs.handcalcs.LineAnalysis("b = 2 * 3").is_numeric is True
+    assert handcalcs.handcalcs.find_names("if a > b and c: d = 2") == (
+        "a",
+        "b",
+        "c",
+        "d",
+    )
+
+
+def test_rewrite_tokens():
+    h = handcalcs.handcalcs
+    d = h.swap_frac_divs(
+        h.expr_parser("y_prime = alpha*Rate_annual**2 / (V__c % 2) >= min(a_1, b)")
+    )
+    rewrites = [
+        h.swap_py_operators,
+        h.swap_comparison_ops,
+        h.swap_for_greek,
+        h.swap_prime_notation,
+        h.swap_long_var_strs,
+        h.swap_double_subscripts,
+        h.extend_subscripts,
+    ]
+    expected = d
+    for rewrite in rewrites:
+        expected = rewrite(expected, **config_options)
+    assert h.rewrite_tokens(h.flatten(d), rewrites, **config_options) == deque(
+        h.flatten(expected)
+    )
+
+
+def test_name_translator():
+    h = handcalcs.handcalcs
+    h.clear_name_cache()
+    rewrites = h.value_rewrites(**config_options)
+    translate = h.name_translator(rewrites, **config_options)
+    assert translate("phi_b") == "\\phi_{b}"
+    assert translate("phi_b") == "\\phi_{b}"
+    assert translate(2.5) == 2.5
+    info = h.name_cache_info()
+    assert (info.hits, info.misses, info.currsize) == (1, 1, 1)
+
+    excluded = dict(config_options, greek_exclusions=["phi"])
+    assert h.name_translator(rewrites, **excluded)("phi_b") == "phi_{b}"
+    symbols = dict(config_options, custom_symbols={"_b": "_B", "B": "b"})
+    translate = h.name_translator([h.swap_custom_symbols], **symbols)
+    assert translate("phi_b") == "phi_b"  # Replacements accumulate, in order
+    h.clear_name_cache()
+
+
+def test_custom_symbol_stages():
+    h = handcalcs.handcalcs
+    custom_symbols = {"V_dot": "\\dot{V}", "N_star": "N^{*}", "V_dot_1": "X", "X": "Y"}
+    stages = h.custom_symbol_stages(tuple(custom_symbols.items()))
+    assert len(stages) == 3  # "V_dot_1" overlaps "V_dot"; "X" overlaps the latex "X"
+    (swap,) = h.bind_rewrites([h.swap_custom_symbols], custom_symbols=custom_symbols)
+    assert swap("V_dot_1") == "\\dot{V}_1"
+    assert swap("N_star_V_dot") == "N^{*}_\\dot{V}"
+    assert swap("X_1") == "Y_1"
+    assert swap(2.5) == 2.5
+    assert h.trie_pattern(["ab", "ac", "d"]) == "(?:a(?:b|c)|d)"
+
+
+def test_line_template():
+    h = handcalcs.handcalcs
+    calculation = h.expr_parser("y = a*b_1 + sqrt(c) / 2")
+    template = h.compile_line_template(calculation, **config_options)
+    assert [template.tokens[index] for index in template.slots] == [
+        h.ValueSlot("a"),
+        h.ValueSlot("b_1"),
+        h.ValueSlot("c"),
+    ]
+    for results in ({"a": 1, "b_1": 2.5, "c": 4}, {"a": -3, "b_1": 0.1, "c": "x_y"}):
+        symbolic, numeric = h.swap_calculation(
+            h.expr_parser("y = a*b_1 + sqrt(c) / 2"), results, **config_options
+        )
+        assert (
+            h.fill_line_template(template, results, **config_options)
+            == symbolic + numeric
+        )
+
+    assert h.compile_line_template(h.expr_parser("y = log(a, b)"), **config_options) is None
+    h.clear_line_template_cache()
+    h.line_template(calculation, **config_options)
+    h.line_template(calculation, **config_options)
+    info = h.line_template_cache_info()
+    assert (info.hits, info.misses) == (1, 1)
+    h.clear_line_template_cache()
+
+    # The rendered tokens are cached per template and options, within bounds
+    filled = h.fill_line_template(template, {"a": 1, "b_1": 2.5, "c": 4}, **config_options)
+    first = h.render_line_template(template, filled, False, 3, "L", ".")
+    assert h.render_line_template(template, filled, False, 3, "L", ".") == first
+    assert h.render_line_template(template, filled, False, 1, "L", ",") != first
+    assert len(h._template_renderings) == 2
+    assert not hasattr(template, "rendered")
+    h.clear_line_template_cache()
+    assert len(h._template_renderings) == 0
+
+
 def test_swap_prime_notation():
     assert handcalcs.handcalcs.swap_prime_notation(
         deque(["sin", deque(["tan", deque(["a", "/", 4])])])
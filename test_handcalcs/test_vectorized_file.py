@@ -0,0 +1,44 @@
+import pytest
+
+from handcalcs import config_override, handcalc
+from handcalcs.vectorized import elided_rows, format_column
+
+np = pytest.importorskip("numpy")
+
+
+@handcalc(vectorized=True)
+def beam_moment(w_f, L, E=200000):
+    M_f = w_f * L**2 / 8
+    return M_f
+
+
+def test_elided_rows():
+    assert elided_rows(5, 10) == (5, 0)
+    assert elided_rows(1000, 10) == (5, 5)
+    assert elided_rows(1000, 5) == (3, 2)
+    assert elided_rows(1000, 0) == (1000, 0)
+
+
+def test_vectorized_render():
+    latex, M_f = beam_moment(np.linspace(1.0, 100.0, 100), 2.0)
+    assert np.allclose(M_f, np.linspace(1.0, 100.0, 100) / 2)
+    derivation, table = latex.split("\\begin{array}")
+    assert "M_{f} &= w_{f} \\cdot \\frac{ \\left( L \\right) ^{ 2 } }{ 8 }" in derivation
+    assert "L = 2.000 ,\\quad E = 200000" in derivation
+    assert "{c|c|c}\ni & w_{f} & M_{f} \\\\\n\\hline\n0 & 1.000 & 0.500 \\\\" in table
+    assert "\\vdots & \\vdots & \\vdots \\\\\n95 & 96.000 & 48.000 \\\\" in table
+    assert table.count("\\\\\n") == 12
+
+    with config_override(vectorized_table_rows=0, decimal_separator=","):
+        latex, _ = beam_moment(np.arange(20.0), 2.0)
+    assert "\\vdots" not in latex and "19 & 19{,}000 & 9{,}500 \\\\" in latex
+
+
+def test_format_column():
+    config_options = {"preferred_string_formatter": "L", "decimal_separator": "."}
+    values = np.array([1234.5, 0.001])
+    assert format_column(values, True, 2, config_options) == [
+        "1.23 \\times 10 ^ {3}",
+        "1.00 \\times 10 ^ {-3}",
+    ]
+    assert format_column(np.array([1, 2]), False, 2, config_options) == ["1", "2"]